@@ -0,0 +1,235 @@
+"""
+Benchmark harness for the scanners and analytics scripts.
+
+Each size gets a synthetic chain fixture (synthetic_chain.py) starting at the
+hardfork height, stored as a response cache in py/bench/fixtures/<blocks>/.
+Fixtures are built once and reused. The scripts then run as subprocesses in a
+scratch directory against that fixture with RPC_CACHE_OFFLINE=1, so the
+scanners replay blocks and txs from the cache without a daemon and the
+analytics scripts read the csvs the scanners just wrote:
+
+    prscan -> txscan -> reserveinfo -> txstats, graph      scan (on its own)
+
+Scripts a selected benchmark depends on are run first without being timed.
+
+For every script and size the harness records wall time, peak RSS, blocks/s
+and, for scripts that read txs, conversion txs/s. Results are written as JSON.
+With --baseline the run is compared against an earlier results file, and the
+exit status is 1 if any script got slower or used more memory than the
+thresholds allow, or failed.
+
+Usage:
+    python py/bench.py                                  # 10k and 100k blocks, every script
+    python py/bench.py --sizes 1M --scripts scan,txstats
+    python py/bench.py --baseline py/bench/baseline.json --max-slowdown 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import synthetic_chain
+from rpc_cache import RpcCache
+
+PY_DIR = Path(__file__).resolve().parent
+BENCH_DIR = Path("./py/bench")
+
+# fixtures built with an older generator are rebuilt
+FIXTURE_VERSION = 1
+
+# name -> (script args, benchmarks that must run first, reads txs)
+BENCHMARKS = {
+    "prscan": (["prscan.py", "--fresh"], [], False),
+    "txscan": (["txscan.py", "--fresh"], ["prscan"], True),
+    "reserveinfo": (["reserveinfo.py", "--fresh"], ["prscan", "txscan"], True),
+    "txstats": (["txstats.py"], ["prscan", "txscan"], True),
+    "graph": (["graph.py"], ["prscan", "txscan", "reserveinfo"], False),
+    "scan": (["scan.py", "--fresh"], [], True),
+}
+
+
+def parse_size(text):
+    # 10k, 100k, 1M or a plain number of blocks
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def build_fixture(fixture_dir, blocks, batch=10_000):
+    """
+    Response cache holding `blocks` synthetic blocks and their txs, reused if already built.
+
+    Returns the fixture description: {"version", "blocks", "start_height", "txs", "cache"}.
+    """
+    meta_path = fixture_dir / "fixture.json"
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        if meta.get("version") == FIXTURE_VERSION and meta.get("blocks") == blocks:
+            return meta
+    shutil.rmtree(fixture_dir, ignore_errors=True)
+    fixture_dir.mkdir(parents=True)
+
+    print(f"Building {blocks} block fixture in {fixture_dir}")
+    started = time.perf_counter()
+    cache_path = fixture_dir / "rpc.sqlite"
+    # no eviction, the fixture must stay complete
+    cache = RpcCache(cache_path, max_bytes=2**62)
+    start_height = synthetic_chain.HF_HEIGHT
+    end_height = start_height + blocks - 1
+    for batch_start in range(start_height, end_height + 1, batch):
+        heights = range(batch_start, min(batch_start + batch - 1, end_height) + 1)
+        results = {height: synthetic_chain.block(height) for height in heights}
+        cache.put_blocks(results)
+        cache.put_txs({
+            hash: synthetic_chain.transaction(hash)
+            for result in results.values()
+            for hash in [result["miner_tx_hash"], *result["tx_hashes"]]
+        })
+    cache.close()
+
+    meta = {
+        "version": FIXTURE_VERSION,
+        "blocks": blocks,
+        "start_height": start_height,
+        "txs": synthetic_chain.tx_count(start_height, end_height),
+        "cache": str(cache_path.resolve()),
+    }
+    meta_path.write_text(json.dumps(meta, indent=2))
+    print(f"Built in {time.perf_counter() - started:.1f}s, {cache_path.stat().st_size / 2**20:.0f} MB")
+    return meta
+
+
+def run_script(args, cwd, env, log_path):
+    """Run a py/ script, returning (wall seconds, peak RSS in MB, exit code)."""
+    with open(log_path, "wb") as log:
+        started = time.perf_counter()
+        # stdout (progress lines, reserveinfo's frames) is discarded so the terminal is not what gets measured
+        process = subprocess.Popen([sys.executable, str(PY_DIR / args[0]), *args[1:]], cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=log)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - started
+    # already reaped by wait4, tell Popen so it doesn't wait again
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is kilobytes on Linux, bytes on macOS. A child's peak starts at this process's RSS when it
+    # forked, which is why fixtures are built in a separate process
+    peak_rss = usage.ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    return wall, peak_rss, process.returncode
+
+
+def run_size(meta, names, work_dir):
+    """Run the selected benchmarks (and their dependencies) against one fixture, returning result rows."""
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / "py" / "csvs").mkdir(parents=True)
+    env = dict(
+        os.environ,
+        RPC_CACHE=meta["cache"],
+        RPC_CACHE_OFFLINE="1",
+        RPC_CACHE_MAX_MB=str(2**40),
+        PY_STORE="csv",
+        MPLBACKEND="Agg",
+    )
+
+    needed = set(names)
+    for name in names:
+        needed.update(BENCHMARKS[name][1])
+
+    results = []
+    for name, (args, _, reads_txs) in BENCHMARKS.items():
+        if name not in needed:
+            continue
+        wall, peak_rss, returncode = run_script(args, work_dir, env, work_dir / f"{name}.log")
+        if returncode != 0:
+            print(f"{name} failed with exit code {returncode}, see {work_dir / f'{name}.log'}")
+        if name not in names:
+            continue
+        results.append({
+            "script": name,
+            "blocks": meta["blocks"],
+            "txs": meta["txs"] if reads_txs else None,
+            "wall_s": round(wall, 3),
+            "blocks_per_s": round(meta["blocks"] / wall, 1),
+            "txs_per_s": round(meta["txs"] / wall, 1) if reads_txs else None,
+            "peak_rss_mb": round(peak_rss, 1),
+            "returncode": returncode,
+        })
+    return results
+
+
+def compare(results, baseline, max_slowdown, max_rss_growth):
+    """Regression messages for results that failed or got slower/bigger than the baseline allows."""
+    baseline_rows = {(row["script"], row["blocks"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        label = f"{row['script']} @ {row['blocks']} blocks"
+        if row["returncode"] != 0:
+            regressions.append(f"{label}: exit code {row['returncode']}")
+            continue
+        base = baseline_rows.get((row["script"], row["blocks"]))
+        if base is None:
+            continue
+        if row["wall_s"] > base["wall_s"] * (1 + max_slowdown):
+            regressions.append(f"{label}: wall time {base['wall_s']}s -> {row['wall_s']}s (+{row['wall_s'] / base['wall_s'] - 1:.0%})")
+        if row["peak_rss_mb"] > base["peak_rss_mb"] * (1 + max_rss_growth):
+            regressions.append(f"{label}: peak RSS {base['peak_rss_mb']} MB -> {row['peak_rss_mb']} MB (+{row['peak_rss_mb'] / base['peak_rss_mb'] - 1:.0%})")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'script':<12} {'blocks':>9} {'wall s':>9} {'blocks/s':>11} {'txs/s':>11} {'RSS MB':>8}")
+    for row in results:
+        txs_per_s = "-" if row["txs_per_s"] is None else f"{row['txs_per_s']:.0f}"
+        print(f"{row['script']:<12} {row['blocks']:>9} {row['wall_s']:>9.2f} {row['blocks_per_s']:>11.0f} {txs_per_s:>11} {row['peak_rss_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scanners and analytics scripts on synthetic chain fixtures")
+    parser.add_argument("--sizes", default="10k,100k", help="comma separated fixture sizes in blocks, e.g. 10k,100k,1M (default: 10k,100k)")
+    parser.add_argument("--scripts", help=f"comma separated benchmarks (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--dir", default=str(BENCH_DIR), help=f"fixtures and scratch output (default: {BENCH_DIR})")
+    parser.add_argument("--output", help="results file (default: <dir>/results.json)")
+    parser.add_argument("--baseline", help="earlier results file to check for regressions")
+    parser.add_argument("--max-slowdown", type=float, default=0.15, help="allowed wall time growth over the baseline (default: 0.15)")
+    parser.add_argument("--max-rss-growth", type=float, default=0.20, help="allowed peak RSS growth over the baseline (default: 0.20)")
+    args = parser.parse_args()
+
+    names = list(BENCHMARKS) if not args.scripts else [name.strip() for name in args.scripts.split(",")]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)} (available: {', '.join(BENCHMARKS)})")
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+
+    bench_dir = Path(args.dir)
+    results = []
+    for blocks in sizes:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            meta = pool.submit(build_fixture, bench_dir / "fixtures" / str(blocks), blocks).result()
+        results.extend(run_size(meta, names, bench_dir / "work" / str(blocks)))
+
+    print_results(results)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "thresholds": {"max_slowdown": args.max_slowdown, "max_rss_growth": args.max_rss_growth},
+        "results": results,
+    }
+    output = Path(args.output) if args.output else bench_dir / "results.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    regressions = [f"{row['script']} @ {row['blocks']} blocks: exit code {row['returncode']}" for row in results if row["returncode"] != 0]
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.max_slowdown, args.max_rss_growth)
+    if regressions:
+        print("Regressions:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
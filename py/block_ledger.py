@@ -0,0 +1,81 @@
+"""
+Block hash ledger for reorg-aware resumes.
+
+Each scanner writes a (block, hash) row for every block it processes into a
+block_hashes csv next to its output, committed together with the other csvs
+(the Python counterpart of the scanner's `block_hashes` Redis hash). Before a
+resumed scan continues, check_reorg() compares the last REORG_CHECK_DEPTH
+ledger hashes with the daemon's headers. If they differ, it finds the fork
+point, rolls every output back to it and the scan re-fetches only the heights
+from there on. The rollback is recorded in the progress marker, so outputs
+built from the csvs (the columnar store, txstats --stream, reserveinfo) redo
+their rows past the fork as well.
+"""
+
+import os
+
+from csv_stream import read_tail_rows
+
+LEDGER_COLUMNS = ["block", "hash"]
+
+# ledger rows compared on resume, doubled until a matching hash is found
+REORG_CHECK_DEPTH = int(os.environ.get("REORG_CHECK_DEPTH", "100"))
+
+
+def find_fork_point(ledger_path, fetch_hashes, depth=REORG_CHECK_DEPTH, end=None, tip_height=None):
+    """
+    Lowest ledger height whose hash no longer matches the daemon, or None.
+
+    ledger_path  - block_hashes csv
+    fetch_hashes - function (start_height, end_height) -> {height: hash} from the daemon, None if the call failed
+    end          - committed size of the ledger (default: whole file)
+    tip_height   - daemon height, ledger heights at or above it are off the chain and never asked for
+
+    Raises RuntimeError if the headers can't be fetched, resuming without the check could build on orphaned blocks.
+    """
+    while True:
+        rows = read_tail_rows(ledger_path, depth, end)
+        if not rows:
+            return None
+        ledger = {int(height): block_hash for height, block_hash in rows}
+        start_height, end_height = min(ledger), max(ledger)
+        if tip_height is not None:
+            end_height = min(end_height, tip_height - 1)
+        daemon = fetch_hashes(start_height, end_height) if start_height <= end_height else {}
+        if daemon is None:
+            raise RuntimeError(f"Could not fetch block headers {start_height}-{end_height} for the reorg check")
+
+        # headers missing past the last one returned mean the daemon's chain is now shorter than the ledger,
+        # a gap in the middle of the response is a failed lookup and proves nothing
+        last_header = max(daemon, default=None)
+        mismatched = [
+            height for height in sorted(ledger)
+            if (height in daemon and daemon[height] != ledger[height]) or (height not in daemon and (last_header is None or height > last_header))
+        ]
+        if not mismatched:
+            return None
+        if mismatched[0] > min(ledger) or len(rows) < depth:
+            return mismatched[0]
+        # the whole window is off the chain, look further back
+        depth *= 2
+
+
+def check_reorg(writer, ledger_name, height_columns, fetch_hashes, cache=None, tip_height=None):
+    """
+    Roll a resumed writer back to the fork point if the chain reorganised since its last commit.
+
+    tip_height - daemon height, passed on to find_fork_point()
+
+    Returns the height to resume from after a rollback, or None when the ledger still matches.
+    """
+    if writer.height is None:
+        return None
+    ledger_path = writer.paths[ledger_name]
+    fork_height = find_fork_point(ledger_path, fetch_hashes, end=writer.files[ledger_name].tell(), tip_height=tip_height)
+    if fork_height is None:
+        return None
+    print(f"Reorg detected, rolling back to block {fork_height}")
+    writer.rollback(fork_height, height_columns)
+    if cache is not None:
+        cache.invalidate_from(fork_height)
+    return fork_height
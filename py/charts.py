@@ -0,0 +1,99 @@
+"""
+Headless parallel chart rendering.
+
+Charts register themselves by name with the @chart decorator. render_charts()
+renders the selected charts in a pool of worker processes on the Agg backend.
+The data is prepared once in the calling process and the workers are forked
+from it, so they inherit the data and the charts the calling script
+registered without pickling either. Each worker draws a chart, saves it and
+closes the figure so memory does not build up across charts. Where fork is
+not available the charts are rendered in the calling process.
+
+plot() and fill_between() decimate series to the width of the axes in pixels
+before drawing (see decimate.py).
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+import numpy as np
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from decimate import decimate
+
+GRAPHS_DIR = Path("./py/graphs")
+
+# name -> (output filename, draw function)
+CHARTS = {}
+
+_data = None
+
+
+def chart(name, filename):
+    """Register a draw function that takes the prepared data and draws one figure."""
+    def register(draw):
+        CHARTS[name] = (filename, draw)
+        return draw
+    return register
+
+
+def _pixel_width(ax):
+    return int(ax.bbox.width)
+
+
+def plot(ax, x, y, *args, **kwargs):
+    """ax.plot() with the series decimated to the axes' pixel width."""
+    x, y = decimate(x, y, buckets=_pixel_width(ax))
+    return ax.plot(x, y, *args, **kwargs)
+
+
+def fill_between(ax, x, y1, y2=0, **kwargs):
+    """ax.fill_between() with both bounds decimated to the axes' pixel width."""
+    if np.ndim(y2) == 0:
+        x, y1 = decimate(x, y1, buckets=_pixel_width(ax))
+    else:
+        x, y1, y2 = decimate(x, y1, y2, buckets=_pixel_width(ax))
+    return ax.fill_between(x, y1, y2, **kwargs)
+
+
+def _render(name):
+    started = time.perf_counter()
+    filename, draw = CHARTS[name]
+    draw(_data)
+    fig = plt.gcf()
+    path = GRAPHS_DIR / filename
+    fig.savefig(path)
+    plt.close("all")
+    return name, str(path), time.perf_counter() - started
+
+
+def render_charts(load_data, names=None, jobs=None):
+    """
+    Render charts in parallel and return [(name, path, seconds), ...].
+
+    load_data - function returning the data passed to every draw function
+    names     - charts to render (default: every registered chart)
+    jobs      - worker processes (default: one per core)
+    """
+    global _data
+    names = list(CHARTS) if names is None else list(names)
+    unknown = [name for name in names if name not in CHARTS]
+    if unknown:
+        raise ValueError(f"Unknown charts: {', '.join(unknown)}. Available: {', '.join(CHARTS)}")
+    GRAPHS_DIR.mkdir(parents=True, exist_ok=True)
+
+    if _data is None:
+        _data = load_data()
+
+    jobs = min(jobs or os.cpu_count() or 1, len(names))
+    # a spawned worker could neither unpickle load_data (graph.py passes a lambda) nor see the registered charts
+    if jobs <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return [_render(name) for name in names]
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("fork")) as pool:
+        return list(pool.map(_render, names))
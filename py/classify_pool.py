@@ -0,0 +1,101 @@
+"""
+Process pool for tx classification.
+
+Decoding as_json and classifying txs is CPU bound, so txscan.py and scan.py
+hand each window's txs to TxClassifier instead of calling parse_tx() one by
+one. Workers are forked after the PricingRecordIndex is copied into shared
+memory, so they read pricing records (including ones scan.py adds later) from
+the same arrays and only tx data and results cross the process boundary.
+Results come back in submission order, so rows are still written in block
+order.
+
+The scanners run their scan at import time, so a spawned worker re-importing
+__main__ would start a second scan; workers are always forked. Where fork is not
+available, or with TX_CLASSIFY_PROCESSES=1, txs are classified in the calling
+process.
+
+All workers are forked when the TxClassifier is created: it hands the pool
+one task per worker, each waiting on a barrier until every worker has one,
+since ProcessPoolExecutor forks them on demand (from its own manager thread)
+on early 3.9 and 3.10 patch releases. A thread running while a worker is
+forked could hold a lock the child inherits, so the scanners create the
+TxClassifier before starting any long-lived thread: DaemonPool's health checks
+start with daemon.start() afterwards, and fetch threads only live inside a
+fetch call.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from tx_parse import parse_tx
+
+TX_CLASSIFY_PROCESSES = int(os.environ.get("TX_CLASSIFY_PROCESSES", str(os.cpu_count() or 1)))
+# txs per task sent to a worker
+TX_CLASSIFY_BATCH = int(os.environ.get("TX_CLASSIFY_BATCH", "256"))
+
+# seconds for every worker to start before the classifier gives up
+WORKER_START_TIMEOUT = 60
+
+_worker_index = None
+_worker_barrier = None
+
+
+def _init_worker(pricing_index, barrier):
+    global _worker_index, _worker_barrier
+    _worker_index = pricing_index
+    _worker_barrier = barrier
+
+
+def _wait_for_workers():
+    # holds this worker until every worker has taken one of these tasks
+    _worker_barrier.wait(WORKER_START_TIMEOUT)
+
+
+def _classify_batch(jobs):
+    return [parse_tx(tx_data, hash, height, _worker_index) or (None, None) for tx_data, hash, height in jobs]
+
+
+class TxClassifier:
+    def __init__(self, pricing_index, processes=None, capacity=None):
+        """
+        pricing_index - index the txs are classified against
+        processes     - worker processes (default: TX_CLASSIFY_PROCESSES)
+        capacity      - heights from the index's base height that will be added while classifying,
+                        the shared copy cannot grow past it
+        """
+        if processes is None:
+            processes = TX_CLASSIFY_PROCESSES
+        self.pool = None
+        self.pricing_index = pricing_index
+        if processes > 1 and "fork" in multiprocessing.get_all_start_methods():
+            # the caller keeps adding records to the shared copy, workers see them
+            self.pricing_index = pricing_index.share(capacity)
+            context = multiprocessing.get_context("fork")
+            # forked workers inherit the mapping and the barrier, initargs are not pickled
+            self.pool = ProcessPoolExecutor(
+                max_workers=processes, mp_context=context,
+                initializer=_init_worker, initargs=(self.pricing_index, context.Barrier(processes)),
+            )
+            # fork every worker now, before the caller starts the health check thread and the scan's fetch threads,
+            # no task finishes until all of them are taken, so each one is taken by a different worker
+            for future in [self.pool.submit(_wait_for_workers) for _ in range(processes)]:
+                future.result()
+
+    def classify(self, jobs):
+        """
+        Classify [(tx_data, hash, height), ...], returning [(tx_info, block_reward_info), ...] in the same order.
+
+        Records for every height referenced by the txs must be in pricing_index before calling.
+        """
+        jobs = list(jobs)
+        if self.pool is None or len(jobs) <= TX_CLASSIFY_BATCH:
+            return [parse_tx(tx_data, hash, height, self.pricing_index) or (None, None) for tx_data, hash, height in jobs]
+        batches = [jobs[i:i + TX_CLASSIFY_BATCH] for i in range(0, len(jobs), TX_CLASSIFY_BATCH)]
+        return [result for batch in self.pool.map(_classify_batch, batches) for result in batch]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pricing_index.close(unlink=True)
+            self.pool = None
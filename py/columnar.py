@@ -0,0 +1,288 @@
+"""
+Columnar on-disk store for pricing records, txs and block rewards.
+
+Each table is a directory under py/store/ holding one raw little-endian binary
+file per column plus a meta.json with the row count and column types:
+
+    amount   - int64 atomic units (value * 10**12)
+    int      - int64
+    category - int8 codes (-1 for missing), labels kept in meta.json
+    hash     - fixed width 64 byte strings
+
+Columns are read with np.memmap so only the projected columns, and only the
+rows inside the requested height range, are ever touched. Tables are sorted by
+block, which makes height range reads a binary search on the block column.
+
+Only committed csv rows are imported. When a scanner rolls its csvs back after a
+reorg, the next import truncates the table to the fork height before appending,
+and lists the height in meta.json "rollbacks" for readers that keep their own
+running state (txstats --stream, reserveinfo).
+
+Usage:
+    python py/columnar.py            # import new rows from py/csvs/*.csv into py/store/
+    python py/columnar.py --rebuild  # rebuild the store from scratch
+
+Readers go through load_table(), which uses the store when PY_STORE=columnar
+and falls back to the CSVs otherwise.
+"""
+
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from csv_stream import find_marker, open_committed, read_last_row, rollback_height
+
+PY_STORE = os.environ.get("PY_STORE", "csv").lower()
+
+CSV_DIR = Path("./py/csvs")
+STORE_DIR = Path("./py/store")
+
+ATOMIC_UNITS = 10**12
+
+SCHEMAS = {
+    "pricing_records": {
+        "block": "int",
+        "timestamp": "int",
+        "spot": "amount",
+        "moving_average": "amount",
+        "reserve": "amount",
+        "reserve_ma": "amount",
+        "stable": "amount",
+        "stable_ma": "amount",
+    },
+    "block_rewards": {
+        "block": "int",
+        "miner_reward": "amount",
+        "governance_reward": "amount",
+        "reserve_reward": "amount",
+    },
+    "txs": {
+        "timestamp": "int",
+        "block": "int",
+        "hash": "hash",
+        "conversion_type": "category",
+        "conversion_rate": "amount",
+        "from_asset": "category",
+        "from_amount": "amount",
+        "to_asset": "category",
+        "to_amount": "amount",
+        "conversion_fee_asset": "category",
+        "conversion_fee_amount": "amount",
+        "tx_fee_asset": "category",
+        "tx_fee_amount": "amount",
+    },
+}
+
+DTYPES = {"int": np.dtype("<i8"), "amount": np.dtype("<i8"), "category": np.dtype("i1"), "hash": np.dtype("S64")}
+
+
+class ColumnStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+
+    def _table_dir(self, name):
+        return self.root / name
+
+    def _meta_path(self, name):
+        return self._table_dir(name) / "meta.json"
+
+    def has_table(self, name):
+        return self._meta_path(name).exists()
+
+    def meta(self, name):
+        if not self.has_table(name):
+            return {"rows": 0, "labels": {}}
+        return json.loads(self._meta_path(name).read_text())
+
+    def _save_meta(self, name, meta):
+        tmp_path = self._meta_path(name).with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, self._meta_path(name))
+
+    def _column(self, name, column, rows):
+        kind = SCHEMAS[name][column]
+        path = self._table_dir(name) / f"{column}.bin"
+        if rows == 0:
+            return np.zeros(0, dtype=DTYPES[kind])
+        return np.memmap(path, dtype=DTYPES[kind], mode="r", shape=(rows,))
+
+    def max_height(self, name):
+        rows = self.meta(name)["rows"]
+        if rows == 0:
+            return None
+        return int(self._column(name, "block", rows)[-1])
+
+    def truncate_from(self, name, height):
+        """Drop every row at `height` or above, the column files are cut on the next append."""
+        meta = self.meta(name)
+        rows = meta["rows"]
+        keep = int(np.searchsorted(self._column(name, "block", rows), height, side="left"))
+        if keep == rows:
+            return
+        meta["rows"] = keep
+        meta.setdefault("rollbacks", []).append(height)
+        self._save_meta(name, meta)
+
+    def append(self, name, df):
+        """Append DataFrame rows (float amounts, string categories) to a table."""
+        schema = SCHEMAS[name]
+        table_dir = self._table_dir(name)
+        table_dir.mkdir(parents=True, exist_ok=True)
+        meta = self.meta(name)
+        rows = meta["rows"]
+        labels = meta["labels"]
+
+        for column, kind in schema.items():
+            dtype = DTYPES[kind]
+            values = df[column]
+            if kind == "amount":
+                data = np.rint(values.to_numpy(dtype=np.float64) * ATOMIC_UNITS).astype(dtype)
+            elif kind == "int":
+                data = values.to_numpy(dtype=np.int64).astype(dtype)
+            elif kind == "hash":
+                data = values.astype(str).to_numpy().astype(dtype)
+            else:
+                # missing values (e.g. "N/A" read back as NaN) are stored as code -1
+                column_labels = labels.setdefault(column, [])
+                for label in values.dropna().astype(str).unique():
+                    if label not in column_labels:
+                        column_labels.append(label)
+                codes = {label: code for code, label in enumerate(column_labels)}
+                data = values.map(lambda v: -1 if pd.isna(v) else codes[str(v)]).to_numpy().astype(dtype)
+
+            path = table_dir / f"{column}.bin"
+            with open(path, "ab") as f:
+                # drop bytes from an append that never made it into meta.json
+                f.truncate(rows * dtype.itemsize)
+                f.write(data.tobytes())
+
+        meta["rows"] = rows + len(df)
+        meta["labels"] = labels
+        self._save_meta(name, meta)
+
+    def read(self, name, columns=None, start_height=None, end_height=None, atomic=False):
+        """
+        Read a table into a DataFrame.
+
+        columns      - column projection (default: all columns)
+        start_height - first block to include
+        end_height   - first block to exclude
+        atomic       - keep amounts as int64 atomic units instead of floats
+        """
+        schema = SCHEMAS[name]
+        meta = self.meta(name)
+        rows = meta["rows"]
+        columns = list(schema) if columns is None else list(columns)
+
+        lo, hi = 0, rows
+        if start_height is not None or end_height is not None:
+            blocks = self._column(name, "block", rows)
+            if start_height is not None:
+                lo = int(np.searchsorted(blocks, start_height, side="left"))
+            if end_height is not None:
+                hi = int(np.searchsorted(blocks, end_height, side="left"))
+            hi = max(lo, hi)
+
+        data = {}
+        for column in columns:
+            kind = schema[column]
+            values = np.array(self._column(name, column, rows)[lo:hi])
+            if kind == "amount" and not atomic:
+                values = values * (10**-12)
+            elif kind == "hash":
+                values = values.astype(str)
+            elif kind == "category":
+                values = np.asarray(pd.Categorical.from_codes(values, categories=meta["labels"].get(column, [])), dtype=object)
+            data[column] = values
+        return pd.DataFrame(data, columns=columns)
+
+
+def max_height(name):
+    """Height of the last committed row of a table from whichever backend is active."""
+    if PY_STORE == "columnar":
+        return ColumnStore().max_height(name)
+    # the scanner may be mid-window, rows past its marker can still be rolled back or cut short
+    marker = find_marker(CSV_DIR / f"{name}.csv")
+    if marker is not None:
+        return marker["height"]
+    row = read_last_row(CSV_DIR / f"{name}.csv")
+    if row is None:
+        return None
+    block_column = list(SCHEMAS[name]).index("block")
+    return int(float(row[block_column]))
+
+
+def table_rollbacks(name):
+    """Heights a table was rolled back to after reorgs, oldest first, from whichever backend is active."""
+    if PY_STORE == "columnar":
+        return ColumnStore().meta(name).get("rollbacks", [])
+    marker = find_marker(CSV_DIR / f"{name}.csv")
+    return [] if marker is None else marker.get("rollbacks", [])
+
+
+def load_table(name, columns=None, start_height=None, end_height=None):
+    """Load a table with column projection and a [start_height, end_height) block filter."""
+    if PY_STORE == "columnar":
+        return ColumnStore().read(name, columns, start_height, end_height)
+
+    filtered = start_height is not None or end_height is not None
+    usecols = columns
+    if columns is not None and filtered and "block" not in columns:
+        usecols = [*columns, "block"]
+    with open_committed(CSV_DIR / f"{name}.csv") as f:
+        df = pd.read_csv(f, usecols=usecols)
+    if start_height is not None:
+        df = df[df["block"] >= start_height]
+    if end_height is not None:
+        df = df[df["block"] < end_height]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.reset_index(drop=True)
+
+
+def import_csvs(store, rebuild=False, chunksize=200_000):
+    # append committed rows newer than the store's last height, reading the csvs in chunks
+    for name, schema in SCHEMAS.items():
+        csv_path = CSV_DIR / f"{name}.csv"
+        if not csv_path.exists():
+            print(f"{csv_path} not found, skipping")
+            continue
+        if rebuild and store.has_table(name):
+            shutil.rmtree(store._table_dir(name))
+
+        # rows past the scanner's last commit can still be rolled back, csvs without a marker are complete
+        marker = find_marker(csv_path)
+        csv_rollbacks = [] if marker is None else marker.get("rollbacks", [])
+        fork_height = rollback_height(csv_rollbacks, store.meta(name).get("csv_rollbacks", 0))
+        if fork_height is not None:
+            print(f"{name}: {csv_path} was rolled back to block {fork_height}, dropping stored rows from there")
+            store.truncate_from(name, fork_height)
+
+        last = store.max_height(name)
+        imported = 0
+        with open_committed(csv_path) as f:
+            for chunk in pd.read_csv(f, usecols=list(schema), chunksize=chunksize):
+                if last is not None:
+                    chunk = chunk[chunk["block"] > last]
+                if chunk.empty:
+                    continue
+                store.append(name, chunk)
+                imported += len(chunk)
+
+        if store.has_table(name):
+            meta = store.meta(name)
+            meta["csv_rollbacks"] = len(csv_rollbacks)
+            store._save_meta(name, meta)
+        print(f"{name}: imported {imported} rows, {store.meta(name)['rows']} total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import py/csvs/*.csv into the columnar store")
+    parser.add_argument("--rebuild", action="store_true", help="drop existing tables before importing")
+    args = parser.parse_args()
+    import_csvs(ColumnStore(), rebuild=args.rebuild)
@@ -0,0 +1,264 @@
+"""
+Append-only, crash-safe CSV output for the scanners.
+
+Rows are appended to their CSVs in batches. commit() fsyncs every file and then
+atomically replaces a small JSON progress marker recording the last committed
+height, the byte size of each CSV at that point and any extra state the caller
+wants to carry over (e.g. reserveinfo's running totals).
+
+On restart the marker is read back, each CSV is truncated to its committed size
+(dropping rows written after the last commit) and scanning continues from
+height + 1 without ever loading the old rows into memory.
+
+The marker also lists the heights committed rows were rolled back to after a
+reorg. Whatever is built from the CSVs (the columnar store, txstats --stream,
+reserveinfo) remembers how many of them it has seen and redoes the rows past
+any new one.
+"""
+
+import csv
+import io
+import json
+import os
+from pathlib import Path
+
+# blocks between durable commits
+CSV_COMMIT_INTERVAL = int(os.environ.get("CSV_COMMIT_INTERVAL", "1000"))
+
+
+def _read_tail_lines(f, end, wanted):
+    # complete lines before byte offset end, read backwards until more than `wanted` lines (or the whole file) are in
+    # returns (offset of the first returned line, lines); the first line is the header when the start was reached
+    block = 4096
+    while True:
+        start = max(0, end - block)
+        f.seek(start)
+        data = f.read(end - start)
+        lines = data.splitlines(keepends=True)
+        if start == 0:
+            return 0, lines
+        if len(lines) > wanted + 1:
+            # the first line may be cut off
+            return start + len(lines[0]), lines[1:]
+        block *= 2
+
+
+def read_last_row(path):
+    # last csv row as a list of strings, read from the end of the file
+    rows = read_tail_rows(path, 1)
+    return rows[-1] if rows else None
+
+
+def read_tail_rows(path, count, end=None):
+    """Last `count` csv data rows before byte offset `end` (default: end of file) as lists of strings."""
+    with open(path, "rb") as f:
+        if end is None:
+            end = f.seek(0, os.SEEK_END)
+        start, lines = _read_tail_lines(f, end, count)
+    if start == 0:
+        lines = lines[1:]
+    return [line.decode().rstrip("\r\n").split(",") for line in lines[-count:]] if count else []
+
+
+def find_marker(csv_path):
+    """
+    Progress marker of the scanner that last committed csv_path, or None.
+
+    Markers sit next to their csvs with offsets keyed by csv name. scan.py and
+    txscan.py both write txs.csv, the most recently committed marker wins.
+    """
+    csv_path = Path(csv_path)
+    markers = []
+    for marker_path in csv_path.parent.glob("*.progress.json"):
+        marker = json.loads(marker_path.read_text())
+        if csv_path.stem in marker["offsets"]:
+            markers.append((marker_path.stat().st_mtime, marker))
+    if not markers:
+        return None
+    return max(markers, key=lambda item: item[0])[1]
+
+
+class _CommittedReader(io.RawIOBase):
+    # reads a file only up to byte offset end
+    def __init__(self, path, end):
+        self._file = open(path, "rb")
+        self._remaining = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        read = self._file.readinto(memoryview(buffer)[:max(0, min(len(buffer), self._remaining))])
+        self._remaining -= read
+        return read
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def open_committed(csv_path):
+    """
+    Binary file object for csv_path that ends at its scanner's last commit.
+
+    Rows written after the commit (a scan in progress, or one that crashed
+    mid-row) are left out. Without a progress marker the whole file is read.
+    """
+    marker = find_marker(csv_path)
+    if marker is None:
+        return open(csv_path, "rb")
+    return io.BufferedReader(_CommittedReader(csv_path, marker["offsets"][Path(csv_path).stem]))
+
+
+def rollback_height(rollbacks, seen):
+    """
+    Lowest height rolled back to since a reader last caught up, or None.
+
+    rollbacks - a marker's "rollbacks" list
+    seen      - its length when the reader last caught up
+
+    A list shorter than seen means the output was written again from scratch,
+    which counts as a rollback to height 0.
+    """
+    if len(rollbacks) < seen:
+        return 0
+    return min(rollbacks[seen:], default=None)
+
+
+def find_height_offset(path, column, height, end=None):
+    """
+    Byte offset of the first row whose `column` is >= height, for a csv sorted by that column.
+
+    Reads backwards from `end` (default: end of file), so finding a recent
+    height only touches the tail of the file.
+    """
+    with open(path, "rb") as f:
+        if end is None:
+            end = f.seek(0, os.SEEK_END)
+        wanted = 64
+        while True:
+            start, lines = _read_tail_lines(f, end, wanted)
+            header = start == 0
+            rows = lines[1:] if header else lines
+            offset = start + (len(lines[0]) if header else 0)
+            if rows and int(float(rows[0].split(b",")[column])) >= height and not header:
+                # every row read is past the height, look further back
+                wanted *= 4
+                continue
+            for line in rows:
+                if int(float(line.split(b",")[column])) >= height:
+                    return offset
+                offset += len(line)
+            return offset
+
+
+class StreamingCsvWriter:
+    def __init__(self, marker_path, outputs, fresh=False, legacy_height_columns=None):
+        """
+        marker_path           - progress marker JSON
+        outputs               - {name: (csv path, columns)}
+        fresh                 - discard the marker and any existing output
+        legacy_height_columns - {name: column index} used to resume CSVs written before progress markers existed
+        """
+        self.marker_path = Path(marker_path)
+        self.paths = {name: Path(path) for name, (path, _) in outputs.items()}
+        self.columns = {name: columns for name, (_, columns) in outputs.items()}
+        self.height = None
+        self.state = {}
+        # heights rolled back to after reorgs, oldest first
+        self.rollbacks = []
+
+        marker = None if fresh else self._load_marker()
+        if marker is None and not fresh and legacy_height_columns:
+            marker = self._adopt_legacy(legacy_height_columns)
+
+        self.files = {}
+        self.writers = {}
+        for name, path in self.paths.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if marker is None:
+                f = open(path, "w", newline="")
+            else:
+                f = open(path, "r+b" if path.exists() else "w+b")
+                # drop anything written after the last commit
+                f.truncate(marker["offsets"].get(name, 0))
+                f.close()
+                f = open(path, "a", newline="")
+            self.files[name] = f
+            self.writers[name] = csv.writer(f, lineterminator="\n")
+            if f.tell() == 0:
+                self.writers[name].writerow(self.columns[name])
+
+        if marker is not None:
+            self.height = marker["height"]
+            self.state = marker.get("state", {})
+            self.rollbacks = marker.get("rollbacks", [])
+        else:
+            self.commit(None)
+
+    def _load_marker(self):
+        if not self.marker_path.exists():
+            return None
+        marker = json.loads(self.marker_path.read_text())
+        for name, path in self.paths.items():
+            if name not in marker["offsets"]:
+                # an output added since the marker was written starts out empty
+                continue
+            if not path.exists() or path.stat().st_size < marker["offsets"][name]:
+                print(f"{path} is shorter than its progress marker, starting over")
+                return None
+        return marker
+
+    def _adopt_legacy(self, legacy_height_columns):
+        # CSVs from a complete earlier run were written together, so the furthest height is where it stopped
+        heights = []
+        for name, column in legacy_height_columns.items():
+            path = self.paths[name]
+            if not path.exists():
+                return None
+            row = read_last_row(path)
+            if row is not None:
+                heights.append(int(float(row[column])))
+        if not heights:
+            return None
+        print(f"Adopting existing csvs, last height {max(heights)}")
+        return {"height": max(heights), "offsets": {name: self.paths[name].stat().st_size for name in legacy_height_columns}}
+
+    def append(self, name, rows):
+        self.writers[name].writerows(rows)
+
+    def commit(self, height, state=None):
+        # rows are durable before the marker that points past them
+        offsets = {}
+        for name, f in self.files.items():
+            f.flush()
+            os.fsync(f.fileno())
+            offsets[name] = f.tell()
+        if state is not None:
+            self.state = state
+        self.height = height
+
+        tmp_path = self.marker_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"height": height, "offsets": offsets, "state": self.state, "rollbacks": self.rollbacks}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.marker_path)
+
+    def rollback(self, height, height_columns):
+        """
+        Drop every row at `height` or above and commit at height - 1, recording the rollback in the marker.
+
+        height_columns - {name: column index} of the block height in each output
+        """
+        for name, f in self.files.items():
+            f.flush()
+            offset = find_height_offset(self.paths[name], height_columns[name], height)
+            f.truncate(offset)
+            f.seek(offset)
+        self.rollbacks.append(height)
+        self.commit(height - 1)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
@@ -0,0 +1,165 @@
+"""
+Shared zephyrd RPC client for the py/ scanners.
+
+One requests session per client, with a keep-alive connection pool sized by
+RPC_POOL_SIZE so concurrent fetch threads reuse connections instead of opening
+one per call. Responses are requested gzip compressed (a daemon that doesn't
+compress still answers normally). Calls time out after RPC_TIMEOUT_MS.
+Connection errors, timeouts, HTTP 429 and 5xx responses are retried up to
+RPC_RETRIES times with exponential backoff and full jitter: attempt n sleeps a
+random time up to min(RPC_BACKOFF_MAX_MS, RPC_BACKOFF_MS * 2**n).
+
+With RPC_ADAPTIVE=1 every attempt goes through an AimdLimiter (rpc_pool.py),
+which caps the requests in flight and adapts the cap to the daemon's latency
+and error rate.
+
+The daemon address comes from ZEPHYR_RPC_URL, as in src/utils.ts.
+"""
+
+import json
+import os
+import random
+import time
+from contextlib import nullcontext
+
+import requests
+
+from rpc_pool import RPC_ADAPTIVE, RPC_FETCH_THREADS, AimdLimiter, fetch_concurrent
+from tx_parse import loads
+
+ZEPHYR_RPC_URL = os.environ.get("ZEPHYR_RPC_URL", "http://127.0.0.1:17767").rstrip("/")
+RPC_TIMEOUT_MS = int(os.environ.get("RPC_TIMEOUT_MS", "30000"))
+# keep-alive connections kept open to the daemon
+RPC_POOL_SIZE = int(os.environ.get("RPC_POOL_SIZE", str(max(RPC_FETCH_THREADS, 10))))
+RPC_RETRIES = int(os.environ.get("RPC_RETRIES", "3"))
+RPC_BACKOFF_MS = int(os.environ.get("RPC_BACKOFF_MS", "250"))
+RPC_BACKOFF_MAX_MS = int(os.environ.get("RPC_BACKOFF_MAX_MS", "10000"))
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Accept-Encoding": "gzip",
+}
+
+
+def backoff_seconds(attempt):
+    # full jitter, a random wait up to the capped exponential backoff
+    return random.uniform(0, min(RPC_BACKOFF_MAX_MS, RPC_BACKOFF_MS * 2**attempt)) / 1000
+
+
+def _retryable(error):
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and (error.response.status_code == 429 or error.response.status_code >= 500)
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError))
+
+
+class DaemonClient:
+    def __init__(self, url=ZEPHYR_RPC_URL, pool_size=RPC_POOL_SIZE, timeout=RPC_TIMEOUT_MS / 1000, retries=RPC_RETRIES, metrics=None, limiter=None, raise_errors=False):
+        """
+        url          - daemon base url
+        pool_size    - keep-alive connections kept in the pool
+        timeout      - seconds before a call is abandoned (and retried)
+        retries      - retries after the first attempt for retryable failures
+        metrics      - optional ScanMetrics, records every response and times decoding as its "decode" stage
+        limiter      - AimdLimiter for in-flight requests (default: a new one with RPC_ADAPTIVE=1, none otherwise)
+        raise_errors - raise failed requests from json_rpc() and the calls built on it instead of returning None,
+                       so a caller can tell a failed daemon from a block it doesn't have
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.metrics = metrics
+        self.raise_errors = raise_errors
+        self.limiter = limiter if limiter is not None else AimdLimiter() if RPC_ADAPTIVE else None
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if metrics is not None:
+            metrics.instrument(self.session)
+
+    def post(self, path, payload=None):
+        """POST a JSON payload, retrying retryable failures. Returns the response or raises the last error."""
+        data = json.dumps(payload) if payload is not None else None
+        # latency baselines are kept per call, a get_transactions batch is slower than a get_block
+        call = payload.get("method", path) if path == "/json_rpc" else path
+        for attempt in range(self.retries + 1):
+            ticket = self._acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.post(self.url + path, data=data, timeout=self.timeout)
+                response.raise_for_status()
+                self._release(ticket, call, time.perf_counter() - started, True)
+                return response
+            except requests.exceptions.RequestException as e:
+                self._release(ticket, call, time.perf_counter() - started, not _retryable(e))
+                if attempt == self.retries or not _retryable(e):
+                    raise
+                time.sleep(backoff_seconds(attempt))
+
+    def _acquire(self):
+        return self.limiter.acquire() if self.limiter else None
+
+    def _release(self, ticket, call, latency, ok):
+        if self.limiter:
+            self.limiter.release(ticket, call, latency, ok)
+
+    def _decode(self, response):
+        with self.metrics.stage("decode") if self.metrics else nullcontext():
+            try:
+                return loads(response.content)
+            except ValueError:
+                # orjson is stricter than the stdlib parser, e.g. it rejects NaN and Infinity
+                return json.loads(response.content)
+
+    def json_rpc(self, method, params):
+        """Full json_rpc response for a method, or None if the call failed (raised with raise_errors)."""
+        try:
+            response = self.post("/json_rpc", {"jsonrpc": "2.0", "id": "0", "method": method, "params": params})
+            return self._decode(response)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if self.raise_errors:
+                raise
+            print(f"An error occurred: {e}")
+            return None
+
+    def get_height(self):
+        response_data = self._decode(self.post("/get_height"))
+        if response_data and "height" in response_data:
+            return response_data["height"]
+        return 0
+
+    def get_block(self, height):
+        """get_block result for a height, or None."""
+        response_data = self.json_rpc("get_block", {"height": height})
+        if response_data and "result" in response_data:
+            return response_data["result"]
+        return None
+
+    def get_block_headers_range(self, start_height, end_height):
+        """Headers from start_height to end_height (inclusive), or None if the call failed."""
+        response_data = self.json_rpc("get_block_headers_range", {"start_height": start_height, "end_height": end_height})
+        if not (response_data and "result" in response_data):
+            return None
+        return response_data["result"].get("headers", [])
+
+    def get_block_hashes(self, start_height, end_height):
+        """{height: hash} for the reorg check, None if the call failed."""
+        headers = self.get_block_headers_range(start_height, end_height)
+        if headers is None:
+            return None
+        return {header["height"]: header["hash"] for header in headers}
+
+    def get_transactions(self, hashes):
+        """Fetch a batch of txs in one call, returns {tx_hash: tx_data}. Raises if the call fails."""
+        response_data = self._decode(self.post("/get_transactions", {"txs_hashes": list(hashes), "decode_as_json": True}))
+        return {tx_data["tx_hash"]: tx_data for tx_data in response_data.get("txs", []) if "tx_hash" in tx_data}
+
+    def get_transactions_batched(self, hashes, batch_size, concurrency=None):
+        """Split hashes into batch_size sized /get_transactions calls and fetch them concurrently."""
+        hashes = list(hashes)
+        batches = [hashes[i:i + batch_size] for i in range(0, len(hashes), batch_size)]
+        txs_by_hash = {}
+        for batch_result in fetch_concurrent(batches, self.get_transactions, concurrency):
+            txs_by_hash.update(batch_result)
+        return txs_by_hash
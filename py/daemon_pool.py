@@ -0,0 +1,239 @@
+"""
+Load balancing and failover over several zephyrd daemons.
+
+ZEPHYR_RPC_URLS lists the daemons, comma separated (default: ZEPHYR_RPC_URL).
+Every node gets its own DaemonClient, so its own keep-alive pool and adaptive
+concurrency limit. Each call goes to one node, picked at random weighted by
+1 / that node's recent latency for the call, so faster nodes take a larger
+share. A node whose limit is saturated queues requests, its latency goes up
+and it is picked less.
+
+Nodes that can't answer a call are skipped: block and header calls need the
+node past the highest height asked for, tx calls need it at the scan target
+(the height get_height() returned), since a node that is behind would report
+recent txs as missing.
+
+A call that fails on one node marks it down and is retried on another. Once
+start() is called, a background thread asks every node for its height every
+RPC_HEALTH_INTERVAL_MS and brings nodes back once they answer, so a long scan
+keeps going while a node restarts. The scanners call start() after their
+classifier workers are forked, never before. With a single daemon the pool
+hands every call to its client, which retries on its own as before.
+"""
+
+import os
+import random
+import threading
+import time
+
+import requests
+
+from daemon_client import RPC_RETRIES, ZEPHYR_RPC_URL, DaemonClient, backoff_seconds
+from rpc_pool import fetch_concurrent
+
+ZEPHYR_RPC_URLS = os.environ.get("ZEPHYR_RPC_URLS", ZEPHYR_RPC_URL)
+RPC_HEALTH_INTERVAL_MS = int(os.environ.get("RPC_HEALTH_INTERVAL_MS", "10000"))
+RPC_HEALTH_TIMEOUT_MS = int(os.environ.get("RPC_HEALTH_TIMEOUT_MS", "5000"))
+
+# weight of the latest call in a node's smoothed latency
+LATENCY_SMOOTHING = 0.2
+
+
+class DaemonNode:
+    def __init__(self, client):
+        self.client = client
+        self.url = client.url
+        self.height = 0
+        self.up = True
+        # call -> smoothed seconds
+        self.latency = {}
+
+
+class DaemonPool:
+    def __init__(self, urls=ZEPHYR_RPC_URLS, metrics=None, health_interval=RPC_HEALTH_INTERVAL_MS / 1000):
+        """
+        urls            - daemon base urls, a list or a comma separated string
+        metrics         - optional ScanMetrics, shared by the node clients
+        health_interval - seconds between background height checks, run after start() with more than one node
+        """
+        if isinstance(urls, str):
+            urls = urls.split(",")
+        urls = [url.strip() for url in urls if url.strip()]
+        if not urls:
+            raise ValueError("No daemon urls, set ZEPHYR_RPC_URLS or ZEPHYR_RPC_URL")
+        # with several nodes a failed call moves on to another node instead of retrying the same one
+        single = len(urls) == 1
+        self.nodes = [
+            DaemonNode(DaemonClient(url, retries=RPC_RETRIES if single else 0, metrics=metrics, raise_errors=not single))
+            for url in urls
+        ]
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.height = 0
+        self.health_interval = health_interval
+        self.health_thread = None
+
+    def start(self):
+        """
+        Start the background height checks, a no-op with a single node or when already started.
+
+        Call it after forking any worker processes, a child forked while the
+        thread holds a lock would inherit the lock held forever.
+        """
+        if len(self.nodes) > 1 and self.health_thread is None:
+            self.health_thread = threading.Thread(target=self._health_loop, args=(self.health_interval,), daemon=True)
+            self.health_thread.start()
+
+    def get_height(self):
+        """Highest height of the nodes that answer. Becomes the scan target, tx calls skip nodes below it."""
+        if len(self.nodes) == 1:
+            node = self.nodes[0]
+            node.height = node.client.get_height()
+        elif not any(self.check_health()):
+            raise RuntimeError(f"No daemon answered get_height ({', '.join(node.url for node in self.nodes)})")
+        self.height = max(node.height for node in self.nodes)
+        self._report()
+        return self.height
+
+    def check_health(self):
+        """Ask every node for its height, marking it up or down. Returns a list of whether each node answered."""
+        return fetch_concurrent(self.nodes, self._check_node, len(self.nodes))
+
+    def _check_node(self, node):
+        try:
+            # straight to the session, a health check shouldn't wait for a slot or retry
+            response = node.client.session.post(node.url + "/get_height", timeout=RPC_HEALTH_TIMEOUT_MS / 1000)
+            response.raise_for_status()
+            height = response.json()["height"]
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+            self._mark_down(node, e)
+            return False
+        node.height = height
+        with self.lock:
+            came_back, node.up = not node.up, True
+        if came_back:
+            print(f"Daemon {node.url} is back at height {height}")
+        return True
+
+    def _health_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            self.check_health()
+            self._report()
+
+    def _mark_down(self, node, error):
+        with self.lock:
+            was_up, node.up = node.up, False
+        if was_up:
+            print(f"Daemon {node.url} failed, skipping it until it answers again: {error}")
+
+    def _report(self):
+        if self.metrics is None:
+            return
+        up = [node for node in self.nodes if node.up]
+        self.metrics.set_gauge("rpc_daemons_up", len(up))
+        if all(node.client.limiter for node in up):
+            self.metrics.set_gauge("rpc_concurrency_limit", sum(int(node.client.limiter.limit) for node in up))
+
+    def _pick(self, call, min_height, tried):
+        candidates = [node for node in self.nodes if node not in tried and node.height >= min_height]
+        # nodes that failed recently are a last resort, not excluded
+        candidates = [node for node in candidates if node.up] or candidates
+        if not candidates:
+            return None
+        known = [node.latency[call] for node in candidates if call in node.latency]
+        # a node without measurements is assumed as fast as the fastest, so it gets tried
+        fastest = min(known, default=1.0)
+        weights = [1 / max(node.latency.get(call, fastest), 1e-4) for node in candidates]
+        return random.choices(candidates, weights)[0]
+
+    def _call(self, call, min_height, request):
+        """
+        request(client) on a node at min_height or above, failing over to other nodes.
+
+        call       - call name, node latency is tracked per call
+        min_height - lowest node height that can answer
+        request    - function of a DaemonClient
+
+        A None result (e.g. a block the node doesn't have) is tried on the other nodes before it is returned,
+        None is also returned if no node is at min_height. Raises the last error once RPC_RETRIES + 1 attempts failed.
+        """
+        if len(self.nodes) == 1:
+            result = request(self.nodes[0].client)
+            self._report()
+            return result
+
+        tried = set()
+        error = None
+        for attempt in range(RPC_RETRIES + 1):
+            node = self._pick(call, min_height, tried)
+            if node is None:
+                # no node can answer, or all of them answered without a result
+                if error is None:
+                    break
+                # every node was tried and some failed, wait and go around again
+                tried.clear()
+                time.sleep(backoff_seconds(attempt))
+                node = self._pick(call, min_height, tried)
+                if node is None:
+                    # the health checks saw every node fall below min_height meanwhile
+                    break
+                error = None
+            tried.add(node)
+            started = time.perf_counter()
+            try:
+                result = request(node.client)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                error = e
+                self._mark_down(node, e)
+                continue
+            if result is None:
+                continue
+            latency = time.perf_counter() - started
+            previous = node.latency.get(call, latency)
+            node.latency[call] = previous + (latency - previous) * LATENCY_SMOOTHING
+            self._report()
+            return result
+        self._report()
+        if error is not None:
+            raise error
+        if not tried:
+            print(f"No daemon at height {min_height} for {call}: {', '.join(f'{node.url} at {node.height}' for node in self.nodes)}")
+        return None
+
+    def _json_rpc_call(self, call, min_height, request):
+        # same contract as DaemonClient.json_rpc, a call that failed everywhere is printed and returns None
+        try:
+            return self._call(call, min_height, request)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"An error occurred: {e}")
+            return None
+
+    def get_block(self, height):
+        """get_block result for a height, or None."""
+        return self._json_rpc_call("get_block", height + 1, lambda client: client.get_block(height))
+
+    def get_block_headers_range(self, start_height, end_height):
+        """Headers from start_height to end_height (inclusive), or None if the call failed."""
+        return self._json_rpc_call("get_block_headers_range", end_height + 1, lambda client: client.get_block_headers_range(start_height, end_height))
+
+    def get_block_hashes(self, start_height, end_height):
+        """{height: hash} for the reorg check, None if the call failed."""
+        return self._json_rpc_call("get_block_headers_range", end_height + 1, lambda client: client.get_block_hashes(start_height, end_height))
+
+    def get_transactions(self, hashes):
+        """Fetch a batch of txs in one call from a node at the scan target, returns {tx_hash: tx_data}. Raises if every attempt failed."""
+        hashes = list(hashes)
+        txs_by_hash = self._call("get_transactions", self.height, lambda client: client.get_transactions(hashes))
+        if txs_by_hash is None:
+            raise RuntimeError(f"No daemon at the scan height {self.height} to fetch txs from")
+        return txs_by_hash
+
+    def get_transactions_batched(self, hashes, batch_size, concurrency=None):
+        """Split hashes into batch_size sized /get_transactions calls and spread them over the nodes."""
+        hashes = list(hashes)
+        batches = [hashes[i:i + batch_size] for i in range(0, len(hashes), batch_size)]
+        txs_by_hash = {}
+        for batch_result in fetch_concurrent(batches, self.get_transactions, concurrency):
+            txs_by_hash.update(batch_result)
+        return txs_by_hash
@@ -0,0 +1,69 @@
+"""
+Shape-preserving downsampling for line charts.
+
+A chart a few thousand pixels wide cannot show more than a handful of points
+per pixel column, so drawing every block of a 400k+ block series only costs
+render time. decimate() splits the x range into one bucket per pixel and keeps,
+for every series, the first, last, minimum and maximum point of each bucket, so
+peaks survive. Points on either side of a gap (NaN, e.g. a pricing record
+outage) are always kept, so gaps still break the line where they start and end.
+"""
+
+import os
+
+import numpy as np
+
+# set CHART_DECIMATE=0 to draw every point
+CHART_DECIMATE = os.environ.get("CHART_DECIMATE", "1") != "0"
+
+# below this many points per bucket the series is drawn as is
+MIN_POINTS_PER_BUCKET = 4
+
+
+def decimate_indices(x, ys, buckets):
+    """
+    Return the sorted row indices to keep.
+
+    x       - x values, sorted ascending
+    ys      - list of y series aligned with x, kept points are the union over all of them
+    buckets - number of x buckets, usually the plot width in pixels
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if buckets <= 0 or n <= buckets * MIN_POINTS_PER_BUCKET:
+        return np.arange(n)
+
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.arange(n)
+    bucket = np.minimum(((x - x[0]) / span * buckets).astype(np.int64), buckets - 1)
+
+    # first and last row of each bucket
+    bucket_edges = np.flatnonzero(np.diff(bucket)) + 1
+    keep = [np.array([0, n - 1]), bucket_edges, bucket_edges - 1]
+
+    for y in ys:
+        y = np.asarray(y, dtype=np.float64)
+        missing = np.isnan(y)
+        # rows sorted by bucket, then by y; the first row of a bucket is its min, the last its max
+        by_min = np.lexsort((np.where(missing, np.inf, y), bucket))
+        by_max = np.lexsort((np.where(missing, -np.inf, y), bucket))
+        keep.append(by_min[np.concatenate([[0], bucket_edges])])
+        keep.append(by_max[np.concatenate([bucket_edges - 1, [n - 1]])])
+
+        # both sides of every gap edge
+        gap_edges = np.flatnonzero(np.diff(missing.astype(np.int8))) + 1
+        keep.append(gap_edges)
+        keep.append(gap_edges - 1)
+
+    return np.unique(np.concatenate(keep))
+
+
+def decimate(x, *ys, buckets):
+    """Return (x, *ys) reduced to the rows kept by decimate_indices()."""
+    x = np.asarray(x)
+    ys = [np.asarray(y) for y in ys]
+    if not CHART_DECIMATE:
+        return (x, *ys)
+    rows = decimate_indices(x, ys, buckets)
+    return (x[rows], *(y[rows] for y in ys))
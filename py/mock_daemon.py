@@ -0,0 +1,281 @@
+"""
+Stand-in zephyrd daemon for load and latency testing.
+
+Serves the RPC calls the py/ scanners make:
+
+    /get_height
+    /json_rpc  get_block, get_block_headers_range
+    /get_transactions
+
+from either a synthetic chain (synthetic_chain.py, --blocks) or responses
+recorded in a response cache file (rpc_cache.py, --cache), e.g. a
+py/cache/rpc.sqlite left behind by a real scan or a bench.py fixture.
+
+Responses can be slowed down (--latency, --jitter), fail with HTTP 500 at a
+given rate (--error-rate) and connections beyond --max-connections are closed
+without a response, as an overloaded node would. With --workers only that many
+requests are served at once and the rest queue, so latency grows with load
+like on a daemon with a fixed number of RPC threads. Request counts, errors,
+rejected connections, bytes sent and the peak number of concurrent requests
+are printed when the daemon is stopped.
+
+Usage:
+    python py/mock_daemon.py --blocks 100000
+    python py/mock_daemon.py --cache py/cache/rpc.sqlite --latency 20 --jitter 10 --error-rate 0.01 --max-connections 8
+    python py/mock_daemon.py --blocks 100000 --latency 20 --workers 4
+"""
+
+import argparse
+import gzip
+import json
+import random
+import signal
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import synthetic_chain
+from rpc_cache import RpcCache
+
+# the daemon refuses larger header ranges in restricted mode
+MAX_HEADERS_RANGE = 1000
+
+
+class SyntheticChain:
+    """Synthetic blocks from HF_HEIGHT up to (excluding) height."""
+
+    def __init__(self, blocks):
+        self.height = synthetic_chain.HF_HEIGHT + blocks
+
+    def block(self, height):
+        if not synthetic_chain.HF_HEIGHT <= height < self.height:
+            return None
+        return synthetic_chain.block(height)
+
+    def header(self, height):
+        if not synthetic_chain.HF_HEIGHT <= height < self.height:
+            return None
+        return synthetic_chain.header(height)
+
+    def transactions(self, hashes):
+        found = {}
+        for hash in hashes:
+            try:
+                height, _ = synthetic_chain.tx_position(hash)
+            except ValueError:
+                continue
+            if synthetic_chain.HF_HEIGHT <= height < self.height and hash in self._block_tx_hashes(height):
+                found[hash] = synthetic_chain.transaction(hash)
+        return found
+
+    def _block_tx_hashes(self, height):
+        block = synthetic_chain.block(height)
+        return {block["miner_tx_hash"], *block["tx_hashes"]}
+
+
+class RecordedChain:
+    """Blocks and txs recorded in a response cache, up to the highest cached block."""
+
+    def __init__(self, path):
+        # never evict from someone else's cache file
+        self.cache = RpcCache(path, max_bytes=2**62)
+        max_height = self.cache.max_height()
+        self.height = 0 if max_height is None else max_height + 1
+
+    def block(self, height):
+        return self.cache.get_block(height)
+
+    def header(self, height):
+        block = self.cache.get_block(height)
+        return block["block_header"] if block else None
+
+    def transactions(self, hashes):
+        return self.cache.get_txs(hashes)
+
+
+class DaemonStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.bytes_sent = 0
+        self.active = 0
+        self.peak_active = 0
+        self.connections = 0
+
+    def summary(self):
+        return (
+            f"{self.requests} requests, {self.errors} injected errors, {self.rejected} rejected connections, "
+            f"{self.bytes_sent / 2**20:.1f} MB sent, peak {self.peak_active} concurrent requests"
+        )
+
+
+class MockDaemonServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, chain, latency=0.0, jitter=0.0, error_rate=0.0, max_connections=0, gzip_responses=False, workers=0):
+        """
+        chain           - SyntheticChain or RecordedChain the responses are built from
+        latency         - seconds added to every response
+        jitter          - up to this many seconds added on top of latency, uniformly distributed
+        error_rate      - fraction of requests answered with HTTP 500
+        max_connections - open connections allowed at once, 0 for no limit
+        gzip_responses  - gzip bodies for clients sending Accept-Encoding: gzip
+        workers         - requests served at once, others wait for a free worker, 0 for no limit
+        """
+        super().__init__(address, MockDaemonHandler)
+        self.chain = chain
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_connections = max_connections
+        self.gzip_responses = gzip_responses
+        self.workers = threading.Semaphore(workers) if workers else None
+        self.stats = DaemonStats()
+
+    def process_request(self, request, client_address):
+        with self.stats.lock:
+            if self.max_connections and self.stats.connections >= self.max_connections:
+                self.stats.rejected += 1
+                self.shutdown_request(request)
+                return
+            self.stats.connections += 1
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self.stats.lock:
+                self.stats.connections -= 1
+
+
+class MockDaemonHandler(BaseHTTPRequestHandler):
+    # keep-alive, like the real daemon
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, with Nagle on every response would wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        stats = server.stats
+        with stats.lock:
+            stats.requests += 1
+            stats.active += 1
+            stats.peak_active = max(stats.peak_active, stats.active)
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length) if length else b""
+            with server.workers or nullcontext():
+                self._serve(body)
+        finally:
+            with stats.lock:
+                stats.active -= 1
+
+    def _serve(self, body):
+        server = self.server
+        stats = server.stats
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+        if random.random() < server.error_rate:
+            with stats.lock:
+                stats.errors += 1
+            self._send(500, {"status": "Injected error"})
+            return
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            self._send(400, {"status": "Failed to parse request"})
+            return
+        self._send(*self._route(request))
+
+    def _route(self, request):
+        chain = self.server.chain
+        if self.path == "/get_height":
+            return 200, {"height": chain.height, "status": "OK"}
+        if self.path == "/get_transactions":
+            hashes = request.get("txs_hashes", [])
+            found = chain.transactions(hashes)
+            missed = [hash for hash in hashes if hash not in found]
+            response = {"txs": [found[hash] for hash in hashes if hash in found], "status": "OK"}
+            if missed:
+                response["missed_tx"] = missed
+            return 200, response
+        if self.path == "/json_rpc":
+            return 200, self._json_rpc(request)
+        return 404, {"status": "Not found"}
+
+    def _json_rpc(self, request):
+        chain = self.server.chain
+        method = request.get("method")
+        params = request.get("params") or {}
+        response = {"id": request.get("id", "0"), "jsonrpc": "2.0"}
+        if method == "get_block":
+            block = chain.block(params.get("height", -1))
+            if block is None:
+                response["error"] = {"code": -2, "message": f"Requested block height: {params.get('height')} greater than current top block height: {chain.height - 1}"}
+            else:
+                response["result"] = block
+        elif method == "get_block_headers_range":
+            start_height, end_height = params.get("start_height", 0), params.get("end_height", -1)
+            if end_height < start_height or end_height >= chain.height or end_height - start_height >= MAX_HEADERS_RANGE:
+                response["error"] = {"code": -5, "message": "Invalid start/end heights."}
+            else:
+                headers = [chain.header(height) for height in range(start_height, end_height + 1)]
+                response["result"] = {"headers": [header for header in headers if header], "status": "OK"}
+        else:
+            response["error"] = {"code": -32601, "message": "Method not found"}
+        return response
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        gzipped = self.server.gzip_responses and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body, 1)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.stats.lock:
+            self.server.stats.bytes_sent += len(body)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve zephyrd RPC calls from a synthetic chain or recorded responses")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--blocks", type=int, default=10_000, help="synthetic chain length from the hardfork height (default: 10000)")
+    source.add_argument("--cache", help="serve blocks and txs recorded in this response cache file instead")
+    parser.add_argument("--host", default="127.0.0.1", help="listen address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=17767, help="listen port (default: 17767)")
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every response (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra milliseconds per response (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500 (default: 0)")
+    parser.add_argument("--max-connections", type=int, default=0, help="connections beyond this are closed unanswered, 0 for no limit (default: 0)")
+    parser.add_argument("--workers", type=int, default=0, help="requests served at once, the rest queue, 0 for no limit (default: 0)")
+    parser.add_argument("--gzip", action="store_true", help="gzip responses for clients that accept it")
+    args = parser.parse_args()
+
+    chain = RecordedChain(args.cache) if args.cache else SyntheticChain(args.blocks)
+    server = MockDaemonServer(
+        (args.host, args.port), chain,
+        latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate,
+        max_connections=args.max_connections, gzip_responses=args.gzip, workers=args.workers,
+    )
+    print(f"Serving {chain.height} blocks on http://{args.host}:{args.port}", flush=True)
+    # print the stats when stopped with kill as well as Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    print(server.stats.summary())
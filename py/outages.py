@@ -0,0 +1,88 @@
+"""
+Pricing record outage detection and moving average interpolation.
+
+An outage is a run of consecutive blocks whose spot price is missing (zero in
+the scanner output, NaN once graph.py has replaced zeros). Runs are found with
+run-length encoding of the missing flag, and the MA columns inside each run are
+filled in one array-wide operation.
+"""
+
+import numpy as np
+
+MA_COLUMNS = ["moving_average", "reserve_ma", "stable_ma"]
+
+
+def find_outages(blocks, values, min_length=2):
+    """
+    Return [(start_block, end_block), ...] for runs of missing values.
+
+    blocks     - block heights, sorted ascending
+    values     - series aligned with blocks, NaN or 0 marks a missing value
+    min_length - shortest run reported (default 2, single block gaps are ignored)
+    """
+    blocks = np.asarray(blocks)
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values) | (values == 0)
+
+    # +1 where a run starts, -1 one past where it ends
+    edges = np.diff(np.concatenate([[0], missing.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+
+    keep = (ends - starts + 1) >= min_length
+    return [(int(blocks[s]), int(blocks[e])) for s, e in zip(starts[keep], ends[keep])]
+
+
+def interpolate_outages(df, outages, columns=MA_COLUMNS, block_column="block"):
+    """
+    Linearly fill columns inside each outage, in place.
+
+    For an outage start..end the values at blocks start-1 and end+1 are the
+    anchors and block i in start+1..end-1 gets
+        anchor_start + (anchor_end - anchor_start) / (end - start + 1) * (i - start)
+    which is the same fill graph.py used to do block by block. Outages without
+    both anchor blocks are left untouched.
+    """
+    if not outages:
+        return df
+
+    blocks = df[block_column].to_numpy()
+    starts = np.array([start for start, _ in outages], dtype=np.int64)
+    ends = np.array([end for _, end in outages], dtype=np.int64)
+
+    before_pos = np.searchsorted(blocks, starts - 1)
+    after_pos = np.searchsorted(blocks, ends + 1)
+    start_pos = np.searchsorted(blocks, starts)
+    end_pos = np.searchsorted(blocks, ends)
+
+    n = len(blocks)
+    has_anchors = (before_pos < n) & (after_pos < n)
+    has_anchors[has_anchors] &= (blocks[before_pos[has_anchors]] == starts[has_anchors] - 1) & (blocks[after_pos[has_anchors]] == ends[has_anchors] + 1)
+    before_pos, after_pos, start_pos, end_pos = before_pos[has_anchors], after_pos[has_anchors], start_pos[has_anchors], end_pos[has_anchors]
+    starts, ends = starts[has_anchors], ends[has_anchors]
+
+    # interior rows of every outage, and which outage each belongs to
+    counts = np.maximum(end_pos - start_pos - 1, 0)
+    outage_of_row = np.repeat(np.arange(len(counts)), counts)
+    first_row = np.repeat(start_pos + 1 - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+    rows = first_row + np.arange(counts.sum())
+    if len(rows) == 0:
+        return df
+
+    total_blocks = (ends - starts + 1)[outage_of_row]
+    offset = blocks[rows] - starts[outage_of_row]
+
+    for column in columns:
+        position = df.columns.get_loc(column)
+        values = df[column].to_numpy(dtype=np.float64).copy()
+        start_values = values[before_pos][outage_of_row]
+        diff = values[after_pos][outage_of_row] - start_values
+        values[rows] = start_values + (diff / total_blocks) * offset
+        df.iloc[:, position] = values
+    return df
+
+
+def shade_outages(ax, outages, label="Outage"):
+    """Shade every outage on an axis, labelling only the first span."""
+    for i, (start, end) in enumerate(outages):
+        ax.axvspan(start, end, color='gray', alpha=0.3, label=label if i == 0 else "")
@@ -0,0 +1,124 @@
+"""
+Direct-lookup pricing record index.
+
+Pricing records are stored in numpy arrays indexed by (height - base_height),
+so looking up the record for a height is a constant time array read instead of
+a scan over the whole pricing records DataFrame.
+
+share() copies an index into shared memory, so processes forked afterwards
+read the same arrays and see records the parent adds later.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from csv_stream import open_committed
+
+PRICING_FIELDS = ["spot", "moving_average", "reserve", "reserve_ma", "stable", "stable_ma"]
+
+
+class PricingRecordIndex:
+    def __init__(self, base_height=0, capacity=1024):
+        self.base_height = int(base_height)
+        self.values = np.zeros((capacity, len(PRICING_FIELDS)), dtype=np.float64)
+        self.present = np.zeros(capacity, dtype=bool)
+        self.max_height = self.base_height - 1
+        self._shm = None
+
+    @classmethod
+    def from_frame(cls, df):
+        if df.empty:
+            return cls()
+        heights = df["block"].to_numpy(dtype=np.int64)
+        base_height = int(heights.min())
+        index = cls(base_height, capacity=int(heights.max()) - base_height + 1)
+        # keep the first row per height, matching the old `df[df["block"] == h].values[0]` lookup
+        first = ~pd.Series(heights).duplicated().to_numpy()
+        offsets = heights[first] - base_height
+        index.values[offsets] = df[PRICING_FIELDS].to_numpy(dtype=np.float64)[first]
+        index.present[offsets] = True
+        index.max_height = int(heights.max())
+        return index
+
+    @classmethod
+    def from_csv(cls, path):
+        # only committed records, prscan.py may be writing the csv
+        with open_committed(path) as f:
+            return cls.from_frame(pd.read_csv(f))
+
+    def _ensure_capacity(self, offset):
+        capacity = len(self.present)
+        if offset < capacity:
+            return
+        if self._shm is not None:
+            raise ValueError(f"Shared pricing index is full ({capacity} heights from {self.base_height})")
+        new_capacity = max(offset + 1, capacity * 2)
+        values = np.zeros((new_capacity, len(PRICING_FIELDS)), dtype=np.float64)
+        values[:capacity] = self.values
+        present = np.zeros(new_capacity, dtype=bool)
+        present[:capacity] = self.present
+        self.values = values
+        self.present = present
+
+    def add(self, height, spot, moving_average, reserve, reserve_ma, stable, stable_ma):
+        # records can be added while a scan runs, heights below base_height are rebased
+        height = int(height)
+        if height < self.base_height:
+            if self._shm is not None:
+                raise ValueError(f"Shared pricing index starts at {self.base_height}, cannot add {height}")
+            shift = self.base_height - height
+            self._ensure_capacity(len(self.present) + shift - 1)
+            self.values = np.roll(self.values, shift, axis=0)
+            self.present = np.roll(self.present, shift)
+            self.base_height = height
+        offset = height - self.base_height
+        self._ensure_capacity(offset)
+        self.values[offset] = (spot, moving_average, reserve, reserve_ma, stable, stable_ma)
+        self.present[offset] = True
+        self.max_height = max(self.max_height, height)
+
+    def share(self, capacity=None):
+        """
+        Copy of this index in shared memory.
+
+        capacity - heights from base_height the copy can hold (default: current size), it cannot grow
+        """
+        capacity = max(capacity or 0, len(self.present), 1)
+        row_bytes = len(PRICING_FIELDS) * 8 + 1
+        shm = shared_memory.SharedMemory(create=True, size=capacity * row_bytes)
+        index = PricingRecordIndex.__new__(PricingRecordIndex)
+        index.base_height = self.base_height
+        index.max_height = self.max_height
+        index._shm = shm
+        index.values = np.ndarray((capacity, len(PRICING_FIELDS)), dtype=np.float64, buffer=shm.buf)
+        index.present = np.ndarray(capacity, dtype=bool, buffer=shm.buf, offset=index.values.nbytes)
+        index.values[:] = 0
+        index.present[:] = False
+        index.values[:len(self.present)] = self.values
+        index.present[:len(self.present)] = self.present
+        return index
+
+    def close(self, unlink=False):
+        """Release shared memory, unlink=True frees it once no process needs it."""
+        if self._shm is None:
+            return
+        self.values = self.present = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+        self._shm = None
+
+    def get(self, height):
+        """Return (spot, moving_average, reserve, reserve_ma, stable, stable_ma) for a height, or None."""
+        offset = int(height) - self.base_height
+        if offset < 0 or offset >= len(self.present) or not self.present[offset]:
+            return None
+        return tuple(self.values[offset])
+
+    def __contains__(self, height):
+        return self.get(height) is not None
+
+    def __len__(self):
+        return int(self.present.sum())
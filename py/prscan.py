@@ -1,86 +1,80 @@
-import requests
-import json
-import pandas as pd
+import argparse
+import os
 from pathlib import Path
 
-session = requests.Session()
+from block_ledger import LEDGER_COLUMNS, check_reorg
+from csv_stream import CSV_COMMIT_INTERVAL, StreamingCsvWriter
+from daemon_pool import DaemonPool
+from rpc_cache import RPC_CACHE_OFFLINE, cached_block, offline_height, open_cache
+from rpc_pool import RPC_FETCH_THREADS, fetch_concurrent, process_height_range
+from scan_metrics import ScanMetrics
 
-def get_current_block_height():
-    
-    url = "http://127.0.0.1:17767/get_height"
-    
-    headers = {
-        'Content-Type': 'application/json',
-    }
-    response = requests.post(url, headers=headers)
+# "headers" reads pricing records from get_block_headers_range, "blocks" uses one get_block per height
+PRSCAN_MODE = os.environ.get("PRSCAN_MODE", "headers").lower()
+PRSCAN_HEADER_BATCH = int(os.environ.get("PRSCAN_HEADER_BATCH", "1000"))
 
-    response_data = response.json()
-    if response_data and "height" in response_data:
-        return response_data["height"]
-    else:
-        return 0
-
-def get_block(height):
-
-    url = "http://127.0.0.1:17767/json_rpc"
+# stage timers, RPC histograms and rate-limited progress instead of a line per block
+metrics = ScanMetrics("prscan")
+daemon = DaemonPool(metrics=metrics)
 
-    headers = {
-        'Content-Type': 'application/json'
-    }
-    data = {
-        "jsonrpc": "2.0",
-        "id": "0",
-        "method": "get_block",
-        "params": {"height": height}
-    }
+# raw get_block responses, reruns in blocks mode replay them from disk
+cache = open_cache()
 
-    # response = requests.post(url, headers=headers, data=json.dumps(data))
-    # response_json = response.json()
-    # response.close()
-    # return response_json
 
-    try:
-        response = session.post(url, headers=headers, data=json.dumps(data))
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred: {e}")
-        return None
+def get_prs_for_range(height_range):
+    # returns {height: (pricing_record, block_hash)} for every header in the range that carries a pricing record
+    start_height, end_height = height_range
+    headers = daemon.get_block_headers_range(start_height, end_height) or []
+    pricing_records_by_height = {}
+    for header in headers:
+        if "height" in header and header.get("pricing_record"):
+            pricing_records_by_height[header["height"]] = (header["pricing_record"], header["hash"])
+    return pricing_records_by_height
 
 
 def get_pr_for_block(height):
-    response_data = get_block(height)
-    if response_data and "result" in response_data and "block_header" in response_data["result"]:
-        pricing_record = response_data["result"]["block_header"]["pricing_record"]
-        return pricing_record
-    else:
-        return None
-
-current_height = get_current_block_height()
+    # (pricing_record, block_hash), pricing_record is None only for a fetched block that has none
+    block_data = cached_block(cache, height, daemon.get_block, current_height)
+    if not (block_data and "block_header" in block_data):
+        # a failed fetch must not be written as a block without a pricing record, that row would be committed as an outage
+        raise RuntimeError(f"Could not fetch block {height}")
+    return block_data["block_header"].get("pricing_record"), block_data["block_header"]["hash"]
+
+parser = argparse.ArgumentParser(description="Scan pricing records into csvs/pricing_records.csv")
+parser.add_argument("--fresh", action="store_true", help="discard existing output and rescan from the hardfork height")
+args = parser.parse_args()
+
+current_height = offline_height(cache) if RPC_CACHE_OFFLINE else daemon.get_height()
 hf_height = 89300
 starting_height = hf_height
 
-pricing_records = []
-
 print("Start")
 print("Current Daemon height: ", current_height)
-#check if pricing_records.csv exists
-try:
-    df_pricing_records = pd.read_csv(Path("./py/csvs/pricing_records.csv"))
-    print("pricing_records.csv exists")
-    input = input("continue from existing pricing_records.csv? (y/n): ").lower()
-    if input == "y":
-        pricing_records = df_pricing_records.values.tolist()
-        starting_height = int(pricing_records[-1][0] + 1)
-        print("Starting from block: ", starting_height)
-except Exception as e:
-    print("pricing_records.csv does not exist or error: ", e)
-    
+
+# rows are appended and committed every CSV_COMMIT_INTERVAL blocks, a restart resumes from the last commit
+writer = StreamingCsvWriter(
+    Path("./py/csvs/pricing_records.progress.json"),
+    {
+        "pricing_records": (Path("./py/csvs/pricing_records.csv"), ["block", "timestamp", "spot", "moving_average", "reserve", "reserve_ma", "stable", "stable_ma"]),
+        "block_hashes": (Path("./py/csvs/pricing_records.block_hashes.csv"), LEDGER_COLUMNS),
+    },
+    fresh=args.fresh,
+    legacy_height_columns={"pricing_records": 0},
+)
+if writer.height is not None:
+    starting_height = writer.height + 1
+    print("Starting from block: ", starting_height)
+    # blocks committed before a reorg are rolled back and scanned again
+    fork_height = None if RPC_CACHE_OFFLINE else check_reorg(writer, "block_hashes", {"pricing_records": 0, "block_hashes": 0}, daemon.get_block_hashes, cache, current_height)
+    if fork_height is not None:
+        starting_height = fork_height
+
 prev_timestamp = 0
 
-for i in range(starting_height, current_height):
-    print("Block: ", i, " of ", current_height)
-    pricing_record = get_pr_for_block(i)
+def write_pricing_record(i, record):
+    global prev_timestamp
+    pricing_record, block_hash = record
+    writer.append("block_hashes", [[i, block_hash]])
 
     if pricing_record:
         block = i
@@ -92,17 +86,57 @@ for i in range(starting_height, current_height):
         reserve_ma = pricing_record["reserve_ma"] * (10**-12)
         stable = pricing_record["stable"] * (10**-12)
         stable_ma = pricing_record["stable_ma"] * (10**-12)
-        # add to priceing_records list
-        pricing_records.append([block, timestamp, spot, moving_average, reserve, reserve_ma, stable, stable_ma])
+        # add to pricing_records.csv
+        writer.append("pricing_records", [[block, timestamp, spot, moving_average, reserve, reserve_ma, stable, stable_ma]])
 
         # Update prev_timestamp
         prev_timestamp = timestamp
     else:
-        pricing_records.append([block, 0, 0, 0, 0, 0, 0, 0])
+        writer.append("pricing_records", [[i, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]])
         print("No pricing record for block: ", i)
 
-
-df_pricing_records = pd.DataFrame(pricing_records, columns=["block","timestamp", "spot", "moving_average", "reserve", "reserve_ma", "stable", "stable_ma"])
-print(df_pricing_records)
-
-df_pricing_records.to_csv(Path("./py/csvs/pricing_records.csv"), index=False)
\ No newline at end of file
+    if (i - starting_height + 1) % CSV_COMMIT_INTERVAL == 0:
+        writer.commit(i)
+
+def process_pricing_record(i, record):
+    with metrics.stage("write"):
+        write_pricing_record(i, record)
+    metrics.progress(i)
+
+def process_header_ranges(start_height, end_height):
+    # fetch PRSCAN_HEADER_BATCH headers per call, RPC_FETCH_THREADS ranges at a time
+    batch = PRSCAN_HEADER_BATCH
+    ranges = [(h, min(h + batch - 1, end_height)) for h in range(start_height, end_height + 1, batch)]
+    ranges_per_chunk = max(1, RPC_FETCH_THREADS)
+
+    for chunk_start in range(0, len(ranges), ranges_per_chunk):
+        chunk = ranges[chunk_start:chunk_start + ranges_per_chunk]
+        with metrics.stage("rpc"):
+            results = fetch_concurrent(chunk, get_prs_for_range, RPC_FETCH_THREADS)
+
+        for (range_start, range_end), pricing_records_by_height in zip(chunk, results):
+            # gaps (failed range, missing header or no pricing_record) fall back to per-block fetches
+            missing = [h for h in range(range_start, range_end + 1) if h not in pricing_records_by_height]
+            if missing:
+                print(f"Falling back to get_block for {len(missing)} heights in {range_start}-{range_end}")
+                with metrics.stage("rpc"):
+                    records = fetch_concurrent(missing, get_pr_for_block, RPC_FETCH_THREADS)
+                pricing_records_by_height.update(zip(missing, records))
+
+            for h in range(range_start, range_end + 1):
+                process_pricing_record(h, pricing_records_by_height[h])
+
+# prscan forks no workers, the health check thread can start right away
+daemon.start()
+metrics.start(starting_height, current_height - 1)
+if PRSCAN_MODE == "blocks" or RPC_CACHE_OFFLINE:
+    # fetch blocks concurrently in chunks (RPC_FETCH_THREADS / RPC_CHUNK_SIZE), records are still appended in height order
+    # offline replays always go through get_block, the cache holds no header ranges
+    process_height_range(starting_height, current_height - 1, get_pr_for_block, process_pricing_record, metrics=metrics)
+else:
+    process_header_ranges(starting_height, current_height - 1)
+
+writer.commit(max(starting_height, current_height) - 1)
+writer.close()
+metrics.close()
+print("Done, pricing records written up to block: ", writer.height)
@@ -0,0 +1,99 @@
+"""
+Vectorized reserve reconstruction.
+
+Rebuilds the per-block reserve / circulation / reserve ratio rows written to
+reserve_stats.csv in a single pass over the block rewards, txs and pricing
+records instead of filtering each frame once per height.
+"""
+
+import numpy as np
+import pandas as pd
+
+RESERVE_STATS_COLUMNS = ['block', 'spot', 'moving_average', 'reserve', 'zephusd_circ', 'zephrsv_circ', 'assets', 'assets_ma', 'liabilities', 'equity', 'equity_ma', 'reserve_ratio', 'reserve_ratio_ma', 'reserve_ratio_pct', 'reserve_ratio_ma_pct']
+
+# which amount column moves each running total, and in which direction, per conversion type
+CONVERSION_DELTAS = {
+    "mint_stable": {"reserve": ("from_amount", 1), "zephusd_circ": ("to_amount", 1)},
+    "mint_reserve": {"reserve": ("from_amount", 1), "zephrsv_circ": ("to_amount", 1)},
+    "redeem_stable": {"reserve": ("to_amount", -1), "zephusd_circ": ("from_amount", -1)},
+    "redeem_reserve": {"reserve": ("to_amount", -1), "zephrsv_circ": ("from_amount", -1)},
+}
+
+STATE_FIELDS = ["reserve", "zephusd_circ", "zephrsv_circ"]
+
+
+def empty_state():
+    return {"reserve": 0, "zephusd_circ": 0, "zephrsv_circ": 0}
+
+
+def compute_reserve_stats(df_pricing_records, df_txs, df_block_rewards, start_height, end_height, state=None):
+    """
+    Compute reserve stats rows for heights start_height <= h < end_height.
+
+    state is the running (reserve, zephusd_circ, zephrsv_circ) accumulator at
+    start_height; returns (df_reserve_stats, state at end_height).
+
+    Matches the original per-block loop: a block without a block reward row is
+    skipped entirely, a block without a pricing record still updates the
+    running totals but produces no row.
+    """
+    state = dict(empty_state() if state is None else state)
+
+    rewards = df_block_rewards[(df_block_rewards['block'] >= start_height) & (df_block_rewards['block'] < end_height)]
+    rewards = rewards.drop_duplicates('block', keep='first')
+    reward_blocks = rewards['block'].to_numpy(dtype=np.int64)
+
+    txs = df_txs[(df_txs['block'] >= start_height) & (df_txs['block'] < end_height)]
+    txs = txs[txs['conversion_type'].isin(list(CONVERSION_DELTAS)) & txs['block'].isin(reward_blocks)]
+
+    # signed deltas per event: the block reward first, then the block's txs in file order
+    n_txs = len(txs)
+    tx_deltas = {field: np.zeros(n_txs, dtype=np.float64) for field in STATE_FIELDS}
+    conversion_types = txs['conversion_type'].to_numpy()
+    for conversion_type, deltas in CONVERSION_DELTAS.items():
+        mask = conversion_types == conversion_type
+        for field, (column, sign) in deltas.items():
+            tx_deltas[field][mask] = sign * txs[column].to_numpy(dtype=np.float64)[mask]
+
+    events = pd.DataFrame({
+        'block': np.concatenate([reward_blocks, txs['block'].to_numpy(dtype=np.int64)]),
+        'kind': np.concatenate([np.zeros(len(reward_blocks), dtype=np.int8), np.ones(n_txs, dtype=np.int8)]),
+        'reserve': np.concatenate([rewards['reserve_reward'].to_numpy(dtype=np.float64), tx_deltas['reserve']]),
+        'zephusd_circ': np.concatenate([np.zeros(len(reward_blocks)), tx_deltas['zephusd_circ']]),
+        'zephrsv_circ': np.concatenate([np.zeros(len(reward_blocks)), tx_deltas['zephrsv_circ']]),
+    })
+    events = events.sort_values(['block', 'kind'], kind='mergesort')
+
+    if len(events) == 0:
+        return pd.DataFrame(columns=RESERVE_STATS_COLUMNS), state
+
+    # prepend the starting state so cumsum adds in the same order as the sequential loop
+    totals = {}
+    for field in STATE_FIELDS:
+        totals[field] = np.cumsum(np.concatenate([[state[field]], events[field].to_numpy()]))[1:]
+
+    # running totals at the end of each block
+    last = ~pd.Series(events['block'].to_numpy()).duplicated(keep='last').to_numpy()
+    df = pd.DataFrame({'block': events['block'].to_numpy()[last]})
+    for field in STATE_FIELDS:
+        df[field] = totals[field][last]
+
+    end_state = {field: float(totals[field][-1]) for field in STATE_FIELDS}
+
+    prs = df_pricing_records[['block', 'spot', 'moving_average']].drop_duplicates('block', keep='first')
+    df = df.merge(prs, on='block', how='inner')
+
+    df['assets'] = df['reserve'] * df['spot']
+    df['assets_ma'] = df['reserve'] * df['moving_average']
+    df['liabilities'] = df['zephusd_circ']
+    df['equity'] = df['assets'] - df['liabilities']
+    df['equity_ma'] = df['assets_ma'] - df['liabilities']
+
+    has_liabilities = df['liabilities'] > 0
+    liabilities = df['liabilities'].where(has_liabilities, 1)
+    df['reserve_ratio'] = (df['assets'] / liabilities).where(has_liabilities, 0)
+    df['reserve_ratio_ma'] = (df['assets_ma'] / liabilities).where(has_liabilities, 0)
+    df['reserve_ratio_pct'] = (df['assets'] / liabilities * 100).where(has_liabilities, 0)
+    df['reserve_ratio_ma_pct'] = (df['assets_ma'] / liabilities * 100).where(has_liabilities, 0)
+
+    return df[RESERVE_STATS_COLUMNS], end_state
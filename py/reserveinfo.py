@@ -1,134 +1,69 @@
-import pandas as pd
+import argparse
+import sys
 from pathlib import Path
 
-hf_height = 89300
-starting_height = hf_height
+from columnar import load_table, max_height, table_rollbacks
+from csv_stream import StreamingCsvWriter, rollback_height
+from reserve_engine import RESERVE_STATS_COLUMNS, compute_reserve_stats, empty_state
 
-df_pricing_records = pd.read_csv(Path("./py/csvs/pricing_records.csv"))
-df_txs = pd.read_csv(Path("./py/csvs/txs.csv"))
-df_block_rewards = pd.read_csv(Path("./py/csvs/block_rewards.csv"))
-
-#get top height from df_pricing_records (last row)
-current_height = int(df_pricing_records.tail(1)['block'].values[0])
+parser = argparse.ArgumentParser(description="Reconstruct reserve state from the scanner CSVs")
+parser.add_argument("--fresh", action="store_true", help="ignore any checkpoint and recompute from the hardfork height")
+args = parser.parse_args()
 
+hf_height = 89300
+starting_height = hf_height
 
-reserve_stats = []
+reserve_stats_path = Path("./py/csvs/reserve_stats.csv")
+# progress marker, also holds the running totals after the last committed height
+checkpoint_path = Path("./py/csvs/reserve_stats.progress.json")
 
-reserve = 0 #ZEPH
-zephusd_circ = 0
-zephrsv_circ = 0
-assets = 0
-assets_ma = 0
-liabilities  = 0
-equity = 0
-equity_ma = 0
-reserve_ratio = 0
-reserve_ratio_ma = 0
-reserve_ratio_pct = 0
-reserve_ratio_ma_pct = 0
+# txscan usually lags prscan, blocks past the last block reward would be checkpointed without their txs and rewards
+tip_heights = [max_height("pricing_records"), max_height("block_rewards")]
+if None in tip_heights:
+    sys.exit("No pricing records or block rewards yet, run prscan.py and txscan.py first")
+current_height = min(tip_heights)
 
 
 print("Start")
 print("Going to: ", current_height)
 
-try:
-    df_reserve_stats = pd.read_csv(Path("./py/csvs/reserve_stats.csv"))
-    print("Reserve stats csv found")
-    input = input("continue from existing reserve_stats.csv? (y/n): ").lower()
-    if input == "y":
-        reserve_stats = df_reserve_stats.values.tolist()
-        starting_height = int(reserve_stats[-1][0] + 1)
-except Exception as e:
-    print("Loading Reserve stats error", e)
-
-for i in range(starting_height, current_height):
-    try:
-        print("Block: ", i, " of ", current_height)
-        #get block reward for this block
-        df_current_block_reward = df_block_rewards[df_block_rewards['block'] == i]
-        reserve_reward = df_current_block_reward['reserve_reward'].values[0]
-
-        reserve += reserve_reward
-
-        #get txs for this block
-        df_current_block_txs = df_txs[df_txs['block'] == i]
-        if not df_current_block_txs.empty:
-            for index, row in df_current_block_txs.iterrows():
-                conversion_type = row['conversion_type']
-                from_amount = row['from_amount']
-                to_amount = row['to_amount']
-
-                if conversion_type == "mint_stable":
-                    zephusd_circ += to_amount
-                    reserve += from_amount
-                
-                elif conversion_type == "mint_reserve":
-                    zephrsv_circ += to_amount
-                    reserve += from_amount
-
-                elif conversion_type == "redeem_stable":
-                    zephusd_circ -= from_amount
-                    reserve -= to_amount
-
-                elif conversion_type == "redeem_reserve":
-                    zephrsv_circ -= from_amount
-                    reserve -= to_amount
-
-        
-        #get pricing record for this block
-        df_current_block_pricing_record = df_pricing_records[df_pricing_records['block'] == i]
-        spot = df_current_block_pricing_record['spot'].values[0]
-        moving_average = df_current_block_pricing_record['moving_average'].values[0]
-
-
-        #set current reserve stats
-        assets = reserve * spot
-        assets_ma = reserve * moving_average
-        liabilities  = zephusd_circ
-        equity = assets - liabilities 
-        equity_ma = assets_ma - liabilities 
-
-        #calculate reserve ratio
-        reserve_ratio = 0
-        reserve_ratio_ma = 0
-        reserve_ratio_pct = 0
-        reserve_ratio_ma_pct = 0
-        
-        if liabilities  > 0:
-            reserve_ratio = assets / liabilities 
-            reserve_ratio_ma = assets_ma / liabilities 
-            
-            reserve_ratio_pct = assets / liabilities  * 100
-            reserve_ratio_ma_pct = assets_ma / liabilities  * 100
-        
-
-        #add to reserve_stats list
-
-        reserve_stats.append([i, spot, moving_average, reserve, zephusd_circ, zephrsv_circ, assets, assets_ma, liabilities , equity, equity_ma, reserve_ratio, reserve_ratio_ma, reserve_ratio_pct, reserve_ratio_ma_pct])
-    except Exception as e:
-        print("Error: ", e)
-        continue
-
-
-
-#convert reserve_stats list to df
-df_reserve_stats = pd.DataFrame(reserve_stats, columns=['block', 'spot', 'moving_average','reserve', 'zephusd_circ', 'zephrsv_circ', 'assets', 'assets_ma', 'liabilities', 'equity', 'equity_ma', 'reserve_ratio', 'reserve_ratio_ma', 'reserve_ratio_pct', 'reserve_ratio_ma_pct'])
-print(df_reserve_stats)
-df_reserve_stats.to_csv(Path("./py/csvs/reserve_stats.csv"), index=False)
+# rows are appended to reserve_stats.csv and committed together with the running totals
+outputs = {"reserve_stats": (reserve_stats_path, RESERVE_STATS_COLUMNS)}
+writer = StreamingCsvWriter(checkpoint_path, outputs, fresh=args.fresh)
+
+# input rows rolled back after a reorg, the checkpoint records how many of them it has seen
+rollbacks = {name: table_rollbacks(name) for name in ["pricing_records", "txs", "block_rewards"]}
+if writer.height is not None:
+    seen = writer.state.get("rollbacks", {})
+    fork_heights = [rollback_height(heights, seen.get(name, 0)) for name, heights in rollbacks.items()]
+    fork_height = min((height for height in fork_heights if height is not None), default=None)
+    if fork_height is not None and fork_height <= writer.height:
+        # the running totals can't be taken back to the fork, so start over
+        print(f"Scanner csvs were rolled back to block {fork_height} after a reorg, recomputing from the hardfork")
+        writer.close()
+        writer = StreamingCsvWriter(checkpoint_path, outputs, fresh=True)
+
+# running totals at starting_height
+state = empty_state()
+if writer.height is not None:
+    starting_height = writer.height + 1
+    state = {field: writer.state[field] for field in state}
+    print("Resuming from checkpoint at block: ", writer.height)
+
+# only the columns and heights this run needs, from the csvs or the columnar store (PY_STORE)
+df_pricing_records = load_table("pricing_records", ["block", "spot", "moving_average"], starting_height, current_height)
+df_txs = load_table("txs", ["block", "conversion_type", "from_amount", "to_amount"], starting_height, current_height)
+df_block_rewards = load_table("block_rewards", ["block", "reserve_reward"], starting_height, current_height)
+
+# signed deltas per conversion type, grouped by block and cumulatively summed in one pass
+df_new_reserve_stats, state = compute_reserve_stats(df_pricing_records, df_txs, df_block_rewards, starting_height, current_height, state)
+
+
+# only the new rows are appended, earlier rows are never reloaded
+writer.append("reserve_stats", df_new_reserve_stats.itertuples(index=False))
+writer.commit(max(starting_height, current_height) - 1, {**state, "rollbacks": {name: len(heights) for name, heights in rollbacks.items()}})
+writer.close()
+print(df_new_reserve_stats)
 
 print("Done")
-print(df_reserve_stats.tail(1).transpose())
-
-
-
-
-
-
-            
-
-
-    
-
-
-
-
+print(df_new_reserve_stats.tail(1).transpose())
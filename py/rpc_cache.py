@@ -0,0 +1,234 @@
+"""
+On-disk cache of raw daemon responses.
+
+get_block results are stored by height and get_transactions entries by tx
+hash in a SQLite file, zlib compressed. Only blocks at least
+RPC_CACHE_MIN_DEPTH below the daemon height are cached, so everything in the
+cache is considered final. If a block is stored again with a different hash
+(a reorg deeper than that), the old block and every tx cached for its height or
+above are dropped; invalidate_from() does the same for callers that detect a
+reorg themselves.
+
+The cache is bounded by RPC_CACHE_MAX_MB. When it grows past the limit the
+least recently used entries are evicted until it is back under 90% of it.
+
+With RPC_CACHE_OFFLINE=1 the scanners never contact the daemon: misses are
+reported as missing and the scan height is the highest cached block + 1, so
+csvs can be re-derived from the cache alone.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+# cache file, "off" disables caching
+RPC_CACHE = os.environ.get("RPC_CACHE", "./py/cache/rpc.sqlite")
+RPC_CACHE_MAX_MB = int(os.environ.get("RPC_CACHE_MAX_MB", "2048"))
+RPC_CACHE_MIN_DEPTH = int(os.environ.get("RPC_CACHE_MIN_DEPTH", "20"))
+RPC_CACHE_OFFLINE = os.environ.get("RPC_CACHE_OFFLINE", "0") == "1"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (height INTEGER PRIMARY KEY, hash TEXT NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS txs (hash TEXT PRIMARY KEY, height INTEGER, body BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS blocks_used ON blocks (used);
+CREATE INDEX IF NOT EXISTS txs_used ON txs (used);
+CREATE INDEX IF NOT EXISTS txs_height ON txs (height);
+"""
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 1)
+
+
+def _unpack(body):
+    return json.loads(zlib.decompress(body))
+
+
+class RpcCache:
+    def __init__(self, path=RPC_CACHE, max_bytes=RPC_CACHE_MAX_MB * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # one connection shared by the fetch threads
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.size = self._stored_size()
+
+    def _stored_size(self):
+        blocks = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+        txs = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM txs").fetchone()[0]
+        return blocks + txs
+
+    def max_height(self):
+        with self.lock:
+            return self.db.execute("SELECT MAX(height) FROM blocks").fetchone()[0]
+
+    def get_block(self, height):
+        """Cached get_block result for a height, or None."""
+        with self.lock:
+            row = self.db.execute("SELECT body FROM blocks WHERE height = ?", (height,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE blocks SET used = ? WHERE height = ?", (time.time(), height))
+        return _unpack(row[0])
+
+    def put_block(self, height, result):
+        block_hash = result["block_header"]["hash"]
+        body = _pack(result)
+        with self.lock:
+            row = self.db.execute("SELECT hash FROM blocks WHERE height = ?", (height,)).fetchone()
+            if row is not None and row[0] != block_hash:
+                print(f"Cached block {height} hash changed, dropping cached entries from {height}")
+                self._invalidate_from(height)
+            self.db.execute("BEGIN")
+            old = self.db.execute("SELECT size FROM blocks WHERE height = ?", (height,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?)", (height, block_hash, body, len(body), time.time()))
+            self.db.execute("COMMIT")
+            self.size += len(body) - (old[0] if old else 0)
+            self._evict()
+
+    def put_blocks(self, results_by_height):
+        """Store many get_block results in one transaction, for bulk loads such as benchmark fixtures."""
+        rows = []
+        for height, result in results_by_height.items():
+            body = _pack(result)
+            rows.append((height, result["block_header"]["hash"], body, len(body), time.time()))
+        if not rows:
+            return
+        with self.lock:
+            heights = [row[0] for row in rows]
+            stored = {
+                height: (block_hash, size) for height, block_hash, size
+                in self.db.execute("SELECT height, hash, size FROM blocks WHERE height BETWEEN ? AND ?", (min(heights), max(heights)))
+            }
+            changed = [row[0] for row in rows if row[0] in stored and stored[row[0]][0] != row[1]]
+            if changed:
+                print(f"Cached block {min(changed)} hash changed, dropping cached entries from {min(changed)}")
+                self._invalidate_from(min(changed))
+                stored = {height: entry for height, entry in stored.items() if height < min(changed)}
+            self.db.execute("BEGIN")
+            self.db.executemany("INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?)", rows)
+            self.db.execute("COMMIT")
+            self.size += sum(row[3] for row in rows) - sum(stored[row[0]][1] for row in rows if row[0] in stored)
+            self._evict()
+
+    def get_txs(self, hashes):
+        """Return {tx_hash: tx_data} for the hashes found in the cache."""
+        found = {}
+        hashes = list(hashes)
+        with self.lock:
+            # stay under SQLite's bound parameter limit
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                for tx_hash, body in self.db.execute(f"SELECT hash, body FROM txs WHERE hash IN ({placeholders})", batch):
+                    found[tx_hash] = body
+                self.db.execute(f"UPDATE txs SET used = ? WHERE hash IN ({placeholders})", (time.time(), *batch))
+        return {tx_hash: _unpack(body) for tx_hash, body in found.items()}
+
+    def put_txs(self, txs_by_hash):
+        rows = []
+        for tx_hash, tx_data in txs_by_hash.items():
+            body = _pack(tx_data)
+            rows.append((tx_hash, tx_data.get("block_height"), body, len(body), time.time()))
+        if not rows:
+            return
+        with self.lock:
+            self.db.execute("BEGIN")
+            self.db.executemany("INSERT OR REPLACE INTO txs VALUES (?, ?, ?, ?, ?)", rows)
+            self.db.execute("COMMIT")
+            # only misses are fetched, so these rows are new
+            self.size += sum(row[3] for row in rows)
+            self._evict()
+
+    def invalidate_from(self, height):
+        """Drop cached blocks and txs at height and above."""
+        with self.lock:
+            self._invalidate_from(height)
+
+    def _invalidate_from(self, height):
+        self.db.execute("BEGIN")
+        self.db.execute("DELETE FROM blocks WHERE height >= ?", (height,))
+        self.db.execute("DELETE FROM txs WHERE height >= ?", (height,))
+        self.db.execute("COMMIT")
+        self.size = self._stored_size()
+
+    def _evict(self):
+        if self.size <= self.max_bytes:
+            return
+        self.size = self._stored_size()
+        target = int(self.max_bytes * 0.9)
+        self.db.execute("BEGIN")
+        while self.size > target:
+            # evict from whichever table holds the older entry, a few hundred rows at a time
+            oldest_block = self.db.execute("SELECT MIN(used) FROM blocks").fetchone()[0]
+            oldest_tx = self.db.execute("SELECT MIN(used) FROM txs").fetchone()[0]
+            if oldest_block is None and oldest_tx is None:
+                break
+            table, key = ("blocks", "height") if oldest_tx is None or (oldest_block is not None and oldest_block <= oldest_tx) else ("txs", "hash")
+            rows = self.db.execute(f"SELECT {key}, size FROM {table} ORDER BY used LIMIT 256").fetchall()
+            self.db.executemany(f"DELETE FROM {table} WHERE {key} = ?", [(row[0],) for row in rows])
+            self.size -= sum(row[1] for row in rows)
+        self.db.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def open_cache():
+    """The configured RpcCache, or None when RPC_CACHE=off."""
+    if RPC_CACHE.lower() == "off":
+        return None
+    return RpcCache()
+
+
+def offline_height(cache):
+    # what get_height would return if the daemon were at the last cached block
+    if cache is None or cache.max_height() is None:
+        return 0
+    return cache.max_height() + 1
+
+
+def cached_block(cache, height, fetch, tip_height):
+    """
+    get_block result for a height from the cache, falling back to fetch(height).
+
+    Fetched blocks at least RPC_CACHE_MIN_DEPTH below tip_height are stored.
+    """
+    if cache is None:
+        return fetch(height)
+    result = cache.get_block(height)
+    if result is not None or RPC_CACHE_OFFLINE:
+        return result
+    result = fetch(height)
+    if result and height < tip_height - RPC_CACHE_MIN_DEPTH:
+        cache.put_block(height, result)
+    return result
+
+
+def cached_txs(cache, hashes, fetch, tip_height):
+    """
+    {tx_hash: tx_data} for hashes from the cache, fetching only the misses with fetch(hashes).
+
+    Fetched txs at least RPC_CACHE_MIN_DEPTH below tip_height are stored.
+    """
+    if cache is None:
+        return fetch(hashes)
+    txs_by_hash = cache.get_txs(hashes)
+    missing = [tx_hash for tx_hash in hashes if tx_hash not in txs_by_hash]
+    if missing and not RPC_CACHE_OFFLINE:
+        fetched = fetch(missing)
+        txs_by_hash.update(fetched)
+        cache.put_txs({
+            tx_hash: tx_data for tx_hash, tx_data in fetched.items()
+            if tx_data.get("block_height") is not None and tx_data["block_height"] < tip_height - RPC_CACHE_MIN_DEPTH
+        })
+    return txs_by_hash
@@ -0,0 +1,164 @@
+"""
+Concurrent RPC fetch utility.
+
+Python counterpart of src/rpc-pool.ts: fetches heights in chunks with
+configurable concurrency, then hands the results back in order for
+sequential processing.
+
+With RPC_ADAPTIVE=1 (the default) the number of requests actually in flight is
+set by an AimdLimiter in the daemon client rather than by the thread count:
+the fetch pools get RPC_CONCURRENCY_MAX threads and the limiter, starting at
+RPC_CONCURRENCY, lets through as many as the daemon keeps up with.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+RPC_CONCURRENCY = int(os.environ.get("RPC_CONCURRENCY", "10"))
+RPC_CHUNK_SIZE = int(os.environ.get("RPC_CHUNK_SIZE", "500"))
+
+RPC_ADAPTIVE = os.environ.get("RPC_ADAPTIVE", "1") == "1"
+RPC_CONCURRENCY_MIN = int(os.environ.get("RPC_CONCURRENCY_MIN", "1"))
+RPC_CONCURRENCY_MAX = int(os.environ.get("RPC_CONCURRENCY_MAX", str(max(RPC_CONCURRENCY, 64))))
+# smoothed latency this many times the uncongested latency counts as overload
+RPC_LATENCY_TOLERANCE = float(os.environ.get("RPC_LATENCY_TOLERANCE", "2.0"))
+
+# fetch threads, the adaptive limiter decides how many of them have a request in flight
+RPC_FETCH_THREADS = RPC_CONCURRENCY_MAX if RPC_ADAPTIVE else RPC_CONCURRENCY
+
+# multiplicative decrease after a failed or timed out request, and after a latency spike
+AIMD_ERROR_DECREASE = 0.5
+AIMD_LATENCY_DECREASE = 0.8
+# below this, latency differences are noise rather than load
+AIMD_LATENCY_FLOOR = 0.005
+
+
+class AimdLimiter:
+    """
+    Cap on in-flight requests adjusted by additive increase, multiplicative decrease.
+
+    Every request runs between acquire() and release(). A request that
+    succeeds while the limit is in use raises the limit by 1/limit, so a fully
+    used limit grows by one per round of requests. A failed request (error or
+    timeout) halves it. When the smoothed latency of a call exceeds
+    RPC_LATENCY_TOLERANCE times its uncongested latency, the daemon is queueing
+    requests and the limit is cut by 20%. Requests already in flight when the
+    limit is cut don't cut it again, so one burst of failures counts once. The
+    limit stays within [minimum, maximum].
+    """
+
+    def __init__(self, initial=RPC_CONCURRENCY, minimum=RPC_CONCURRENCY_MIN, maximum=RPC_CONCURRENCY_MAX, latency_tolerance=RPC_LATENCY_TOLERANCE):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        # tickets are handed out in request order, a cut only counts for requests started after the previous one
+        self.started = 0
+        self.decrease_mark = 0
+        # call -> [uncongested latency estimate, smoothed latency]
+        self.latency = {}
+
+    def acquire(self):
+        """Wait for a free slot, returns a ticket for release()."""
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+            self.started += 1
+            return self.started
+
+    def release(self, ticket, call, latency, ok):
+        """
+        ticket  - from acquire()
+        call    - what was requested, latency baselines are kept per call
+        latency - seconds the request took
+        ok      - False for errors and timeouts that point at an overloaded daemon
+        """
+        with self.cond:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            if not ok:
+                self._decrease(ticket, AIMD_ERROR_DECREASE)
+            elif self._congested(call, latency):
+                self._decrease(ticket, AIMD_LATENCY_DECREASE)
+            elif saturated:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+    def _decrease(self, ticket, factor):
+        if ticket <= self.decrease_mark:
+            return
+        self.limit = max(self.minimum, self.limit * factor)
+        self.decrease_mark = self.started
+
+    def _congested(self, call, latency):
+        stats = self.latency.get(call)
+        if stats is None:
+            self.latency[call] = [latency, latency]
+            return False
+        baseline, smoothed = stats
+        # the baseline follows drops at once and rises slowly, so a node that got slower for good becomes the new normal
+        stats[0] = latency if latency < baseline else baseline + (latency - baseline) * 0.001
+        stats[1] = smoothed + (latency - smoothed) * 0.2
+        return stats[1] > max(stats[0] * self.latency_tolerance, AIMD_LATENCY_FLOOR)
+
+
+def fetch_concurrent(items, fetcher, concurrency=None, executor=None):
+    """
+    Fetch a list of items concurrently, returning results in input order.
+
+    items       - list of inputs to fetch
+    fetcher     - function that fetches a single item
+    concurrency - max concurrent fetches (default: RPC_FETCH_THREADS)
+    executor    - optional existing ThreadPoolExecutor to reuse between calls
+    """
+    if concurrency is None:
+        concurrency = RPC_FETCH_THREADS
+    items = list(items)
+    if not items:
+        return []
+    if concurrency <= 1 or len(items) == 1:
+        return [fetcher(item) for item in items]
+
+    if executor is not None:
+        return list(executor.map(fetcher, items))
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as pool:
+        return list(pool.map(fetcher, items))
+
+
+def process_height_range(start_height, end_height, fetcher, processor, chunk_size=None, concurrency=None, metrics=None):
+    """
+    Process a height range in chunks: fetch concurrently, then process sequentially.
+
+    start_height - first height to process (inclusive)
+    end_height   - last height to process (inclusive)
+    fetcher      - function that fetches data for a height
+    processor    - function called as processor(height, data) in height order. Return False to abort.
+    chunk_size   - number of heights per chunk (default: RPC_CHUNK_SIZE)
+    concurrency  - max concurrent fetches per chunk (default: RPC_FETCH_THREADS)
+    metrics      - optional ScanMetrics, fetches are timed as its "rpc" stage
+
+    Returns True if completed, False if aborted by the processor.
+    """
+    if chunk_size is None:
+        chunk_size = RPC_CHUNK_SIZE
+    if concurrency is None:
+        concurrency = RPC_FETCH_THREADS
+
+    # one pool for the whole range so threads (and their keep-alive connections) are reused
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for chunk_start in range(start_height, end_height + 1, chunk_size):
+            chunk_end = min(chunk_start + chunk_size - 1, end_height)
+            heights = list(range(chunk_start, chunk_end + 1))
+
+            with metrics.stage("rpc") if metrics else nullcontext():
+                results = fetch_concurrent(heights, fetcher, concurrency, executor=pool)
+
+            for height, data in zip(heights, results):
+                if processor(height, data) is False:
+                    return False
+    return True
@@ -0,0 +1,162 @@
+"""
+Combined single-pass scanner.
+
+Fetches every block once and writes pricing records, block rewards and
+conversion txs from the same get_block response, instead of running prscan.py
+and txscan.py one after the other (each fetching every block). Pricing records
+go into an in-memory PricingRecordIndex as blocks are scanned, so txs are
+classified without waiting for pricing_records.csv to be complete.
+
+Output is the same three csvs the separate scanners write. Progress is kept in
+csvs/scan.progress.json; don't alternate between this and prscan.py/txscan.py
+on the same csvs.
+
+Usage:
+    python py/scan.py [--fresh]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from block_ledger import LEDGER_COLUMNS, check_reorg
+from classify_pool import TxClassifier
+from csv_stream import StreamingCsvWriter
+from daemon_pool import DaemonPool
+from pricing_index import PricingRecordIndex
+from rpc_cache import RPC_CACHE_OFFLINE, offline_height, open_cache
+from scan_metrics import ScanMetrics
+from window_fetch import TXSCAN_BLOCK_WINDOW, WindowFetcher, block_tx_hashes
+
+CSV_DIR = Path("./py/csvs")
+OUTPUTS = {
+    "pricing_records": (CSV_DIR / "pricing_records.csv", ["block", "timestamp", "spot", "moving_average", "reserve", "reserve_ma", "stable", "stable_ma"]),
+    "txs": (CSV_DIR / "txs.csv", ["timestamp", "block", "hash", "conversion_type", "conversion_rate", "from_asset", "from_amount", "to_asset", "to_amount", "conversion_fee_asset", "conversion_fee_amount", "tx_fee_asset", "tx_fee_amount", "timestamp", "block"]),
+    "block_rewards": (CSV_DIR / "block_rewards.csv", ["block", "miner_reward", "governance_reward", "reserve_reward"]),
+    "block_hashes": (CSV_DIR / "scan.block_hashes.csv", LEDGER_COLUMNS),
+}
+# block height column of each output, used to roll back after a reorg
+HEIGHT_COLUMNS = {"pricing_records": 0, "txs": 1, "block_rewards": 0, "block_hashes": 0}
+
+# stage timers, RPC histograms and rate-limited progress instead of a line per block
+metrics = ScanMetrics("scan")
+daemon = DaemonPool(metrics=metrics)
+
+# raw get_block / get_transactions responses, reruns replay them from disk
+cache = open_cache()
+
+
+def pricing_record_row(height, pricing_record):
+    # same row prscan.py writes, all zeros when the block has no pricing record
+    if not pricing_record:
+        print("No pricing record for block: ", height)
+        return [height, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+    return [
+        height,
+        pricing_record["timestamp"],
+        pricing_record["spot"] * (10**-12),
+        pricing_record["moving_average"] * (10**-12),
+        pricing_record["reserve"] * (10**-12),
+        pricing_record["reserve_ma"] * (10**-12),
+        pricing_record["stable"] * (10**-12),
+        pricing_record["stable_ma"] * (10**-12),
+    ]
+
+
+def scan_window(start_height, end_height):
+    """
+    Fetch a window of blocks once and return (pricing_records, txs, block_rewards, block_hashes) rows for it.
+
+    Raises RuntimeError if a block or tx in the window could not be fetched, so the
+    window is never committed with a hole in it.
+    """
+    heights, blocks, txs_by_hash = fetcher.fetch(start_height, end_height)
+
+    # pricing records first, a tx always refers to a pricing record from an earlier block
+    pricing_records = []
+    block_hashes = []
+    for height, block_data in zip(heights, blocks):
+        row = pricing_record_row(height, block_data["block_header"].get("pricing_record"))
+        pricing_index.add(row[0], *row[2:])
+        pricing_records.append(row)
+        block_hashes.append([height, block_data["block_header"]["hash"]])
+
+    # the whole window is classified in one batch, miner tx first in every block
+    jobs = [
+        (txs_by_hash.get(hash, {}), hash, height)
+        for height, block_data in zip(heights, blocks)
+        for hash in block_tx_hashes(block_data)
+    ]
+    with metrics.stage("classify"):
+        results = iter(classifier.classify(jobs))
+
+    txs = []
+    block_rewards = []
+    for height, block_data in zip(heights, blocks):
+        timestamp = block_data["block_header"]["timestamp"]
+        _, block_reward_info = next(results)
+        if block_reward_info:
+            block_rewards.append(block_reward_info)
+        for _ in block_data.get("tx_hashes", []):
+            tx_info, _ = next(results)
+            if tx_info:
+                txs.append([timestamp, height, *tx_info, timestamp, height])
+    return pricing_records, txs, block_rewards, block_hashes
+
+
+parser = argparse.ArgumentParser(description="Scan pricing records, block rewards and conversion txs in one pass over the blocks")
+parser.add_argument("--fresh", action="store_true", help="discard existing output and rescan from the hardfork height")
+args = parser.parse_args()
+
+marker_path = CSV_DIR / "scan.progress.json"
+if not args.fresh and not marker_path.exists() and any(path.exists() for path, _ in OUTPUTS.values()):
+    # csvs from prscan.py/txscan.py can stop at different heights, so they are not adopted
+    sys.exit("csvs from another scanner exist in py/csvs, rerun with --fresh to rescan them with scan.py")
+
+current_height = offline_height(cache) if RPC_CACHE_OFFLINE else daemon.get_height()
+hf_height = 89300
+starting_height = hf_height
+
+fetcher = WindowFetcher(daemon, cache, current_height, metrics)
+
+# rows are appended and committed after every window, a restart resumes from the last commit
+writer = StreamingCsvWriter(marker_path, OUTPUTS, fresh=args.fresh)
+if writer.height is not None:
+    starting_height = writer.height + 1
+    print("Starting from block: ", starting_height)
+    # blocks committed before a reorg are rolled back and scanned again
+    fork_height = None if RPC_CACHE_OFFLINE else check_reorg(writer, "block_hashes", HEIGHT_COLUMNS, daemon.get_block_hashes, cache, current_height)
+    if fork_height is not None:
+        starting_height = fork_height
+
+# resumed scans still need the pricing records written so far
+if starting_height > hf_height:
+    pricing_index = PricingRecordIndex.from_csv(OUTPUTS["pricing_records"][0])
+else:
+    pricing_index = PricingRecordIndex(hf_height)
+
+# workers share the index, sized up front for every height this scan adds
+classifier = TxClassifier(pricing_index, capacity=current_height - pricing_index.base_height)
+pricing_index = classifier.pricing_index
+# TxClassifier forked all of its workers up front, so the health check thread can start
+daemon.start()
+
+print("Start")
+print("Current Daemon height: ", current_height)
+metrics.start(starting_height, current_height - 1)
+for window_start in range(starting_height, current_height, TXSCAN_BLOCK_WINDOW):
+    window_end = min(window_start + TXSCAN_BLOCK_WINDOW - 1, current_height - 1)
+    pricing_records, txs, block_rewards, block_hashes = scan_window(window_start, window_end)
+
+    with metrics.stage("write"):
+        writer.append("pricing_records", pricing_records)
+        writer.append("txs", txs)
+        writer.append("block_rewards", block_rewards)
+        writer.append("block_hashes", block_hashes)
+        writer.commit(window_end)
+    metrics.progress(window_end, window_end - window_start + 1)
+
+classifier.close()
+writer.close()
+metrics.close()
+print("Done, pricing records, txs and block rewards written up to block: ", writer.height)
@@ -0,0 +1,248 @@
+"""
+Scanner instrumentation: stage timers, RPC latency histograms and progress.
+
+ScanMetrics collects
+
+    stage seconds   - time spent in rpc, decode, classify and write (summed over
+                      threads, so rpc and decode can add up to more than wall time)
+    RPC histograms  - latency (until response headers) and bytes received (on the
+                      wire, before gzip decoding) per RPC method, from a response
+                      hook on the requests session
+    progress        - blocks processed, blocks/s over the last interval and ETA
+    gauges          - current values set by other components, e.g. the adaptive
+                      RPC concurrency limit
+
+Every METRICS_INTERVAL seconds a one-line progress report is printed instead
+of a line per block. With METRICS_FILE set the same snapshot is exported there:
+METRICS_FORMAT=json appends one JSON object per interval, METRICS_FORMAT=prometheus
+rewrites a Prometheus textfile (for node_exporter's textfile collector).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_FORMAT = os.environ.get("METRICS_FORMAT", "json").lower()
+METRICS_INTERVAL = float(os.environ.get("METRICS_INTERVAL", "10"))
+
+STAGES = ["rpc", "decode", "classify", "write"]
+# upper bounds in seconds, the last bucket is +Inf
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+# help text for the gauges set with set_gauge()
+GAUGE_HELP = {
+    "rpc_concurrency_limit": "Adaptive limit on in-flight RPC requests, summed over the daemons that are up",
+    "rpc_daemons_up": "Daemons answering requests",
+}
+
+
+class RpcHistogram:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def observe(self, seconds, nbytes):
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        self.buckets[index] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.bytes += nbytes
+
+    def cumulative(self):
+        # (le label, cumulative count) pairs, Prometheus style
+        total = 0
+        for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets):
+            total += count
+            yield bound, total
+
+
+def _rpc_method(response):
+    # json_rpc calls are told apart by the method in the request body
+    path = response.request.path_url.split("?")[0]
+    if path.endswith("/json_rpc") and response.request.body:
+        try:
+            return json.loads(response.request.body).get("method", "json_rpc")
+        except ValueError:
+            return "json_rpc"
+    return path.rsplit("/", 1)[-1]
+
+
+class ScanMetrics:
+    def __init__(self, script, path=METRICS_FILE, format=METRICS_FORMAT, interval=METRICS_INTERVAL):
+        """
+        script   - label for the exported metrics
+        path     - export file, empty to only print progress
+        format   - "json" (one line per interval) or "prometheus" (textfile)
+        interval - seconds between progress reports and exports
+        """
+        if format not in ("json", "prometheus"):
+            raise ValueError(f"Unknown METRICS_FORMAT {format!r}, expected json or prometheus")
+        self.script = script
+        self.path = Path(path) if path else None
+        self.format = format
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.rpc = {}
+        self.gauges = {}
+        self.start_height = self.target_height = self.height = None
+        self.blocks = 0
+        self.started = time.monotonic()
+        self.last_report = (self.started, 0)
+        self.blocks_per_s = 0.0
+
+    def instrument(self, session):
+        """Record every response of a requests session in the RPC histograms."""
+        session.hooks["response"].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        nbytes = response.headers.get("Content-Length")
+        self.record_rpc(_rpc_method(response), response.elapsed.total_seconds(), int(nbytes) if nbytes else len(response.content))
+
+    def record_rpc(self, method, seconds, nbytes):
+        with self.lock:
+            self.rpc.setdefault(method, RpcHistogram()).observe(seconds, nbytes)
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def start(self, start_height, target_height):
+        """Set the range being scanned, target_height is the last height to process."""
+        self.start_height = start_height
+        self.target_height = target_height
+        self.started = time.monotonic()
+        self.last_report = (self.started, 0)
+        print(f"Scanning blocks {start_height} to {target_height}")
+
+    def progress(self, height, blocks=1):
+        """Count processed blocks up to height, reporting at most once per interval."""
+        self.height = height
+        self.blocks += blocks
+        now = time.monotonic()
+        if now - self.last_report[0] >= self.interval:
+            self._report(now)
+
+    def eta(self):
+        # seconds left at the last interval's rate
+        if self.target_height is None or self.height is None or not self.blocks_per_s:
+            return None
+        return max(0, self.target_height - self.height) / self.blocks_per_s
+
+    def _report(self, now):
+        reported_at, reported_blocks = self.last_report
+        if now > reported_at:
+            self.blocks_per_s = (self.blocks - reported_blocks) / (now - reported_at)
+        self.last_report = (now, self.blocks)
+        self._print_progress()
+        self.export()
+
+    def _print_progress(self):
+        if self.height is None:
+            return
+        line = f"Block {self.height} of {self.target_height}, {self.blocks_per_s:.0f} blocks/s"
+        total = (self.target_height or 0) - (self.start_height or 0) + 1
+        if total > 0:
+            line += f" ({(self.height - self.start_height + 1) / total:.1%})"
+        eta = self.eta()
+        if eta is not None:
+            minutes, seconds = divmod(int(eta), 60)
+            line += f", ETA {minutes // 60}:{minutes % 60:02d}:{seconds:02d}"
+        if "rpc_concurrency_limit" in self.gauges:
+            line += f", {self.gauges['rpc_concurrency_limit']} concurrent RPCs"
+        print(line, flush=True)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "time": round(time.time(), 3),
+                "script": self.script,
+                "height": self.height,
+                "target_height": self.target_height,
+                "blocks": self.blocks,
+                "elapsed_s": round(time.monotonic() - self.started, 3),
+                "blocks_per_s": round(self.blocks_per_s, 2),
+                "eta_s": None if self.eta() is None else round(self.eta(), 1),
+                "stages_s": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                "gauges": dict(self.gauges),
+                "rpc": {
+                    method: {"count": hist.count, "seconds": round(hist.seconds, 4), "bytes": hist.bytes, "buckets": dict(hist.cumulative())}
+                    for method, hist in self.rpc.items()
+                },
+            }
+
+    def export(self):
+        if self.path is None:
+            return
+        snapshot = self.snapshot()
+        if self.format == "json":
+            with open(self.path, "a") as f:
+                f.write(json.dumps(snapshot) + "\n")
+            return
+        # written to a temp file and renamed, the collector never reads a half written file
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(_prometheus_text(snapshot))
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        """Final progress report, totals and export."""
+        now = time.monotonic()
+        if self.blocks > self.last_report[1]:
+            self._report(now)
+        else:
+            self.export()
+        elapsed = now - self.started
+        stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self.stages.items())
+        print(f"{self.blocks} blocks in {elapsed:.1f}s ({self.blocks / elapsed if elapsed else 0:.0f} blocks/s), {stages}")
+
+
+def _prometheus_text(snapshot):
+    script = snapshot["script"]
+    lines = []
+
+    def metric(name, kind, help, samples):
+        lines.append(f"# HELP zephyr_py_{name} {help}")
+        lines.append(f"# TYPE zephyr_py_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{val}"' for key, val in {"script": script, **labels}.items())
+            lines.append(f"zephyr_py_{name}{{{label_text}}} {value}")
+
+    metric("scan_blocks_total", "counter", "Blocks processed", [({}, snapshot["blocks"])])
+    metric("scan_blocks_per_second", "gauge", "Blocks processed per second over the last interval", [({}, snapshot["blocks_per_s"])])
+    # unknown until the scan has started and run for an interval
+    for name, key, help in (
+        ("scan_height", "height", "Last height processed"),
+        ("scan_target_height", "target_height", "Last height this scan will process"),
+        ("scan_eta_seconds", "eta_s", "Estimated seconds until target_height"),
+    ):
+        if snapshot[key] is not None:
+            metric(name, "gauge", help, [({}, snapshot[key])])
+    for name, value in snapshot["gauges"].items():
+        metric(name, "gauge", GAUGE_HELP.get(name, name), [({}, value)])
+    metric("scan_stage_seconds_total", "counter", "Seconds spent per stage, summed over threads",
+           [({"stage": stage}, seconds) for stage, seconds in snapshot["stages_s"].items()])
+    metric("rpc_response_bytes_total", "counter", "Response bytes received per RPC method",
+           [({"method": method}, rpc["bytes"]) for method, rpc in snapshot["rpc"].items()])
+
+    lines.append("# HELP zephyr_py_rpc_latency_seconds RPC latency until response headers")
+    lines.append("# TYPE zephyr_py_rpc_latency_seconds histogram")
+    for method, rpc in snapshot["rpc"].items():
+        for bound, count in rpc["buckets"].items():
+            lines.append(f'zephyr_py_rpc_latency_seconds_bucket{{script="{script}",method="{method}",le="{bound}"}} {count}')
+        lines.append(f'zephyr_py_rpc_latency_seconds_sum{{script="{script}",method="{method}"}} {rpc["seconds"]}')
+        lines.append(f'zephyr_py_rpc_latency_seconds_count{{script="{script}",method="{method}"}} {rpc["count"]}')
+    return "\n".join(lines) + "\n"
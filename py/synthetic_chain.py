@@ -0,0 +1,155 @@
+"""
+Deterministic synthetic Zephyr chain for benchmarks and tests.
+
+Every block, header and tx is a pure function of its height, shaped like the
+daemon's responses (get_block results, get_block_headers_range headers and
+/get_transactions entries with a nested as_json string), so fixtures of any
+size can be generated without a daemon and regenerated identically.
+
+Blocks start at HF_HEIGHT. Each block has a miner tx paying a block reward and
+0-3 conversion txs cycling through mint/redeem stable/reserve, priced against
+the previous block's pricing record. Tx hashes encode their height and index,
+so a tx can be rebuilt from its hash alone.
+"""
+
+import hashlib
+import json
+import math
+
+HF_HEIGHT = 89300
+GENESIS_TIMESTAMP = 1696152427
+BLOCK_TIME = 120
+ATOMIC_UNITS = 10**12
+
+# conversion txs per block, cycled by height (0.875 per block on average)
+CONVERSIONS_PER_BLOCK = (0, 1, 0, 2, 0, 3, 1, 0)
+CONVERSION_KINDS = (("ZEPH", "ZEPHUSD"), ("ZEPHUSD", "ZEPH"), ("ZEPH", "ZEPHRSV"), ("ZEPHRSV", "ZEPH"))
+MINER_TX_INDEX = 0xFFFFFFFF
+
+
+def block_hash(height):
+    return hashlib.sha256(f"synthetic-block-{height}".encode()).hexdigest()
+
+
+def tx_hash(height, index):
+    return f"{height:056x}{index:08x}"
+
+
+def tx_position(hash):
+    """(height, index) encoded in a synthetic tx hash."""
+    return int(hash[:56], 16), int(hash[56:], 16)
+
+
+def conversion_count(height):
+    return CONVERSIONS_PER_BLOCK[height % len(CONVERSIONS_PER_BLOCK)]
+
+
+def pricing_record(height):
+    # slow drifts so moving averages lag spot and conversions hit both max/min branches
+    t = height - HF_HEIGHT
+    spot = 1.5 + 0.5 * math.sin(t / 5000)
+    moving_average = 1.5 + 0.5 * math.sin((t - 720) / 5000)
+    reserve = 0.8 + 0.3 * math.sin(t / 7000)
+    reserve_ma = 0.8 + 0.3 * math.sin((t - 720) / 7000)
+    return {
+        "timestamp": GENESIS_TIMESTAMP + height * BLOCK_TIME,
+        "spot": int(spot * ATOMIC_UNITS),
+        "moving_average": int(moving_average * ATOMIC_UNITS),
+        "reserve": int(reserve * ATOMIC_UNITS),
+        "reserve_ma": int(reserve_ma * ATOMIC_UNITS),
+        "stable": int(ATOMIC_UNITS / spot),
+        "stable_ma": int(ATOMIC_UNITS / moving_average),
+        "signature": "00" * 64,
+    }
+
+
+def header(height):
+    """Block header as returned by get_block_headers_range."""
+    return {
+        "height": height,
+        "hash": block_hash(height),
+        "prev_hash": block_hash(height - 1),
+        "timestamp": GENESIS_TIMESTAMP + height * BLOCK_TIME,
+        "difficulty": 1_000_000_000 + height,
+        "major_version": 4,
+        "minor_version": 4,
+        "num_txes": conversion_count(height),
+        "reward": 10_000_000_000_000,
+        "pricing_record": pricing_record(height),
+    }
+
+
+def block(height):
+    """get_block result for a height."""
+    return {
+        "block_header": header(height),
+        "miner_tx_hash": tx_hash(height, MINER_TX_INDEX),
+        "tx_hashes": [tx_hash(height, index) for index in range(conversion_count(height))],
+        "status": "OK",
+    }
+
+
+def _miner_tx_json(height):
+    return {
+        "version": 2,
+        "unlock_time": height + 60,
+        "vin": [{"gen": {"height": height}}],
+        "vout": [
+            {"amount": 7_500_000_000_000, "target": {"tagged_key": {"key": "ab" * 32, "asset_type": "ZEPH", "view_tag": "3f"}}},
+            {"amount": 500_000_000_000, "target": {"tagged_key": {"key": "cd" * 32, "asset_type": "ZEPH", "view_tag": "a1"}}},
+        ],
+        "extra": list(range(44)),
+        "amount_burnt": 0,
+        "amount_minted": 0,
+        "rct_signatures": {"type": 0},
+    }
+
+
+def _conversion_tx_json(height, index):
+    from_asset, to_asset = CONVERSION_KINDS[(height + index) % len(CONVERSION_KINDS)]
+    record = pricing_record(height - 1)
+    amount_burnt = ATOMIC_UNITS * (1 + (height * 7 + index * 13) % 500)
+    if from_asset == "ZEPH":
+        rate = record["spot"] if to_asset == "ZEPHUSD" else record["reserve"]
+        amount_minted = amount_burnt * rate // ATOMIC_UNITS
+    else:
+        rate = record["spot"] if from_asset == "ZEPHUSD" else record["reserve"]
+        amount_minted = amount_burnt * ATOMIC_UNITS // rate
+    return {
+        "version": 2,
+        "unlock_time": 0,
+        "vin": [{"key": {"amount": 0, "asset_type": from_asset, "key_offsets": [height * 3 + i for i in range(16)], "k_image": "ef" * 32}}],
+        "vout": [
+            {"amount": 0, "target": {"tagged_key": {"key": "12" * 32, "asset_type": to_asset, "view_tag": "07"}}},
+            {"amount": 0, "target": {"tagged_key": {"key": "34" * 32, "asset_type": from_asset, "view_tag": "b2"}}},
+        ],
+        "extra": list(range(76)),
+        "amount_burnt": amount_burnt,
+        "amount_minted": amount_minted,
+        "pricing_record_height": height - 1,
+        "rct_signatures": {
+            "type": 6,
+            "txnFee": 30_000_000 + index * 1_000_000,
+            "ecdhInfo": [{"amount": "56" * 8}, {"amount": "78" * 8}],
+            "outPk": ["9a" * 32, "bc" * 32],
+        },
+        "rctsig_prunable": {"nbp": 1, "bpp": [{"A": "de" * 32, "L": ["f0" * 32] * 7, "R": ["f1" * 32] * 7}], "CLSAGs": [{"s": ["f2" * 32] * 16, "c1": "f3" * 32, "D": "f4" * 32}]},
+    }
+
+
+def transaction(hash):
+    """/get_transactions entry for a synthetic tx hash."""
+    height, index = tx_position(hash)
+    tx_json = _miner_tx_json(height) if index == MINER_TX_INDEX else _conversion_tx_json(height, index)
+    return {
+        "tx_hash": hash,
+        "as_json": json.dumps(tx_json),
+        "block_height": height,
+        "block_timestamp": GENESIS_TIMESTAMP + height * BLOCK_TIME,
+        "in_pool": False,
+    }
+
+
+def tx_count(start_height, end_height):
+    """Conversion txs in heights start_height..end_height (inclusive)."""
+    return sum(conversion_count(height) for height in range(start_height, end_height + 1))
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# the py/ scripts import their siblings directly
+PY_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PY_DIR))
+
+from mock_daemon import MockDaemonServer, SyntheticChain  # noqa: E402
+
+
+@pytest.fixture
+def mock_daemon():
+    """Factory for mock daemons serving a synthetic chain, returns (server, url). Stopped after the test."""
+    servers = []
+
+    def start(blocks, **options):
+        server = MockDaemonServer(("127.0.0.1", 0), SyntheticChain(blocks), **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def run_script():
+    """Function running a py/ script with work_dir as the repo root (so on ./py/csvs), returns the CompletedProcess."""
+    return _run_script
+
+
+def _run_script(work_dir, script, *args, env=None, check=True):
+    script_env = {name: value for name, value in os.environ.items() if name != "PY_STORE"}
+    script_env.update(env or {})
+    (Path(work_dir) / "py" / "csvs").mkdir(parents=True, exist_ok=True)
+    result = subprocess.run([sys.executable, str(PY_DIR / script), *args], cwd=work_dir, env=script_env, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    if check:
+        assert result.returncode == 0, result.stdout + result.stderr
+    return result
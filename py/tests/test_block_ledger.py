@@ -0,0 +1,124 @@
+import pytest
+
+from block_ledger import LEDGER_COLUMNS, check_reorg, find_fork_point
+from csv_stream import StreamingCsvWriter, read_tail_rows
+
+FIRST_HEIGHT = 1000
+
+
+def chain(length, fork_height=None):
+    # {height: hash}, hashes from fork_height on belong to another branch
+    return {
+        height: f"{'b' if fork_height is not None and height >= fork_height else 'a'}{height}"
+        for height in range(FIRST_HEIGHT, FIRST_HEIGHT + length)
+    }
+
+
+def write_ledger(path, hashes):
+    with open(path, "w") as f:
+        f.write(",".join(LEDGER_COLUMNS) + "\n")
+        for height, block_hash in hashes.items():
+            f.write(f"{height},{block_hash}\n")
+
+
+def fetcher(hashes, calls=None):
+    def fetch_hashes(start_height, end_height):
+        if calls is not None:
+            calls.append((start_height, end_height))
+        return {height: hashes[height] for height in range(start_height, end_height + 1) if height in hashes}
+    return fetch_hashes
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    path = tmp_path / "block_hashes.csv"
+    write_ledger(path, chain(50))
+    return path
+
+
+def test_matching_chain(ledger):
+    calls = []
+    assert find_fork_point(ledger, fetcher(chain(50), calls), depth=10) is None
+    # only the tail of the ledger is checked
+    assert calls == [(1040, 1049)]
+
+
+def test_fork_inside_the_checked_window(ledger):
+    assert find_fork_point(ledger, fetcher(chain(50, fork_height=1045)), depth=10) == 1045
+
+
+def test_fork_below_the_checked_window_widens_the_search(ledger):
+    calls = []
+    assert find_fork_point(ledger, fetcher(chain(50, fork_height=1012), calls), depth=10) == 1012
+    assert calls == [(1040, 1049), (1030, 1049), (1010, 1049)]
+
+
+def test_whole_ledger_off_the_chain(ledger):
+    assert find_fork_point(ledger, fetcher(chain(50, fork_height=FIRST_HEIGHT)), depth=10) == FIRST_HEIGHT
+
+
+def test_shorter_daemon_chain(ledger):
+    # blocks past the daemon's last header were dropped by the reorg
+    assert find_fork_point(ledger, fetcher(chain(47)), depth=10) == 1047
+
+
+def test_gap_in_the_response_is_not_a_fork(ledger):
+    hashes = chain(50)
+    del hashes[1043]
+    assert find_fork_point(ledger, fetcher(hashes), depth=10) is None
+
+
+def test_tip_height_limits_the_fetched_range(ledger):
+    calls = []
+    assert find_fork_point(ledger, fetcher(chain(45), calls), depth=10, tip_height=1045) == 1045
+    assert calls == [(1040, 1044)]
+
+
+def test_ledger_past_the_tip_is_never_fetched(ledger):
+    calls = []
+    assert find_fork_point(ledger, fetcher(chain(20), calls), depth=10, tip_height=1020) == 1020
+    # the tail windows are entirely past the tip, headers are only asked for once the window reaches below it
+    assert calls == [(1010, 1019)]
+
+
+def test_failed_header_fetch_raises(ledger):
+    with pytest.raises(RuntimeError):
+        find_fork_point(ledger, lambda start_height, end_height: None, depth=10)
+
+
+def test_uncommitted_ledger_rows_are_ignored(tmp_path):
+    path = tmp_path / "block_hashes.csv"
+    write_ledger(path, chain(50))
+    committed = path.stat().st_size
+    with open(path, "a") as f:
+        f.write("1050,x1050\n")
+    assert find_fork_point(path, fetcher(chain(50)), depth=10, end=committed) is None
+
+
+class FakeCache:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate_from(self, height):
+        self.invalidated.append(height)
+
+
+def test_check_reorg_rolls_back_the_writer(tmp_path):
+    outputs = {
+        "rows": (tmp_path / "rows.csv", ["value", "block"]),
+        "block_hashes": (tmp_path / "block_hashes.csv", LEDGER_COLUMNS),
+    }
+    writer = StreamingCsvWriter(tmp_path / "rows.progress.json", outputs)
+    hashes = chain(50)
+    writer.append("rows", [[f"v{height}", height] for height in hashes])
+    writer.append("block_hashes", list(hashes.items()))
+    writer.commit(max(hashes))
+
+    cache = FakeCache()
+    fork_height = check_reorg(writer, "block_hashes", {"rows": 1, "block_hashes": 0}, fetcher(chain(50, fork_height=1030)), cache, tip_height=1050)
+    assert fork_height == 1030
+    assert writer.height == 1029
+    assert writer.rollbacks == [1030]
+    assert cache.invalidated == [1030]
+    assert int(read_tail_rows(tmp_path / "rows.csv", 1)[0][1]) == 1029
+    writer.close()
@@ -0,0 +1,32 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from classify_pool import TxClassifier
+from pricing_index import PricingRecordIndex
+from synthetic_chain import HF_HEIGHT
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="workers are only forked")
+
+
+@pytest.fixture
+def on_demand_workers(monkeypatch):
+    # ProcessPoolExecutor as on early 3.9 and 3.10 patch releases, one worker forked per submit when none is idle
+    init = ProcessPoolExecutor.__init__
+
+    def on_demand_init(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        self._safe_to_dynamically_spawn_children = True
+
+    monkeypatch.setattr(ProcessPoolExecutor, "__init__", on_demand_init)
+
+
+def test_every_worker_is_forked_up_front(on_demand_workers):
+    classifier = TxClassifier(PricingRecordIndex(HF_HEIGHT), processes=3, capacity=10)
+    try:
+        assert len(classifier.pool._processes) == 3
+        assert all(process.is_alive() for process in classifier.pool._processes.values())
+    finally:
+        classifier.close()
+
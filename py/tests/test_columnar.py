@@ -0,0 +1,135 @@
+import json
+
+import pandas as pd
+import pytest
+
+import columnar
+from columnar import SCHEMAS, ColumnStore, import_csvs
+
+HF_HEIGHT = 89300
+CONVERSIONS = [("mint_stable", "ZEPH", "ZEPHUSD", "ZEPHUSD"), ("mint_reserve", "ZEPH", "ZEPHRSV", "N/A"), ("redeem_stable", "ZEPHUSD", "ZEPH", "ZEPH")]
+
+
+def block_rewards(start, end):
+    return pd.DataFrame([[height, 6.0 + height % 5 * 1e-12, 0.3, 0.123456789012] for height in range(start, end)], columns=list(SCHEMAS["block_rewards"]))
+
+
+def txs(start, end):
+    rows = []
+    for height in range(start, end, 2):
+        conversion_type, from_asset, to_asset, fee_asset = CONVERSIONS[height % len(CONVERSIONS)]
+        rows.append([1710000000 + height, height, f"{height:064x}", conversion_type, 1.25, from_asset, 2.5, to_asset, 3.125, fee_asset, 0.0 if fee_asset == "N/A" else 0.02, from_asset, 3e-05])
+    return pd.DataFrame(rows, columns=list(SCHEMAS["txs"]))
+
+
+@pytest.fixture
+def csv_dir(tmp_path, monkeypatch):
+    csv_dir = tmp_path / "csvs"
+    csv_dir.mkdir()
+    monkeypatch.setattr(columnar, "CSV_DIR", csv_dir)
+    return csv_dir
+
+
+def write(csv_dir, end, marker_height=None, rollbacks=()):
+    # txscan.py's csvs up to end, committed up to marker_height if given
+    block_rewards(HF_HEIGHT, end).to_csv(csv_dir / "block_rewards.csv", index=False)
+    txs(HF_HEIGHT, end).to_csv(csv_dir / "txs.csv", index=False)
+    if marker_height is not None:
+        offsets = {name: committed_size(csv_dir / f"{name}.csv", marker_height, list(SCHEMAS[name]).index("block")) for name in ["txs", "block_rewards"]}
+        marker = {"height": marker_height, "offsets": offsets, "state": {}, "rollbacks": list(rollbacks)}
+        (csv_dir / "txs.progress.json").write_text(json.dumps(marker))
+
+
+def committed_size(path, height, block_column):
+    size = 0
+    with open(path, "rb") as f:
+        for number, line in enumerate(f):
+            if number > 0 and int(line.split(b",")[block_column]) > height:
+                break
+            size += len(line)
+    return size
+
+
+def test_import_round_trips_the_csvs(tmp_path, csv_dir):
+    write(csv_dir, HF_HEIGHT + 30)
+    store = ColumnStore(tmp_path / "store")
+    import_csvs(store)
+    pd.testing.assert_frame_equal(store.read("block_rewards"), block_rewards(HF_HEIGHT, HF_HEIGHT + 30))
+    expected = txs(HF_HEIGHT, HF_HEIGHT + 30)
+    # "N/A" is read back from the csv as missing
+    expected["conversion_fee_asset"] = expected["conversion_fee_asset"].replace("N/A", float("nan"))
+    pd.testing.assert_frame_equal(store.read("txs"), expected)
+    assert store.read("block_rewards", atomic=True)["miner_reward"][1] == 6_000_000_000_001
+    assert store.max_height("txs") == HF_HEIGHT + 28
+
+
+def test_projection_and_height_range(tmp_path, csv_dir):
+    write(csv_dir, HF_HEIGHT + 30)
+    store = ColumnStore(tmp_path / "store")
+    import_csvs(store)
+    df = store.read("txs", ["block", "to_asset"], HF_HEIGHT + 5, HF_HEIGHT + 11)
+    assert list(df.columns) == ["block", "to_asset"]
+    assert df["block"].tolist() == [HF_HEIGHT + 6, HF_HEIGHT + 8, HF_HEIGHT + 10]
+
+
+def test_resumed_imports_match_one_import(tmp_path, csv_dir, capsys):
+    write(csv_dir, HF_HEIGHT + 100)
+    full = ColumnStore(tmp_path / "full")
+    import_csvs(full)
+
+    store = ColumnStore(tmp_path / "store")
+    for end in (HF_HEIGHT + 20, HF_HEIGHT + 21, HF_HEIGHT + 70, HF_HEIGHT + 100):
+        write(csv_dir, end)
+        import_csvs(store)
+    capsys.readouterr()
+    import_csvs(store)
+    assert "txs: imported 0 rows" in capsys.readouterr().out
+    for name in ["txs", "block_rewards"]:
+        pd.testing.assert_frame_equal(store.read(name), full.read(name))
+
+
+def test_only_committed_rows_are_imported(tmp_path, csv_dir):
+    write(csv_dir, HF_HEIGHT + 60, marker_height=HF_HEIGHT + 40)
+    # a row cut short by a scanner that is still writing
+    with open(csv_dir / "txs.csv", "a") as f:
+        f.write(f"1710089361,{HF_HEIGHT + 61},")
+    store = ColumnStore(tmp_path / "store")
+    import_csvs(store)
+    assert store.max_height("block_rewards") == HF_HEIGHT + 40
+    assert store.max_height("txs") == HF_HEIGHT + 40
+
+    write(csv_dir, HF_HEIGHT + 60, marker_height=HF_HEIGHT + 59)
+    import_csvs(store)
+    full = ColumnStore(tmp_path / "full")
+    import_csvs(full)
+    pd.testing.assert_frame_equal(store.read("txs"), full.read("txs"))
+
+
+def test_rollback_truncates_the_store(tmp_path, csv_dir):
+    store = ColumnStore(tmp_path / "store")
+    write(csv_dir, HF_HEIGHT + 60, marker_height=HF_HEIGHT + 59)
+    import_csvs(store)
+    # a reorg at HF_HEIGHT + 30, the rescanned blocks have other rewards
+    write(csv_dir, HF_HEIGHT + 60, marker_height=HF_HEIGHT + 59, rollbacks=[HF_HEIGHT + 30])
+    rewards = pd.read_csv(csv_dir / "block_rewards.csv")
+    rewards.loc[rewards["block"] >= HF_HEIGHT + 30, "governance_reward"] = 0.4
+    rewards.to_csv(csv_dir / "block_rewards.csv", index=False)
+    import_csvs(store)
+    pd.testing.assert_frame_equal(store.read("block_rewards"), rewards)
+    assert store.meta("block_rewards")["rollbacks"] == [HF_HEIGHT + 30]
+    assert store.meta("block_rewards")["csv_rollbacks"] == 1
+
+    # the same rollback is not applied twice
+    import_csvs(store)
+    assert store.meta("block_rewards")["rollbacks"] == [HF_HEIGHT + 30]
+    pd.testing.assert_frame_equal(store.read("block_rewards"), rewards)
+
+
+def test_append_drops_bytes_of_an_interrupted_append(tmp_path):
+    store = ColumnStore(tmp_path / "store")
+    store.append("block_rewards", block_rewards(HF_HEIGHT, HF_HEIGHT + 10))
+    # an append that wrote its column files but crashed before meta.json
+    with open(tmp_path / "store" / "block_rewards" / "block.bin", "ab") as f:
+        f.write(b"\x01" * 24)
+    store.append("block_rewards", block_rewards(HF_HEIGHT + 10, HF_HEIGHT + 20))
+    pd.testing.assert_frame_equal(store.read("block_rewards"), block_rewards(HF_HEIGHT, HF_HEIGHT + 20))
@@ -0,0 +1,110 @@
+import json
+
+from csv_stream import StreamingCsvWriter, find_marker, read_tail_rows, rollback_height
+
+COLUMNS = ["block", "value"]
+
+
+def open_writer(tmp_path, fresh=False):
+    return StreamingCsvWriter(tmp_path / "rows.progress.json", {"rows": (tmp_path / "rows.csv", COLUMNS)}, fresh=fresh)
+
+
+def blocks(tmp_path):
+    return [int(row[0]) for row in read_tail_rows(tmp_path / "rows.csv", 1000)]
+
+
+def test_commit_writes_marker(tmp_path):
+    writer = open_writer(tmp_path)
+    assert writer.height is None
+    writer.append("rows", [[100, "a"], [101, "b"]])
+    writer.commit(101, {"total": 2})
+    writer.close()
+
+    marker = json.loads((tmp_path / "rows.progress.json").read_text())
+    assert marker["height"] == 101
+    assert marker["offsets"]["rows"] == (tmp_path / "rows.csv").stat().st_size
+    assert marker["state"] == {"total": 2}
+    assert marker["rollbacks"] == []
+
+
+def test_resume_drops_uncommitted_rows(tmp_path):
+    writer = open_writer(tmp_path)
+    writer.append("rows", [[100, "a"], [101, "b"]])
+    writer.commit(101, {"total": 2})
+    # written after the last commit, as if the scan was killed here
+    writer.append("rows", [[102, "c"]])
+    writer.files["rows"].flush()
+    writer.close()
+
+    writer = open_writer(tmp_path)
+    assert writer.height == 101
+    assert writer.state == {"total": 2}
+    assert blocks(tmp_path) == [100, 101]
+
+    writer.append("rows", [[102, "d"]])
+    writer.commit(102)
+    writer.close()
+    assert (tmp_path / "rows.csv").read_text() == "block,value\n100,a\n101,b\n102,d\n"
+
+
+def test_rollback_truncates_and_records_height(tmp_path):
+    writer = open_writer(tmp_path)
+    writer.append("rows", [[height, "x"] for height in range(100, 110)])
+    writer.commit(109)
+
+    writer.rollback(105, {"rows": 0})
+    assert writer.height == 104
+    assert blocks(tmp_path) == list(range(100, 105))
+    writer.append("rows", [[105, "y"]])
+    writer.commit(105)
+    writer.close()
+
+    writer = open_writer(tmp_path)
+    assert writer.height == 105
+    assert writer.rollbacks == [105]
+    assert blocks(tmp_path) == list(range(100, 106))
+    writer.close()
+
+
+def test_fresh_discards_output_and_rollbacks(tmp_path):
+    writer = open_writer(tmp_path)
+    writer.append("rows", [[100, "a"], [101, "b"]])
+    writer.commit(101)
+    writer.rollback(101, {"rows": 0})
+    writer.close()
+
+    writer = open_writer(tmp_path, fresh=True)
+    assert writer.height is None
+    assert writer.rollbacks == []
+    assert (tmp_path / "rows.csv").read_text() == "block,value\n"
+    writer.close()
+
+
+def test_shorter_csv_than_marker_starts_over(tmp_path):
+    writer = open_writer(tmp_path)
+    writer.append("rows", [[100, "a"], [101, "b"]])
+    writer.commit(101)
+    writer.close()
+    (tmp_path / "rows.csv").write_text("block,value\n")
+
+    writer = open_writer(tmp_path)
+    assert writer.height is None
+    writer.close()
+
+
+def test_find_marker_picks_the_marker_covering_the_csv(tmp_path):
+    writer = open_writer(tmp_path)
+    writer.commit(100)
+    writer.close()
+    StreamingCsvWriter(tmp_path / "other.progress.json", {"other": (tmp_path / "other.csv", COLUMNS)}).close()
+
+    assert find_marker(tmp_path / "rows.csv")["height"] == 100
+    assert find_marker(tmp_path / "missing.csv") is None
+
+
+def test_rollback_height():
+    assert rollback_height([], 0) is None
+    assert rollback_height([105], 1) is None
+    assert rollback_height([105, 120, 110], 1) == 110
+    # a shorter list means the output was written again from scratch
+    assert rollback_height([], 2) == 0
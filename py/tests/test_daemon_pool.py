@@ -0,0 +1,77 @@
+import pytest
+import requests
+
+import daemon_pool
+from daemon_pool import DaemonPool
+from synthetic_chain import HF_HEIGHT
+
+BLOCKS = 50
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # rounds over the nodes go again straight away
+    monkeypatch.setattr(daemon_pool, "backoff_seconds", lambda attempt: 0)
+
+
+@pytest.fixture
+def two_daemons(mock_daemon):
+    # returns (servers, pool), the pool already at the daemons' height
+    servers, urls = zip(*(mock_daemon(BLOCKS) for _ in range(2)))
+    pool = DaemonPool(list(urls), health_interval=3600)
+    assert pool.get_height() == HF_HEIGHT + BLOCKS
+    return servers, pool
+
+
+def fetch_blocks(pool, count=20):
+    return [pool.get_block(HF_HEIGHT + i) for i in range(count)]
+
+
+def test_failed_calls_move_to_the_other_daemon(two_daemons):
+    (failing, working), pool = two_daemons
+    failing.error_rate = 1.0
+    blocks = fetch_blocks(pool)
+    assert [block["block_header"]["height"] for block in blocks] == [HF_HEIGHT + i for i in range(20)]
+    assert not pool.nodes[0].up and pool.nodes[1].up
+    # once down, the failing daemon is only a last resort
+    assert failing.stats.errors == 1
+    txs = pool.get_transactions(blocks[0]["tx_hashes"])
+    assert set(txs) == set(blocks[0]["tx_hashes"])
+
+
+def test_daemon_back_after_a_health_check(two_daemons):
+    (failing, working), pool = two_daemons
+    failing.error_rate = 1.0
+    fetch_blocks(pool)
+    failing.error_rate = 0.0
+    assert pool.check_health() == [True, True]
+    assert pool.nodes[0].up
+    requests_before = failing.stats.requests
+    assert all(fetch_blocks(pool, 40))
+    assert failing.stats.requests > requests_before
+
+
+def test_all_daemons_down(two_daemons):
+    servers, pool = two_daemons
+    for server in servers:
+        server.error_rate = 1.0
+    # json_rpc calls return None like a single DaemonClient, tx calls raise
+    assert pool.get_block(HF_HEIGHT) is None
+    with pytest.raises(requests.exceptions.HTTPError):
+        pool.get_transactions(["00" * 32])
+    assert not any(node.up for node in pool.nodes)
+    with pytest.raises(RuntimeError, match="No daemon answered"):
+        pool.get_height()
+
+
+def test_daemons_falling_behind_between_rounds_raise_the_last_error(two_daemons):
+    _, pool = two_daemons
+
+    def request(client):
+        # every node fails, and the health checks meanwhile see them below the height asked for
+        for node in pool.nodes:
+            node.height = HF_HEIGHT
+        raise requests.exceptions.ConnectionError("connection refused")
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        pool._call("get_block", HF_HEIGHT + BLOCKS, request)
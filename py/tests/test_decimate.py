@@ -0,0 +1,53 @@
+import numpy as np
+
+import decimate
+from decimate import MIN_POINTS_PER_BUCKET, decimate_indices
+
+
+def bucket_of(x, buckets):
+    return np.minimum(((x - x[0]) / (x[-1] - x[0]) * buckets).astype(np.int64), buckets - 1)
+
+
+def test_short_series_are_kept_whole():
+    x = np.arange(100)
+    assert np.array_equal(decimate_indices(x, [x * 2.0], buckets=100 // MIN_POINTS_PER_BUCKET), np.arange(100))
+    assert np.array_equal(decimate_indices(x, [x * 2.0], buckets=0), np.arange(100))
+    assert np.array_equal(decimate_indices(np.zeros(100), [x * 2.0], buckets=5), np.arange(100))
+
+
+def test_extremes_of_every_bucket_survive():
+    rng = np.random.default_rng(3)
+    x = np.arange(100_000)
+    ys = [rng.normal(size=len(x)), rng.normal(size=len(x)).cumsum()]
+    buckets = 500
+    rows = decimate_indices(x, ys, buckets)
+    assert len(rows) <= buckets * 2 * (1 + len(ys))
+    assert rows[0] == 0 and rows[-1] == len(x) - 1
+    bucket = bucket_of(x, buckets)
+    for y in ys:
+        kept = y[rows]
+        for b in range(buckets):
+            in_bucket = bucket[rows] == b
+            assert kept[in_bucket].max() == y[bucket == b].max()
+            assert kept[in_bucket].min() == y[bucket == b].min()
+
+
+def test_both_sides_of_a_gap_are_kept():
+    x = np.arange(10_000)
+    y = np.sin(x / 500)
+    y[4321:4400] = np.nan
+    rows = decimate_indices(x, [y], buckets=50)
+    assert {4320, 4321, 4399, 4400} <= set(rows.tolist())
+    # the gap still breaks the decimated line
+    assert np.isnan(y[rows]).any()
+
+
+def test_decimate_can_be_turned_off(monkeypatch):
+    x = np.arange(10_000)
+    y = x * 0.5
+    small_x, small_y = decimate.decimate(x, y, buckets=10)
+    assert len(small_x) == len(small_y) < len(x)
+    assert np.array_equal(small_y, small_x * 0.5)
+    monkeypatch.setattr(decimate, "CHART_DECIMATE", False)
+    full_x, full_y = decimate.decimate(x, y, buckets=10)
+    assert np.array_equal(full_x, x) and np.array_equal(full_y, y)
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from outages import MA_COLUMNS, find_outages, interpolate_outages
+
+
+def test_find_outages():
+    blocks = np.arange(100, 112)
+    values = [1, 0, 0, 1, np.nan, 1, 0, np.nan, 0, 1, 0, 0]
+    assert find_outages(blocks, values) == [(101, 102), (106, 108), (110, 111)]
+    assert find_outages(blocks, values, min_length=1) == [(101, 102), (104, 104), (106, 108), (110, 111)]
+    assert find_outages(blocks, [1.0] * 12) == []
+
+
+def fill_block_by_block(df, outages):
+    # the loop graph.py used before outages.py
+    df = df.copy()
+    for start, end in outages:
+        before = df[df["block"] == start - 1]
+        after = df[df["block"] == end + 1]
+        if before.empty or after.empty:
+            continue
+        for column in MA_COLUMNS:
+            start_value = before[column].values[0]
+            step = (after[column].values[0] - start_value) / (end - start + 1)
+            for block in range(start + 1, end):
+                df.loc[df["block"] == block, column] = start_value + step * (block - start)
+    return df
+
+
+def test_interpolation_matches_the_block_by_block_fill():
+    rng = np.random.default_rng(7)
+    blocks = np.arange(1000, 1200)
+    df = pd.DataFrame({"block": blocks, **{column: rng.uniform(1, 2, len(blocks)) for column in MA_COLUMNS}})
+    # the first outage has no block before it, so nothing to interpolate from
+    outages = [(1000, 1004), (1010, 1019), (1050, 1051), (1100, 1140), (1190, 1198)]
+    expected = fill_block_by_block(df, outages)
+    result = interpolate_outages(df.copy(), outages)
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.loc[:4, MA_COLUMNS].equals(df.loc[:4, MA_COLUMNS])
+
+
+def test_outage_without_its_anchor_block_is_left_alone():
+    df = pd.DataFrame({"block": [1, 2, 3, 4, 6], **{column: [1.0, 0.0, 0.0, 0.0, 5.0] for column in MA_COLUMNS}})
+    # block 5, the anchor after the outage, is not in the table
+    assert interpolate_outages(df.copy(), [(2, 4)]).equals(df)
+    assert interpolate_outages(df.copy(), []).equals(df)
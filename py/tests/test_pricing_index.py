@@ -0,0 +1,75 @@
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+from pricing_index import PRICING_FIELDS, PricingRecordIndex
+
+
+def record(height):
+    return tuple(height + i / 10 for i in range(len(PRICING_FIELDS)))
+
+
+def frame(heights):
+    return pd.DataFrame([[height, *record(height)] for height in heights], columns=["block", *PRICING_FIELDS])
+
+
+def test_from_frame_keeps_the_first_row_per_height():
+    df = pd.concat([frame([10, 11, 13]), frame([11]).assign(spot=-1.0)], ignore_index=True)
+    index = PricingRecordIndex.from_frame(df)
+    assert index.get(11) == record(11)
+    assert index.get(12) is None
+    assert (index.base_height, index.max_height, len(index)) == (10, 13, 3)
+
+
+def test_lookups_outside_the_index():
+    index = PricingRecordIndex.from_frame(frame([10, 11]))
+    assert index.get(9) is None and index.get(5000) is None
+    assert 10 in index and 12 not in index
+    assert len(PricingRecordIndex.from_frame(frame([]))) == 0
+
+
+def test_add_grows_and_rebases():
+    index = PricingRecordIndex(100, capacity=2)
+    index.add(100, *record(100))
+    index.add(150, *record(150))
+    index.add(90, *record(90))
+    assert [index.get(height) for height in (90, 100, 150)] == [record(90), record(100), record(150)]
+    assert index.base_height == 90 and index.max_height == 150
+
+
+def _read_after_parent_adds(index, added, results):
+    # a forked child, the parent adds a record once it has started
+    added.wait(10)
+    results.put(index.get(12))
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="shared indexes are inherited by forking")
+def test_forked_processes_see_records_added_to_a_shared_index():
+    shared = PricingRecordIndex.from_frame(frame([10, 11])).share(capacity=10)
+    try:
+        context = multiprocessing.get_context("fork")
+        added, results = context.Event(), context.Queue()
+        child = context.Process(target=_read_after_parent_adds, args=(shared, added, results))
+        child.start()
+        shared.add(12, *record(12))
+        added.set()
+        assert results.get(timeout=10) == record(12)
+        child.join(10)
+    finally:
+        shared.close(unlink=True)
+
+
+def test_shared_index_cannot_grow():
+    shared = PricingRecordIndex.from_frame(frame([10, 11])).share(capacity=4)
+    try:
+        assert shared.get(11) == record(11) and shared.get(12) is None
+        shared.add(13, *record(13))
+        with pytest.raises(ValueError, match="full"):
+            shared.add(14, *record(14))
+        with pytest.raises(ValueError, match="starts at 10"):
+            shared.add(9, *record(9))
+    finally:
+        shared.close(unlink=True)
+    # closing twice is a no-op
+    shared.close(unlink=True)
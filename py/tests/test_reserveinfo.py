@@ -0,0 +1,181 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PY_DIR = Path(__file__).resolve().parent.parent
+
+HF_HEIGHT = 89300
+TIP_HEIGHT = HF_HEIGHT + 60
+
+PRICING_RECORD_COLUMNS = ["block", "timestamp", "spot", "moving_average", "reserve", "reserve_ma", "stable", "stable_ma"]
+BLOCK_REWARD_COLUMNS = ["block", "miner_reward", "governance_reward", "reserve_reward"]
+TX_COLUMNS = ["timestamp", "block", "hash", "conversion_type", "conversion_rate", "from_asset", "from_amount", "to_asset", "to_amount", "conversion_fee_asset", "conversion_fee_amount", "tx_fee_asset", "tx_fee_amount", "timestamp", "block"]
+
+CONVERSIONS = [
+    ("mint_stable", "ZEPH", "ZEPHUSD"),
+    ("mint_reserve", "ZEPH", "ZEPHRSV"),
+    ("redeem_stable", "ZEPHUSD", "ZEPH"),
+    ("redeem_reserve", "ZEPHRSV", "ZEPH"),
+]
+
+
+def pricing_record_rows(end_height):
+    rows = []
+    for height in range(HF_HEIGHT, end_height):
+        if height % 17 == 5:
+            # a block without a pricing record
+            rows.append([height, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+        else:
+            spot = 1.5 + (height % 7) * 0.01
+            rows.append([height, 1710000000 + height * 120, spot, spot - 0.02, 0.8, 0.79, 0.6, 0.61])
+    return rows
+
+
+def block_reward_rows(end_height):
+    return [[height, 6.0, 0.3, 0.5 + (height % 3) * 0.1] for height in range(HF_HEIGHT, end_height)]
+
+
+def tx_rows(end_height, orphaned_from=None):
+    # txs from orphaned_from on have other amounts, as if they came from blocks a reorg replaced
+    rows = []
+    for height in range(HF_HEIGHT + 1, end_height, 3):
+        conversion_type, from_asset, to_asset = CONVERSIONS[height % len(CONVERSIONS)]
+        amount = 3.0 if orphaned_from is not None and height >= orphaned_from else 2.0
+        timestamp = 1710000000 + height * 120
+        rows.append([timestamp, height, f"{height:064x}", conversion_type, 0.9, from_asset, amount, to_asset, amount / 2, to_asset, 0.01, from_asset, 3e-05, timestamp, height])
+    return rows
+
+
+def write_csv(path, columns, rows):
+    with open(path, "w") as f:
+        f.write(",".join(columns) + "\n")
+        for row in rows:
+            f.write(",".join(str(value) for value in row) + "\n")
+
+
+def write_inputs(csv_dir, pricing_end=TIP_HEIGHT, reward_end=TIP_HEIGHT, tx_end=TIP_HEIGHT, orphaned_from=None):
+    write_csv(csv_dir / "pricing_records.csv", PRICING_RECORD_COLUMNS, pricing_record_rows(pricing_end))
+    write_csv(csv_dir / "block_rewards.csv", BLOCK_REWARD_COLUMNS, block_reward_rows(reward_end))
+    write_csv(csv_dir / "txs.csv", TX_COLUMNS, tx_rows(tx_end, orphaned_from))
+
+
+def start_reserveinfo(work_dir, *args):
+    # reads ./py/csvs from work_dir, always from the csvs
+    env = {name: value for name, value in os.environ.items() if name != "PY_STORE"}
+    return subprocess.run([sys.executable, str(PY_DIR / "reserveinfo.py"), *args], cwd=work_dir, env=env, capture_output=True, text=True)
+
+
+def run_reserveinfo(work_dir, *args):
+    result = start_reserveinfo(work_dir, *args)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def reserve_stats(work_dir):
+    return (work_dir / "py" / "csvs" / "reserve_stats.csv").read_text()
+
+
+@pytest.fixture
+def full_run(tmp_path_factory):
+    # reserve stats computed in one go over every height
+    work_dir = tmp_path_factory.mktemp("full")
+    csv_dir = work_dir / "py" / "csvs"
+    csv_dir.mkdir(parents=True)
+    write_inputs(csv_dir)
+    run_reserveinfo(work_dir, "--fresh")
+    return reserve_stats(work_dir)
+
+
+def test_resume_matches_a_full_run(tmp_path, full_run):
+    csv_dir = tmp_path / "py" / "csvs"
+    csv_dir.mkdir(parents=True)
+    write_inputs(csv_dir, reward_end=HF_HEIGHT + 20, tx_end=HF_HEIGHT + 20)
+    run_reserveinfo(tmp_path)
+    write_inputs(csv_dir, reward_end=HF_HEIGHT + 45, tx_end=HF_HEIGHT + 45)
+    assert "Resuming from checkpoint" in run_reserveinfo(tmp_path)
+    write_inputs(csv_dir)
+    run_reserveinfo(tmp_path)
+    assert reserve_stats(tmp_path) == full_run
+
+
+def test_checkpoint_stops_at_the_lagging_input(tmp_path, full_run):
+    csv_dir = tmp_path / "py" / "csvs"
+    csv_dir.mkdir(parents=True)
+    # txscan behind prscan, heights past its last block reward must not be checkpointed
+    write_inputs(csv_dir, reward_end=HF_HEIGHT + 30, tx_end=HF_HEIGHT + 30)
+    run_reserveinfo(tmp_path)
+    checkpoint = json.loads((csv_dir / "reserve_stats.progress.json").read_text())
+    assert checkpoint["height"] < HF_HEIGHT + 30
+    write_inputs(csv_dir)
+    run_reserveinfo(tmp_path)
+    assert reserve_stats(tmp_path) == full_run
+
+
+def test_missing_inputs_exit(tmp_path):
+    csv_dir = tmp_path / "py" / "csvs"
+    csv_dir.mkdir(parents=True)
+    write_csv(csv_dir / "pricing_records.csv", PRICING_RECORD_COLUMNS, pricing_record_rows(TIP_HEIGHT))
+    write_csv(csv_dir / "block_rewards.csv", BLOCK_REWARD_COLUMNS, [])
+    result = start_reserveinfo(tmp_path)
+    assert result.returncode != 0
+    assert "No pricing records or block rewards yet" in result.stderr
+
+
+def test_rollback_below_the_checkpoint_recomputes(tmp_path, full_run):
+    csv_dir = tmp_path / "py" / "csvs"
+    csv_dir.mkdir(parents=True)
+    fork_height = HF_HEIGHT + 40
+    write_inputs(csv_dir, orphaned_from=fork_height)
+    run_reserveinfo(tmp_path)
+    assert reserve_stats(tmp_path) != full_run
+
+    # txscan rolled txs.csv back to the fork and scanned the new blocks
+    write_inputs(csv_dir)
+    marker = {"height": TIP_HEIGHT - 1, "offsets": {"txs": (csv_dir / "txs.csv").stat().st_size}, "state": {}, "rollbacks": [fork_height]}
+    (csv_dir / "txs.progress.json").write_text(json.dumps(marker))
+    assert "recomputing from the hardfork" in run_reserveinfo(tmp_path)
+    assert reserve_stats(tmp_path) == full_run
+
+    # the rollback is only acted on once
+    assert "recomputing" not in run_reserveinfo(tmp_path)
+
+
+def commit(csv_dir, marker_name, height, names):
+    # a scanner's progress marker covering the csvs as they are now
+    offsets = {name: (csv_dir / f"{name}.csv").stat().st_size for name in names}
+    (csv_dir / f"{marker_name}.progress.json").write_text(json.dumps({"height": height, "offsets": offsets, "state": {}, "rollbacks": []}))
+
+
+def append_rows(path, rows, partial):
+    with open(path, "a") as f:
+        for row in rows:
+            f.write(",".join(str(value) for value in row) + "\n")
+        f.write(partial)
+
+
+def test_uncommitted_rows_are_ignored(tmp_path, tmp_path_factory, full_run):
+    committed_end = HF_HEIGHT + 30
+    expected_dir = tmp_path_factory.mktemp("committed")
+    (expected_dir / "py" / "csvs").mkdir(parents=True)
+    write_inputs(expected_dir / "py" / "csvs", reward_end=committed_end, tx_end=committed_end)
+    run_reserveinfo(expected_dir)
+
+    csv_dir = tmp_path / "py" / "csvs"
+    csv_dir.mkdir(parents=True)
+    write_inputs(csv_dir, reward_end=committed_end, tx_end=committed_end)
+    commit(csv_dir, "pricing_records", TIP_HEIGHT - 1, ["pricing_records"])
+    commit(csv_dir, "txs", committed_end - 1, ["txs", "block_rewards"])
+    # txscan.py is mid-window: rows past its marker, the last one cut short
+    append_rows(csv_dir / "block_rewards.csv", block_reward_rows(TIP_HEIGHT)[30:], f"{TIP_HEIGHT},6.")
+    append_rows(csv_dir / "txs.csv", [row for row in tx_rows(TIP_HEIGHT) if row[1] >= committed_end], "1710000000,893")
+    run_reserveinfo(tmp_path)
+    assert reserve_stats(tmp_path) == reserve_stats(expected_dir)
+
+    write_inputs(csv_dir)
+    commit(csv_dir, "txs", TIP_HEIGHT - 1, ["txs", "block_rewards"])
+    run_reserveinfo(tmp_path)
+    assert reserve_stats(tmp_path) == full_run
@@ -0,0 +1,150 @@
+import itertools
+
+import pytest
+
+import rpc_cache
+import synthetic_chain
+from rpc_cache import RPC_CACHE_MIN_DEPTH, RpcCache, cached_block, cached_txs, offline_height
+from synthetic_chain import HF_HEIGHT
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = RpcCache(tmp_path / "rpc.sqlite")
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # every access a tick later, so least recently used is unambiguous
+    ticks = itertools.count(1)
+    monkeypatch.setattr(rpc_cache.time, "time", lambda: float(next(ticks)))
+
+
+def block_txs(height):
+    block = synthetic_chain.block(height)
+    return {tx_hash: synthetic_chain.transaction(tx_hash) for tx_hash in [block["miner_tx_hash"], *block["tx_hashes"]]}
+
+
+def reorged(height):
+    block = synthetic_chain.block(height)
+    block["block_header"] = {**block["block_header"], "hash": "ff" * 32}
+    return block
+
+
+def fill(cache, heights):
+    for height in heights:
+        cache.put_block(height, synthetic_chain.block(height))
+        cache.put_txs(block_txs(height))
+
+
+def test_entries_survive_a_reopen(tmp_path, cache):
+    fill(cache, range(HF_HEIGHT, HF_HEIGHT + 5))
+    hashes = list(block_txs(HF_HEIGHT + 3))
+    size = cache.size
+    cache.close()
+
+    reopened = RpcCache(tmp_path / "rpc.sqlite")
+    try:
+        assert reopened.get_block(HF_HEIGHT + 3) == synthetic_chain.block(HF_HEIGHT + 3)
+        assert reopened.get_block(HF_HEIGHT + 5) is None
+        assert reopened.get_txs([*hashes, "00" * 32]) == block_txs(HF_HEIGHT + 3)
+        assert reopened.size == size
+        assert reopened.max_height() == HF_HEIGHT + 4
+    finally:
+        reopened.close()
+
+
+def test_changed_block_hash_drops_entries_from_its_height(cache):
+    fill(cache, range(HF_HEIGHT, HF_HEIGHT + 10))
+    cache.put_block(HF_HEIGHT + 6, reorged(HF_HEIGHT + 6))
+    assert cache.get_block(HF_HEIGHT + 6) == reorged(HF_HEIGHT + 6)
+    assert cache.get_block(HF_HEIGHT + 7) is None
+    assert cache.get_txs(block_txs(HF_HEIGHT + 6)) == {}
+    assert cache.get_txs(block_txs(HF_HEIGHT + 5)) == block_txs(HF_HEIGHT + 5)
+    assert cache.size == cache._stored_size()
+
+    cache.put_blocks({height: reorged(height) if height == HF_HEIGHT + 2 else synthetic_chain.block(height) for height in range(HF_HEIGHT, HF_HEIGHT + 4)})
+    # the bulk load dropped the blocks and txs from the changed block on
+    assert cache.max_height() == HF_HEIGHT + 3 and cache.get_block(HF_HEIGHT + 5) is None
+    assert cache.get_txs(block_txs(HF_HEIGHT + 2)) == {}
+    assert cache.get_txs(block_txs(HF_HEIGHT + 1)) == block_txs(HF_HEIGHT + 1)
+    assert cache.size == cache._stored_size()
+
+
+def test_invalidate_from(cache):
+    fill(cache, range(HF_HEIGHT, HF_HEIGHT + 10))
+    cache.invalidate_from(HF_HEIGHT + 4)
+    assert cache.max_height() == HF_HEIGHT + 3
+    assert cache.get_txs(block_txs(HF_HEIGHT + 4)) == {}
+    assert cache.get_txs(block_txs(HF_HEIGHT + 3)) == block_txs(HF_HEIGHT + 3)
+    assert cache.size == cache._stored_size()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = RpcCache(tmp_path / "rpc.sqlite")
+    try:
+        # more blocks than one eviction round removes
+        cache.put_blocks({height: synthetic_chain.block(height) for height in range(HF_HEIGHT, HF_HEIGHT + 600)})
+        cache.max_bytes = cache.size
+        # the first block is read again, the second one is now the oldest entry
+        cache.get_block(HF_HEIGHT)
+        fill(cache, range(HF_HEIGHT + 600, HF_HEIGHT + 602))
+        assert cache.size == cache._stored_size() <= cache.max_bytes * 0.9
+        assert cache.get_block(HF_HEIGHT) is not None
+        assert cache.get_block(HF_HEIGHT + 1) is None
+        assert cache.get_block(HF_HEIGHT + 599) is not None
+        assert cache.get_txs(block_txs(HF_HEIGHT + 601)) == block_txs(HF_HEIGHT + 601)
+    finally:
+        cache.close()
+
+
+class Fetcher:
+    def __init__(self):
+        self.calls = []
+
+    def block(self, height):
+        self.calls.append(height)
+        return synthetic_chain.block(height)
+
+    def txs(self, hashes):
+        self.calls.append(list(hashes))
+        return {tx_hash: synthetic_chain.transaction(tx_hash) for tx_hash in hashes}
+
+
+def test_only_blocks_below_the_min_depth_are_cached(cache):
+    fetcher = Fetcher()
+    tip_height = HF_HEIGHT + RPC_CACHE_MIN_DEPTH + 2
+    for height in (HF_HEIGHT, tip_height - 1):
+        assert cached_block(cache, height, fetcher.block, tip_height) == synthetic_chain.block(height)
+        assert cached_block(cache, height, fetcher.block, tip_height) == synthetic_chain.block(height)
+    assert fetcher.calls == [HF_HEIGHT, tip_height - 1, tip_height - 1]
+    assert cache.get_block(tip_height - 1) is None
+
+
+def test_only_missing_txs_are_fetched(cache):
+    fetcher = Fetcher()
+    tip_height = HF_HEIGHT + 100
+    first, second = list(block_txs(HF_HEIGHT + 1)), list(block_txs(HF_HEIGHT + 3))
+    cached_txs(cache, first, fetcher.txs, tip_height)
+    assert cached_txs(cache, first + second, fetcher.txs, tip_height) == {**block_txs(HF_HEIGHT + 1), **block_txs(HF_HEIGHT + 3)}
+    assert fetcher.calls == [first, second]
+    # near the tip txs are fetched every time
+    recent = list(block_txs(tip_height - 2))
+    cached_txs(cache, recent, fetcher.txs, tip_height)
+    cached_txs(cache, recent, fetcher.txs, tip_height)
+    assert fetcher.calls[-2:] == [recent, recent]
+
+
+def test_offline_reads_never_fetch(cache, monkeypatch):
+    fill(cache, range(HF_HEIGHT, HF_HEIGHT + 3))
+    monkeypatch.setattr(rpc_cache, "RPC_CACHE_OFFLINE", True)
+    fetcher = Fetcher()
+    assert offline_height(cache) == HF_HEIGHT + 3
+    assert cached_block(cache, HF_HEIGHT + 2, fetcher.block, 0) == synthetic_chain.block(HF_HEIGHT + 2)
+    assert cached_block(cache, HF_HEIGHT + 3, fetcher.block, 0) is None
+    hashes = [*block_txs(HF_HEIGHT + 2), *block_txs(HF_HEIGHT + 3)]
+    assert cached_txs(cache, hashes, fetcher.txs, 0) == block_txs(HF_HEIGHT + 2)
+    assert fetcher.calls == []
+    assert offline_height(None) == 0
@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from rpc_pool import AimdLimiter, fetch_concurrent
+
+
+def run(limiter, count, latency=0.01, ok=True, call="get_block"):
+    # count requests started together, so they share one round of the limit
+    tickets = [limiter.acquire() for _ in range(count)]
+    for ticket in tickets:
+        limiter.release(ticket, call, latency, ok)
+
+
+def test_limit_is_clamped():
+    assert AimdLimiter(initial=100, minimum=2, maximum=8).limit == 8
+    assert AimdLimiter(initial=0, minimum=2, maximum=8).limit == 2
+    # a minimum below one would never let a request through
+    assert AimdLimiter(initial=1, minimum=0, maximum=8).minimum == 1
+
+
+def test_additive_increase_when_saturated():
+    limiter = AimdLimiter(initial=4, minimum=1, maximum=64)
+    tickets = [limiter.acquire() for _ in range(4)]
+    # every slot stays in use, each finished request is replaced by a new one
+    for _ in range(4):
+        limiter.release(tickets.pop(0), "get_block", 0.01, True)
+        tickets.append(limiter.acquire())
+    # one full round adds about one slot
+    assert 4.9 < limiter.limit < 5.0
+    assert limiter.in_flight == 4
+
+
+def test_no_increase_below_the_limit():
+    limiter = AimdLimiter(initial=4, minimum=1, maximum=64)
+    for _ in range(20):
+        run(limiter, 2)
+    assert limiter.limit == 4
+
+
+def test_increase_stops_at_maximum():
+    limiter = AimdLimiter(initial=4, minimum=1, maximum=5)
+    for _ in range(20):
+        run(limiter, int(limiter.limit))
+    assert limiter.limit == 5
+
+
+def test_error_halves_once_per_burst():
+    limiter = AimdLimiter(initial=16, minimum=1, maximum=64)
+    # every request in flight when the daemon failed reports the failure
+    run(limiter, 16, ok=False)
+    assert limiter.limit == 8
+    # a request started after the cut counts again
+    run(limiter, 1, ok=False)
+    assert limiter.limit == 4
+
+
+def test_decrease_stops_at_minimum():
+    limiter = AimdLimiter(initial=4, minimum=3, maximum=64)
+    for _ in range(5):
+        run(limiter, 1, ok=False)
+    assert limiter.limit == 3
+
+
+def test_latency_spike_cuts_the_limit():
+    limiter = AimdLimiter(initial=10, minimum=1, maximum=64, latency_tolerance=2.0)
+    for _ in range(5):
+        run(limiter, 1, latency=0.01)
+    assert limiter.limit == 10
+    # the smoothed latency needs a few slow responses to pass twice the baseline
+    for _ in range(10):
+        run(limiter, 1, latency=0.2)
+    assert limiter.limit < 10
+
+
+def test_latency_is_tracked_per_call():
+    limiter = AimdLimiter(initial=10, minimum=1, maximum=64, latency_tolerance=2.0)
+    for _ in range(5):
+        run(limiter, 1, latency=0.01, call="get_block")
+    # a call that is always slow sets its own baseline
+    for _ in range(10):
+        run(limiter, 1, latency=0.2, call="get_transactions")
+    assert limiter.limit == 10
+
+
+def test_latency_below_the_floor_is_not_congestion():
+    limiter = AimdLimiter(initial=10, minimum=1, maximum=64, latency_tolerance=2.0)
+    run(limiter, 1, latency=0.0001)
+    for _ in range(10):
+        run(limiter, 1, latency=0.004)
+    assert limiter.limit == 10
+
+
+def test_acquire_waits_for_a_free_slot():
+    limiter = AimdLimiter(initial=1, minimum=1, maximum=1)
+    ticket = limiter.acquire()
+    acquired = threading.Event()
+
+    def second():
+        limiter.release(limiter.acquire(), "get_block", 0.01, True)
+        acquired.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release(ticket, "get_block", 0.01, True)
+    assert acquired.wait(5)
+    thread.join()
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_fetch_concurrent_keeps_input_order(concurrency):
+    assert fetch_concurrent(range(20), lambda item: item * 2, concurrency) == [item * 2 for item in range(20)]
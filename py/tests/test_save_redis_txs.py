@@ -0,0 +1,118 @@
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("redis")
+pytest.importorskip("matplotlib")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+
+from saveRedisTxsToCSV import STATS, STATS_COLUMNS, TX_COLUMNS, compute_stats, conversion_table, export_txs  # noqa: E402
+
+CONVERSIONS = [
+    ("mint_stable", "ZEPH", "ZEPHUSD", "ZEPHUSD"),
+    ("redeem_stable", "ZEPHUSD", "ZEPH", "ZEPH"),
+    ("mint_reserve", "ZEPH", "ZEPHRSV", "N/A"),
+    ("redeem_reserve", "ZEPHRSV", "ZEPH", "ZEPH"),
+    ("mint_yield", "ZEPHUSD", "ZYIELD", "ZYIELD"),
+    ("redeem_yield", "ZYIELD", "ZEPHUSD", "ZEPHUSD"),
+]
+
+
+def tx_info(i):
+    conversion_type, from_asset, to_asset, fee_asset = CONVERSIONS[i % len(CONVERSIONS)]
+    return {
+        "hash": f"{i:064x}", "block_height": 89300 + i // 2, "block_timestamp": 1700000000 + i * 3000,
+        "conversion_type": conversion_type, "conversion_rate": 1.5, "from_asset": from_asset, "from_amount": float(i),
+        "to_asset": to_asset, "to_amount": i / 2, "conversion_fee_asset": fee_asset, "conversion_fee_amount": 0.0 if fee_asset == "N/A" else i / 100,
+        "tx_fee_asset": from_asset, "tx_fee_amount": 3e-05,
+    }
+
+
+class FakeRedis:
+    """HSCAN and HMGET over dicts, pages of at most `count` entries."""
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.calls = []
+
+    def hscan(self, key, cursor, count):
+        items = list(self.hashes.get(key, {}).items())
+        page = dict(items[cursor:cursor + count])
+        self.calls.append(("hscan", len(page)))
+        cursor += count
+        return (0 if cursor >= len(items) else cursor), page
+
+    def hmget(self, key, fields):
+        self.calls.append(("hmget", len(fields)))
+        return [self.hashes[key].get(field) for field in fields]
+
+
+def redis_txs(count):
+    infos = [tx_info(i) for i in range(count)]
+    txs = {info["hash"]: json.dumps(info) for info in infos}
+    by_block = {}
+    for info in infos:
+        by_block.setdefault(str(info["block_height"]), []).append(info["hash"])
+    return infos, {"txs": txs, "txs_by_block": {height: json.dumps(hashes) for height, hashes in by_block.items()}}
+
+
+def test_export_writes_every_tx(tmp_path):
+    infos, hashes = redis_txs(250)
+    client = FakeRedis(hashes)
+    output = tmp_path / "transactions.csv"
+    assert export_txs(client, output, page_size=40) == 250
+    df = pd.read_csv(output, keep_default_na=False)
+    assert list(df.columns) == TX_COLUMNS
+    assert df["hash"].tolist() == [info["hash"] for info in infos]
+    assert df["from_amount"].tolist() == [info["from_amount"] for info in infos]
+    # older entries without the *_atoms fields leave them blank
+    assert (df["tx_fee_atoms"] == "").all()
+    assert max(size for _, size in client.calls) <= 40
+
+
+def test_export_from_a_block(tmp_path):
+    infos, hashes = redis_txs(250)
+    # listed in txs_by_block but missing from txs, and an entry that isn't json
+    del hashes["txs"][infos[200]["hash"]]
+    hashes["txs"][infos[201]["hash"]] = "{not json"
+    client = FakeRedis(hashes)
+    output = tmp_path / "transactions.csv"
+    assert export_txs(client, output, page_size=30, min_block=89300 + 50) == 148
+    df = pd.read_csv(output)
+    expected = [info["hash"] for info in infos if info["block_height"] >= 89350 and info not in (infos[200], infos[201])]
+    assert sorted(df["hash"]) == sorted(expected)
+    assert all(size <= 30 for call, size in client.calls if call == "hmget")
+
+
+def stats_row_by_row(df):
+    # every STATS entry filtered straight from the txs, as the script did before conversion_table()
+    stats = {}
+    for label, column, filters in STATS:
+        mask = pd.Series(True, index=df.index)
+        for key, value in filters.items():
+            mask &= df[key].isin(value) if isinstance(value, list) else df[key] == value
+        stats[label] = int(mask.sum()) if column == "count" else df.loc[mask, column].sum()
+    return stats
+
+
+def test_stats_from_the_grouped_table_match_the_txs(tmp_path):
+    infos, hashes = redis_txs(500)
+    output = tmp_path / "transactions.csv"
+    export_txs(FakeRedis(hashes), output)
+    # HSCAN returned an entry twice while the hash was resized
+    with open(output, "a") as f:
+        f.write(pd.DataFrame([infos[7]], columns=TX_COLUMNS).to_csv(header=False, index=False))
+
+    df = pd.read_csv(output, usecols=["hash", *STATS_COLUMNS]).drop_duplicates("hash")
+    assert len(df) == 500
+    table = conversion_table(df)
+    days = pd.to_datetime(df["block_timestamp"], unit="s").dt.date.nunique()
+    assert len(table) <= days * len(CONVERSIONS)
+    assert table["count"].sum() == 500
+    expected = stats_row_by_row(df)
+    assert compute_stats(table) == pytest.approx(expected)
+    assert expected["Mint Reserve Count"] > 0 and expected["Fees (ZYIELD)"] > 0
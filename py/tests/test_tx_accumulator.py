@@ -0,0 +1,120 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tx_accumulator import QuantileSketch, TxStatsAccumulator
+
+CONVERSIONS = [("mint_stable", "ZEPH", "ZEPHUSD"), ("redeem_stable", "ZEPHUSD", "ZEPH"), ("mint_reserve", "ZEPH", "ZEPHRSV"), ("redeem_reserve", "ZEPHRSV", "ZEPH")]
+
+
+def exact_quantile(values, q):
+    # nearest rank, as QuantileSketch.quantile
+    values = np.sort(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def test_sketch_quantiles_are_within_the_relative_accuracy():
+    rng = np.random.default_rng(11)
+    values = rng.lognormal(0, 2, 50_000)
+    for accuracy in (0.01, 0.001):
+        sketch = QuantileSketch(accuracy)
+        sketch.add(values)
+        for q in (0, 0.01, 0.25, 0.5, 0.75, 0.99, 1):
+            exact = exact_quantile(values, q)
+            assert abs(sketch.quantile(q) - exact) <= accuracy * exact
+
+
+def test_sketch_counts_zeros_and_skips_nan():
+    sketch = QuantileSketch()
+    sketch.add([0.0, -1.0, np.nan, 2.0, 3.0])
+    assert sketch.count == 4
+    assert sketch.quantile(0) == 0.0 and sketch.quantile(0.4) == 0.0
+    assert math.isnan(QuantileSketch().quantile(0.5))
+
+
+def test_merged_sketches_equal_one_sketch():
+    rng = np.random.default_rng(5)
+    values = rng.uniform(0.5, 3.0, 10_000)
+    whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    whole.add(values)
+    first.add(values[:3000])
+    second.add(values[3000:])
+    first.merge(second)
+    assert first.buckets == whole.buckets
+    assert QuantileSketch.from_dict(json.loads(json.dumps(first.to_dict()))).buckets == whole.buckets
+    with pytest.raises(ValueError):
+        first.merge(QuantileSketch(0.01))
+
+
+def txs(rows, seed):
+    rng = np.random.default_rng(seed)
+    data = []
+    for i in range(rows):
+        conversion_type, from_asset, to_asset = CONVERSIONS[i % len(CONVERSIONS)]
+        # some conversions without a rate, as for a missing pricing record
+        rate = np.nan if i % 23 == 0 else rng.uniform(0.5, 2.0)
+        data.append([i // 3, conversion_type, rate, from_asset, rng.uniform(1, 100), to_asset, rng.uniform(1, 100), to_asset, rng.uniform(0, 1)])
+    return pd.DataFrame(data, columns=["block", "conversion_type", "conversion_rate", "from_asset", "from_amount", "to_asset", "to_amount", "conversion_fee_asset", "conversion_fee_amount"])
+
+
+def summary(acc):
+    return acc.total_txns, acc.max_block, acc.txns_by_type(), acc.conversion_rate_stats(), acc.asset_balances(), acc.fees
+
+
+def assert_same_summary(first, second):
+    # sums of the same values in another order, equal up to float rounding
+    assert json.loads(json.dumps(summary(first)), parse_float=lambda value: round(float(value), 6)) == json.loads(json.dumps(summary(second)), parse_float=lambda value: round(float(value), 6))
+
+
+def test_chunked_and_merged_accumulators_match_one_pass():
+    df = txs(5000, seed=1)
+    whole = TxStatsAccumulator()
+    whole.update(df)
+
+    chunked = TxStatsAccumulator()
+    for start in range(0, len(df), 700):
+        chunked.update(df[start:start + 700])
+    assert_same_summary(chunked, whole)
+
+    first, second = TxStatsAccumulator(), TxStatsAccumulator()
+    first.update(df[:1234])
+    second.update(df[1234:])
+    first.merge(second)
+    assert_same_summary(first, whole)
+
+
+def test_figures_match_pandas():
+    df = txs(5000, seed=2)
+    acc = TxStatsAccumulator()
+    acc.update(df)
+    assert acc.txns_by_type() == df["conversion_type"].value_counts().to_dict()
+    for conversion_type, rates in df.groupby("conversion_type")["conversion_rate"]:
+        rates = rates.dropna()
+        stats = acc.conversion_rate_stats()[conversion_type]
+        assert (stats["min"], stats["max"]) == (rates.min(), rates.max())
+        assert stats["mean"] == pytest.approx(rates.mean())
+        median = exact_quantile(rates.to_numpy(), 0.5)
+        assert abs(stats["median"] - median) <= 0.001 * median
+    zsd = acc.asset_balances()["ZEPHUSD"]
+    assert zsd["mint"] == pytest.approx(df.loc[df["to_asset"] == "ZEPHUSD", "to_amount"].sum())
+    assert zsd["net"] == pytest.approx(zsd["mint"] - df.loc[df["from_asset"] == "ZEPHUSD", "from_amount"].sum())
+
+
+def test_state_round_trips_through_a_file(tmp_path):
+    acc = TxStatsAccumulator()
+    acc.update(txs(500, seed=3))
+    # a type whose rates are all missing has no min or max
+    acc.update(pd.DataFrame([[1000, "na", np.nan, "ZEPH", 1.0, "ZEPH", 1.0, "ZEPH", 0.0]], columns=txs(1, seed=0).columns))
+    acc.position = {"block": 1000, "offset": 12345}
+    acc.save(tmp_path / "txstats.json")
+    loaded = TxStatsAccumulator.load(tmp_path / "txstats.json")
+    assert_same_summary(loaded, acc)
+    assert loaded.position == acc.position
+    assert math.isnan(loaded.conversion_rate_stats()["na"]["min"])
+
+    loaded.reset()
+    assert loaded.total_txns == 0 and loaded.types == {} and loaded.position == {"block": None, "offset": 0}
+    assert TxStatsAccumulator.load(tmp_path / "missing.json").total_txns == 0
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+import synthetic_chain
+import tx_parse
+from pricing_index import PricingRecordIndex
+from synthetic_chain import CONVERSION_KINDS, HF_HEIGHT, MINER_TX_INDEX
+from tx_parse import decode_tx_json, parse_tx
+
+HEIGHTS = range(HF_HEIGHT, HF_HEIGHT + 40)
+
+CONVERSION_TYPES = {
+    ("ZEPH", "ZEPHUSD"): "mint_stable",
+    ("ZEPHUSD", "ZEPH"): "redeem_stable",
+    ("ZEPH", "ZEPHRSV"): "mint_reserve",
+    ("ZEPHRSV", "ZEPH"): "redeem_reserve",
+}
+
+
+@pytest.fixture
+def pricing_index():
+    index = PricingRecordIndex(HF_HEIGHT)
+    for height in HEIGHTS:
+        record = synthetic_chain.pricing_record(height)
+        index.add(height, *(record[field] * 1e-12 for field in ["spot", "moving_average", "reserve", "reserve_ma", "stable", "stable_ma"]))
+    return index
+
+
+@pytest.fixture(params=["msgspec", "dict"])
+def decoder(request, monkeypatch):
+    # parse_tx through msgspec structs, and through orjson/json dicts as without msgspec installed
+    if request.param == "msgspec" and tx_parse.msgspec is None:
+        pytest.skip("msgspec is not installed")
+    if request.param == "dict":
+        monkeypatch.setattr(tx_parse, "msgspec", None)
+    return request.param
+
+
+def conversion_tx(from_asset, to_asset):
+    # the first synthetic conversion tx of a kind, with its height
+    for height in HEIGHTS[1:]:
+        for hash in synthetic_chain.block(height)["tx_hashes"]:
+            _, index = synthetic_chain.tx_position(hash)
+            if CONVERSION_KINDS[(height + index) % len(CONVERSION_KINDS)] == (from_asset, to_asset):
+                return synthetic_chain.transaction(hash), height
+    raise AssertionError(f"no {from_asset} -> {to_asset} conversion in the test heights")
+
+
+def test_miner_tx_is_a_block_reward(decoder, pricing_index):
+    height = HF_HEIGHT + 1
+    hash = synthetic_chain.tx_hash(height, MINER_TX_INDEX)
+    tx_info, block_reward_info = parse_tx(synthetic_chain.transaction(hash), hash, height, pricing_index)
+    assert tx_info is None
+    assert block_reward_info == [height, pytest.approx(7.5), pytest.approx(0.5), pytest.approx(2.0)]
+
+
+@pytest.mark.parametrize("from_asset,to_asset", CONVERSION_KINDS)
+def test_conversions(decoder, pricing_index, from_asset, to_asset):
+    tx_data, height = conversion_tx(from_asset, to_asset)
+    tx_json = json.loads(tx_data["as_json"])
+    tx_info, block_reward_info = parse_tx(tx_data, tx_data["tx_hash"], height, pricing_index)
+    assert block_reward_info is None
+
+    spot, moving_average, reserve, reserve_ma, _, _ = pricing_index.get(tx_json["pricing_record_height"])
+    conversion_type = CONVERSION_TYPES[(from_asset, to_asset)]
+    rate = {
+        "mint_stable": max(spot, moving_average),
+        "redeem_stable": min(spot, moving_average),
+        "mint_reserve": max(reserve, reserve_ma),
+        "redeem_reserve": min(reserve, reserve_ma),
+    }[conversion_type]
+    minted = tx_json["amount_minted"] * 1e-12
+    if conversion_type == "mint_reserve":
+        fee_asset, fee = "N/A", 0.0
+    else:
+        fee_asset, fee = to_asset, minted / 0.98 * 0.02
+    assert tx_info == [
+        tx_data["tx_hash"], conversion_type, rate, from_asset, pytest.approx(tx_json["amount_burnt"] * 1e-12), to_asset, pytest.approx(minted),
+        fee_asset, pytest.approx(fee), from_asset, pytest.approx(tx_json["rct_signatures"]["txnFee"] * 1e-12),
+    ]
+
+
+def test_conversion_without_a_pricing_record(decoder):
+    tx_data, height = conversion_tx("ZEPH", "ZEPHUSD")
+    assert parse_tx(tx_data, tx_data["tx_hash"], height, PricingRecordIndex(HF_HEIGHT)) is None
+
+
+def test_tx_missing_from_the_response(decoder, pricing_index):
+    assert parse_tx({}, "00" * 32, HF_HEIGHT, pricing_index) == (None, None)
+
+
+def test_msgspec_and_dict_decoding_agree(monkeypatch):
+    if tx_parse.msgspec is None:
+        pytest.skip("msgspec is not installed")
+    txs = [synthetic_chain.transaction(hash) for height in HEIGHTS for hash in synthetic_chain.block(height)["tx_hashes"] + [synthetic_chain.block(height)["miner_tx_hash"]]]
+    decoded = [decode_tx_json(tx_data["as_json"]) for tx_data in txs]
+    monkeypatch.setattr(tx_parse, "msgspec", None)
+    assert [decode_tx_json(tx_data["as_json"]) for tx_data in txs] == decoded
+
+
+def test_amounts_past_uint64_stay_exact(decoder):
+    tx_data, _ = conversion_tx("ZEPH", "ZEPHUSD")
+    tx_json = json.loads(tx_data["as_json"])
+    tx_json["amount_burnt"] = 2**70 + 1
+    tx_json["vout"][0]["amount"] = 2**65 + 1
+    fields = decode_tx_json(json.dumps(tx_json))
+    assert fields.amount_burnt == 2**70 + 1 and isinstance(fields.amount_burnt, int)
+    assert fields.vout_amounts[0] == 2**65 + 1
+    assert fields.amount_minted == tx_json["amount_minted"]
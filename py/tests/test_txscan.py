@@ -0,0 +1,44 @@
+import json
+
+from synthetic_chain import HF_HEIGHT
+
+BLOCKS = 300
+PRICING_RECORDS_LAG = 120
+
+
+def scan_env(url):
+    return {"ZEPHYR_RPC_URL": url, "ZEPHYR_RPC_URLS": url, "RPC_CACHE": "off", "TXSCAN_BLOCK_WINDOW": "50"}
+
+
+def marker_height(work_dir, name):
+    return json.loads((work_dir / "py" / "csvs" / f"{name}.progress.json").read_text())["height"]
+
+
+def csvs(work_dir):
+    return {name: (work_dir / "py" / "csvs" / f"{name}.csv").read_text() for name in ["txs", "block_rewards", "pricing_records"]}
+
+
+def test_txscan_stops_at_the_last_pricing_record(tmp_path, mock_daemon, run_script):
+    server, url = mock_daemon(BLOCKS)
+    env = scan_env(url)
+
+    full_dir = tmp_path / "full"
+    run_script(full_dir, "prscan.py", env=env)
+    run_script(full_dir, "txscan.py", env=env)
+    assert marker_height(full_dir, "txs") == HF_HEIGHT + BLOCKS - 1
+
+    # prscan.py ran, then new blocks arrived before txscan.py
+    work_dir = tmp_path / "lagging"
+    server.chain.height -= PRICING_RECORDS_LAG
+    run_script(work_dir, "prscan.py", env=env)
+    server.chain.height += PRICING_RECORDS_LAG
+    result = run_script(work_dir, "txscan.py", env=env)
+    pricing_tip = HF_HEIGHT + BLOCKS - PRICING_RECORDS_LAG - 1
+    assert f"Pricing records end at block {pricing_tip}" in result.stdout
+    assert marker_height(work_dir, "txs") == pricing_tip
+
+    # the next cron run picks up the blocks it left out
+    run_script(work_dir, "prscan.py", env=env)
+    run_script(work_dir, "txscan.py", env=env)
+    assert marker_height(work_dir, "txs") == HF_HEIGHT + BLOCKS - 1
+    assert csvs(work_dir) == csvs(full_dir)
@@ -0,0 +1,63 @@
+import pytest
+
+from window_fetch import WindowFetcher, block_tx_hashes
+
+
+class FakeDaemon:
+    """Blocks 100-109 with a miner tx and one other tx each, some txs left out of the first responses."""
+
+    def __init__(self, dropped=(), missing_blocks=()):
+        # hash -> responses still to leave it out of
+        self.dropped = dict(dropped)
+        self.missing_blocks = set(missing_blocks)
+        self.tx_calls = []
+
+    def get_block(self, height):
+        if height in self.missing_blocks:
+            return None
+        return {"miner_tx_hash": f"m{height}", "tx_hashes": [f"t{height}"], "block_header": {"height": height}}
+
+    def get_transactions_batched(self, hashes, batch_size, concurrency=None):
+        self.tx_calls.append(list(hashes))
+        txs_by_hash = {}
+        for hash in hashes:
+            if self.dropped.get(hash, 0) > 0:
+                self.dropped[hash] -= 1
+                continue
+            txs_by_hash[hash] = {"as_json": f'{{"hash": "{hash}"}}'}
+        return txs_by_hash
+
+
+def test_block_tx_hashes_puts_the_miner_tx_first():
+    assert block_tx_hashes({"miner_tx_hash": "m", "tx_hashes": ["a", "b"]}) == ["m", "a", "b"]
+    assert block_tx_hashes({"miner_tx_hash": "m"}) == ["m"]
+
+
+def test_fetch_returns_the_whole_window():
+    daemon = FakeDaemon()
+    heights, blocks, txs_by_hash = WindowFetcher(daemon, None, 200).fetch(100, 104)
+    assert heights == list(range(100, 105))
+    assert [block["block_header"]["height"] for block in blocks] == heights
+    assert set(txs_by_hash) == {f"{kind}{height}" for height in heights for kind in "mt"}
+    assert len(daemon.tx_calls) == 1
+
+
+def test_txs_missing_from_a_response_are_fetched_again():
+    daemon = FakeDaemon(dropped={"t102": 1, "m103": 1})
+    _, _, txs_by_hash = WindowFetcher(daemon, None, 200).fetch(100, 104)
+    assert "t102" in txs_by_hash and "m103" in txs_by_hash
+    assert daemon.tx_calls[1] == ["t102", "m103"]
+
+
+def test_txs_that_stay_missing_raise():
+    daemon = FakeDaemon(dropped={"t102": 2})
+    with pytest.raises(RuntimeError, match="t102"):
+        WindowFetcher(daemon, None, 200).fetch(100, 104)
+
+
+def test_missing_block_raises():
+    daemon = FakeDaemon(missing_blocks={103})
+    with pytest.raises(RuntimeError, match="103"):
+        WindowFetcher(daemon, None, 200).fetch(100, 104)
+    # no txs are fetched for a window with a hole in it
+    assert daemon.tx_calls == []
@@ -1,191 +1,254 @@
-import redis
-import json
-import pandas as pd
-import matplotlib.pyplot as plt
-
-# Connect to Redis
-redis_client = redis.StrictRedis(host='localhost', port=6379, db=0, decode_responses=True)
-
-# Get all the data from the 'txs' key
-raw_data = redis_client.hgetall('txs')
-
-# Prepare a list to store the parsed transaction data
-transactions = []
-
-# Iterate over raw data and extract valid JSON transactions
-for key, value in raw_data.items():
-    try:
-        transaction = json.loads(value)
-        transactions.append(transaction)
-    except json.JSONDecodeError:
-        print(f"Skipping invalid JSON entry for key: {key}")
-
-# Convert the list of transactions to a DataFrame
-df = pd.DataFrame(transactions)
-
-# Save the DataFrame to a CSV file
-df.to_csv('transactions.csv', index=False)
-
-print("Data has been saved to transactions.csv")
-
-
-# Read the df to get some stats
-
-#   conversion_transactions: total rows
-#   yield_conversion_transactions: either mint_yield or redeem_yield
-#   mint_reserve_count: total mint_reserve transactions
-#   mint_reserve_volume: total mint_reserve volume
-#   fees_zephrsv: where conversion_fee_asset = ZEPHRSV
-#   redeem_reserve_count: total redeem_reserve transactions
-#   redeem_reserve_volume: total redeem_reserve volume
-#   fees_zephusd: where conversion_fee_asset = ZEPHUSD && conversion type = mint_stable
-#   mint_stable_count: total mint_stable transactions
-#   mint_stable_volume: total mint_stable volume
-#   redeem_stable_count: total redeem_stable transactions
-#   redeem_stable_volume: total redeem_stable volume
-#   fees_zeph: where conversion_fee_asset = ZEPH
-#   mint_yield_count: total mint_yield transactions
-#   mint_yield_volume: total mint_yield volume
-#   fees_zyield: where conversion_fee_asset = ZYIELD
-#   redeem_yield_count: total redeem_yield transactions
-#   redeem_yield_volume: total redeem_yield volume
-#   fees_zephusd_yield: where conversion_fee_asset = ZEPHUSD && conversion type = mint_yield
-
-# output a bunch of graphs e.g. number of conversions per day, volume of conversions per day, etc
+"""
+Export the scanner's Redis `txs` hash to a CSV and print conversion stats.
 
+The hash is read incrementally with HSCAN, one page at a time, and each page is
+decoded and appended to the CSV before the next one is requested. Memory stays
+bounded by the page size, and Redis never has to serve the whole hash in one
+blocking call. With --min-block only the txs listed in `txs_by_block` at that
+height or above are exported, fetched with HMGET in pages of the same size.
 
-# Read the df to get some stats
+HSCAN can return an entry twice if the hash is resized during the scan, so the
+stats drop duplicate hashes when reading the CSV back. Stats and charts come
+from one groupby over the CSV (see conversion_table()).
 
-# conversion_transactions: total rows
-conversion_transactions = len(df)
+Usage:
+    python py/tools/saveRedisTxsToCSV.py [--page-size 1000] [--min-block HEIGHT] [--output transactions.csv]
+"""
 
-# yield_conversion_transactions: either mint_yield or redeem_yield
-yield_conversion_transactions = df[df['conversion_type'].isin(['mint_yield', 'redeem_yield'])]
-
-# mint_reserve_count: total mint_reserve transactions
-mint_reserve_count = len(df[df['conversion_type'] == 'mint_reserve'])
-
-# mint_reserve_volume: total mint_reserve volume
-mint_reserve_volume = df[df['conversion_type'] == 'mint_reserve']['to_amount'].sum()
-
-# fees_zephrsv: where conversion_fee_asset = ZEPHRSV
-fees_zephrsv = df[df['conversion_fee_asset'] == 'ZEPHRSV']['conversion_fee_amount'].sum()
-
-# redeem_reserve_count: total redeem_reserve transactions
-redeem_reserve_count = len(df[df['conversion_type'] == 'redeem_reserve'])
-
-# redeem_reserve_volume: total redeem_reserve volume
-redeem_reserve_volume = df[df['conversion_type'] == 'redeem_reserve']['from_amount'].sum()
-
-# fees_zephusd: where conversion_fee_asset = ZEPHUSD && conversion type = mint_stable
-fees_zephusd = df[(df['conversion_fee_asset'] == 'ZEPHUSD') & (df['conversion_type'] == 'mint_stable')]['conversion_fee_amount'].sum()
-
-# mint_stable_count: total mint_stable transactions
-mint_stable_count = len(df[df['conversion_type'] == 'mint_stable'])
-
-# mint_stable_volume: total mint_stable volume
-mint_stable_volume = df[df['conversion_type'] == 'mint_stable']['to_amount'].sum()
-
-# redeem_stable_count: total redeem_stable transactions
-redeem_stable_count = len(df[df['conversion_type'] == 'redeem_stable'])
-
-# redeem_stable_volume: total redeem_stable volume
-redeem_stable_volume = df[df['conversion_type'] == 'redeem_stable']['from_amount'].sum()
-
-# fees_zeph: where conversion_fee_asset = ZEPH
-fees_zeph = df[df['conversion_fee_asset'] == 'ZEPH']['conversion_fee_amount'].sum()
-
-# mint_yield_count: total mint_yield transactions
-mint_yield_count = len(df[df['conversion_type'] == 'mint_yield'])
-
-# mint_yield_volume: total mint_yield volume
-mint_yield_volume = df[df['conversion_type'] == 'mint_yield']['to_amount'].sum()
-
-# fees_zyield: where conversion_fee_asset = ZYIELD
-fees_zyield = df[df['conversion_fee_asset'] == 'ZYIELD']['conversion_fee_amount'].sum()
-
-# redeem_yield_count: total redeem_yield transactions
-redeem_yield_count = len(df[df['conversion_type'] == 'redeem_yield'])
-
-# redeem_yield_volume: total redeem_yield volume
-redeem_yield_volume = df[df['conversion_type'] == 'redeem_yield']['from_amount'].sum()
-
-# fees_zephusd_yield: where conversion_fee_asset = ZEPHUSD && conversion type = mint_yield
-fees_zephusd_yield = df[(df['conversion_fee_asset'] == 'ZEPHUSD') & (df['conversion_type'] == 'redeem_yield')]['conversion_fee_amount'].sum()
-
-# Print the stats
-print("Conversion Transactions:", conversion_transactions)
-print("Yield Conversion Transactions:", len(yield_conversion_transactions))
-print("Mint Reserve Count:", mint_reserve_count)
-print("Mint Reserve Volume:", mint_reserve_volume)
-print("Fees (ZEPHRSV):", fees_zephrsv)
-print("Redeem Reserve Count:", redeem_reserve_count)
-print("Redeem Reserve Volume:", redeem_reserve_volume)
-print("Fees (ZEPHUSD for mint_stable):", fees_zephusd)
-print("Mint Stable Count:", mint_stable_count)
-print("Mint Stable Volume:", mint_stable_volume)
-print("Redeem Stable Count:", redeem_stable_count)
-print("Redeem Stable Volume:", redeem_stable_volume)
-print("Fees (ZEPH):", fees_zeph)
-print("Mint Yield Count:", mint_yield_count)
-print("Mint Yield Volume:", mint_yield_volume)
-print("Fees (ZYIELD):", fees_zyield)
-print("Redeem Yield Count:", redeem_yield_count)
-print("Redeem Yield Volume:", redeem_yield_volume)
-print("Fees (ZEPHUSD for mint_yield):", fees_zephusd_yield)
-
-# Work out expected circ amounts for each asset and what is in the reserves (not including block rewards)
-
-# Expected Circulating Supply = Total Minted - Total Redeemed - Total Fees
-ZEPHRSV_Circ = mint_reserve_volume - redeem_reserve_volume - fees_zephrsv
-ZEPHUSD_Circ = mint_stable_volume - redeem_stable_volume - fees_zephusd
-ZYIELD_Circ = mint_yield_volume - redeem_yield_volume - fees_zyield
-
-# Print the expected circulating supply
-print("Expected Circulating Supply (ZEPHRSV):", ZEPHRSV_Circ)
-print("Expected Circulating Supply (ZEPHUSD):", ZEPHUSD_Circ)
-print("Expected Circulating Supply (ZYIELD):", ZYIELD_Circ)
-
-
-
-
-# Output a bunch of graphs
+import argparse
+import csv
+import json
+import os
 
-# Number of conversions per day
-df['block_timestamp'] = pd.to_datetime(df['block_timestamp'], unit='s')
-df['date'] = df['block_timestamp'].dt.date
-conversions_per_day = df['date'].value_counts().sort_index()
-plt.figure(figsize=(10, 6))
-conversions_per_day.plot(kind='line')
-plt.xlabel('Date')
-plt.ylabel('Number of Conversions')
-plt.title('Number of Conversions per Day')
-plt.savefig('conversions_per_day.png')
-
-# Volume of conversions per day
-volume_per_day = df.groupby('date')['from_amount'].sum()
-plt.figure(figsize=(10, 6))
-volume_per_day.plot(kind='line')
-plt.xlabel('Date')
-plt.ylabel('Volume of Conversions')
-plt.title('Volume of Conversions per Day')
-plt.savefig('volume_per_day.png')
-
-# Conversion type counts
-conversion_type_counts = df['conversion_type'].value_counts()
-plt.figure(figsize=(10, 6))
-conversion_type_counts.plot(kind='bar')
-plt.xlabel('Conversion Type')
-plt.ylabel('Count')
-plt.title('Count of Each Conversion Type')
-plt.savefig('conversion_type_counts.png')
-
-# Fees by asset
-fees_by_asset = df.groupby('conversion_fee_asset')['conversion_fee_amount'].sum()
-plt.figure(figsize=(10, 6))
-fees_by_asset.plot(kind='bar')
-plt.xlabel('Fee Asset')
-plt.ylabel('Total Fees')
-plt.title('Total Fees by Asset')
-plt.savefig('fees_by_asset.png')
+import redis
+import pandas as pd
+import matplotlib.pyplot as plt
 
+# field order of the scanner's TxInfoType, older entries without the *_atoms fields leave them blank
+TX_COLUMNS = [
+    "hash",
+    "block_height",
+    "block_timestamp",
+    "conversion_type",
+    "conversion_rate",
+    "from_asset",
+    "from_amount",
+    "from_amount_atoms",
+    "to_asset",
+    "to_amount",
+    "to_amount_atoms",
+    "conversion_fee_asset",
+    "conversion_fee_amount",
+    "tx_fee_asset",
+    "tx_fee_amount",
+    "tx_fee_atoms",
+]
+
+
+def connect():
+    # same variables as src/config.ts
+    url = os.environ.get("REDIS_URL")
+    if url:
+        return redis.StrictRedis.from_url(url, decode_responses=True)
+    return redis.StrictRedis(
+        host=os.environ.get("REDIS_HOST", "localhost"),
+        port=int(os.environ.get("REDIS_PORT", "6379")),
+        db=int(os.environ.get("REDIS_DB", "0")),
+        decode_responses=True,
+    )
+
+
+def scan_pages(redis_client, key, page_size):
+    """Yield {field: value} pages of a hash with HSCAN until the cursor wraps around."""
+    cursor = 0
+    while True:
+        cursor, page = redis_client.hscan(key, cursor, count=page_size)
+        if page:
+            yield page
+        if cursor == 0:
+            break
+
+
+def scan_pages_from_block(redis_client, min_block, page_size):
+    """Yield {hash: json} pages of the txs at min_block or above, looked up through txs_by_block."""
+    hashes = []
+    for blocks in scan_pages(redis_client, "txs_by_block", page_size):
+        for height, value in blocks.items():
+            if int(height) >= min_block:
+                hashes.extend(json.loads(value))
+        while len(hashes) >= page_size:
+            page, hashes = hashes[:page_size], hashes[page_size:]
+            yield dict(zip(page, redis_client.hmget("txs", page)))
+    if hashes:
+        yield dict(zip(hashes, redis_client.hmget("txs", hashes)))
+
+
+def decode_page(page):
+    transactions = []
+    for key, value in page.items():
+        if value is None:
+            # listed in txs_by_block but missing from txs
+            continue
+        try:
+            transactions.append(json.loads(value))
+        except json.JSONDecodeError:
+            print(f"Skipping invalid JSON entry for key: {key}")
+    return transactions
+
+
+def export_txs(redis_client, output, page_size=1000, min_block=None):
+    """
+    Stream txs from Redis into a CSV and return the number of rows written.
+
+    output    - CSV path
+    page_size - HSCAN COUNT hint and HMGET batch size
+    min_block - only export txs at this block height or above (default: all txs)
+    """
+    if min_block is None:
+        pages = scan_pages(redis_client, "txs", page_size)
+    else:
+        pages = scan_pages_from_block(redis_client, min_block, page_size)
+
+    rows = 0
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=TX_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for page in pages:
+            transactions = decode_page(page)
+            writer.writerows(transactions)
+            f.flush()
+            rows += len(transactions)
+    return rows
+
+
+# (label, value column, filters) - every metric is a sum over rows of the grouped table
+STATS = [
+    ("Conversion Transactions", "count", {}),
+    ("Yield Conversion Transactions", "count", {"conversion_type": ["mint_yield", "redeem_yield"]}),
+    ("Mint Reserve Count", "count", {"conversion_type": "mint_reserve"}),
+    ("Mint Reserve Volume", "to_amount", {"conversion_type": "mint_reserve"}),
+    ("Fees (ZEPHRSV)", "conversion_fee_amount", {"conversion_fee_asset": "ZEPHRSV"}),
+    ("Redeem Reserve Count", "count", {"conversion_type": "redeem_reserve"}),
+    ("Redeem Reserve Volume", "from_amount", {"conversion_type": "redeem_reserve"}),
+    ("Fees (ZEPHUSD for mint_stable)", "conversion_fee_amount", {"conversion_fee_asset": "ZEPHUSD", "conversion_type": "mint_stable"}),
+    ("Mint Stable Count", "count", {"conversion_type": "mint_stable"}),
+    ("Mint Stable Volume", "to_amount", {"conversion_type": "mint_stable"}),
+    ("Redeem Stable Count", "count", {"conversion_type": "redeem_stable"}),
+    ("Redeem Stable Volume", "from_amount", {"conversion_type": "redeem_stable"}),
+    ("Fees (ZEPH)", "conversion_fee_amount", {"conversion_fee_asset": "ZEPH"}),
+    ("Mint Yield Count", "count", {"conversion_type": "mint_yield"}),
+    ("Mint Yield Volume", "to_amount", {"conversion_type": "mint_yield"}),
+    ("Fees (ZYIELD)", "conversion_fee_amount", {"conversion_fee_asset": "ZYIELD"}),
+    ("Redeem Yield Count", "count", {"conversion_type": "redeem_yield"}),
+    ("Redeem Yield Volume", "from_amount", {"conversion_type": "redeem_yield"}),
+    ("Fees (ZEPHUSD for mint_yield)", "conversion_fee_amount", {"conversion_fee_asset": "ZEPHUSD", "conversion_type": "redeem_yield"}),
+]
+
+STATS_COLUMNS = ["block_timestamp", "conversion_type", "from_amount", "to_amount", "conversion_fee_asset", "conversion_fee_amount"]
+
+
+def conversion_table(df):
+    """
+    Group txs by day, conversion type and fee asset in a single pass.
+
+    Returns one row per group with the tx count and the summed amounts. Every
+    stat and chart is computed from this table, which is only as large as
+    days x types x fee assets however many txs there are.
+    """
+    date = pd.to_datetime(df["block_timestamp"], unit="s").dt.date.rename("date")
+    grouped = df.groupby([date, df["conversion_type"], df["conversion_fee_asset"]], dropna=False)
+    table = grouped[["from_amount", "to_amount", "conversion_fee_amount"]].sum()
+    table.insert(0, "count", grouped.size())
+    return table.reset_index()
+
+
+def compute_stats(table):
+    """Return {label: value} for every entry in STATS."""
+    stats = {}
+    for label, column, filters in STATS:
+        mask = pd.Series(True, index=table.index)
+        for key, value in filters.items():
+            mask &= table[key].isin(value) if isinstance(value, list) else table[key] == value
+        stats[label] = table.loc[mask, column].sum()
+    return stats
+
+
+def print_stats(table):
+    stats = compute_stats(table)
+    for label, value in stats.items():
+        print(f"{label}:", value)
+
+    # Work out expected circ amounts for each asset and what is in the reserves (not including block rewards)
+
+    # Expected Circulating Supply = Total Minted - Total Redeemed - Total Fees
+    ZEPHRSV_Circ = stats["Mint Reserve Volume"] - stats["Redeem Reserve Volume"] - stats["Fees (ZEPHRSV)"]
+    ZEPHUSD_Circ = stats["Mint Stable Volume"] - stats["Redeem Stable Volume"] - stats["Fees (ZEPHUSD for mint_stable)"]
+    ZYIELD_Circ = stats["Mint Yield Volume"] - stats["Redeem Yield Volume"] - stats["Fees (ZYIELD)"]
+
+    # Print the expected circulating supply
+    print("Expected Circulating Supply (ZEPHRSV):", ZEPHRSV_Circ)
+    print("Expected Circulating Supply (ZEPHUSD):", ZEPHUSD_Circ)
+    print("Expected Circulating Supply (ZYIELD):", ZYIELD_Circ)
+
+
+def save_charts(table):
+    # Output a bunch of graphs
+
+    # Number of conversions per day
+    conversions_per_day = table.groupby('date')['count'].sum()
+    plt.figure(figsize=(10, 6))
+    conversions_per_day.plot(kind='line')
+    plt.xlabel('Date')
+    plt.ylabel('Number of Conversions')
+    plt.title('Number of Conversions per Day')
+    plt.savefig('conversions_per_day.png')
+    plt.close()
+
+    # Volume of conversions per day
+    volume_per_day = table.groupby('date')['from_amount'].sum()
+    plt.figure(figsize=(10, 6))
+    volume_per_day.plot(kind='line')
+    plt.xlabel('Date')
+    plt.ylabel('Volume of Conversions')
+    plt.title('Volume of Conversions per Day')
+    plt.savefig('volume_per_day.png')
+    plt.close()
+
+    # Conversion type counts
+    conversion_type_counts = table.groupby('conversion_type')['count'].sum().sort_values(ascending=False)
+    plt.figure(figsize=(10, 6))
+    conversion_type_counts.plot(kind='bar')
+    plt.xlabel('Conversion Type')
+    plt.ylabel('Count')
+    plt.title('Count of Each Conversion Type')
+    plt.savefig('conversion_type_counts.png')
+    plt.close()
+
+    # Fees by asset
+    fees_by_asset = table.groupby('conversion_fee_asset')['conversion_fee_amount'].sum()
+    plt.figure(figsize=(10, 6))
+    fees_by_asset.plot(kind='bar')
+    plt.xlabel('Fee Asset')
+    plt.ylabel('Total Fees')
+    plt.title('Total Fees by Asset')
+    plt.savefig('fees_by_asset.png')
+    plt.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the Redis txs hash to a CSV and print conversion stats")
+    parser.add_argument("--output", default="transactions.csv", help="CSV path (default: transactions.csv)")
+    parser.add_argument("--page-size", type=int, default=1000, help="entries requested per HSCAN/HMGET call (default: 1000)")
+    parser.add_argument("--min-block", type=int, help="only export txs at this block height or above")
+    args = parser.parse_args()
+
+    # Connect to Redis
+    redis_client = connect()
+
+    rows = export_txs(redis_client, args.output, args.page_size, args.min_block)
+    print(f"{rows} transactions have been saved to {args.output}")
+
+    df = pd.read_csv(args.output, usecols=["hash", *STATS_COLUMNS]).drop_duplicates("hash")
+    table = conversion_table(df)
+    print_stats(table)
+    save_charts(table)
@@ -0,0 +1,223 @@
+"""
+Mergeable accumulators for the txstats.py figures.
+
+TxStatsAccumulator folds chunks of txs rows into counts, sums and min/max per
+conversion type and asset, plus a QuantileSketch of the conversion rates for
+the median. Everything it holds is a small dict keyed by type or asset, so
+memory does not depend on the number of rows. Two accumulators over disjoint
+rows merge into the accumulator over both, and the whole state round-trips
+through JSON so a later run can carry on from where the previous one stopped.
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+
+ASSETS = ['ZEPH', 'ZEPHUSD', 'ZEPHRSV']
+
+# relative accuracy of the conversion rate quantiles
+SKETCH_ACCURACY = 0.001
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch for positive values (DDSketch style).
+
+    Values are counted in buckets whose bounds grow by a factor gamma, so any
+    quantile is returned within a relative error of `accuracy`. Sketches with
+    the same accuracy merge by adding bucket counts.
+    """
+
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        # values <= 0 cannot be log-bucketed and are counted as 0
+        self.zeros = 0
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.buckets.values())
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def quantile(self, q):
+        total = self.count
+        if total == 0:
+            return math.nan
+        # nearest rank, no interpolation between the two middle values of an even count
+        rank = q * (total - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {"accuracy": self.accuracy, "zeros": self.zeros, "buckets": {str(key): count for key, count in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["accuracy"])
+        sketch.zeros = data["zeros"]
+        sketch.buckets = {int(key): count for key, count in data["buckets"].items()}
+        return sketch
+
+
+class TxStatsAccumulator:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget everything folded in so far, e.g. when the csv it was built from was rewritten."""
+        self.total_txns = 0
+        self.max_block = None
+        # {conversion_type: {"count", "rate_count", "sum", "min", "max"}}, rate figures over non-missing conversion_rate
+        self.types = {}
+        self.sketches = {}
+        # {asset: amount}
+        self.fees = {}
+        self.to_amounts = {}
+        self.from_amounts = {}
+        # where the next update should pick up: {"block": last block folded in, "offset": csv byte offset}
+        self.position = {"block": None, "offset": 0}
+
+    def update(self, df):
+        """Fold a chunk of txs rows (the columns txstats.py loads) into the accumulators."""
+        if df.empty:
+            return
+        self.total_txns += len(df)
+        chunk_max = int(df['block'].max())
+        self.max_block = chunk_max if self.max_block is None else max(self.max_block, chunk_max)
+
+        for c_type, rates in df.groupby('conversion_type')['conversion_rate']:
+            valid = rates.dropna()
+            totals = self.types.setdefault(c_type, {"count": 0, "rate_count": 0, "sum": 0.0, "min": math.inf, "max": -math.inf})
+            totals["count"] += len(rates)
+            totals["rate_count"] += len(valid)
+            totals["sum"] += float(valid.sum())
+            if len(valid):
+                totals["min"] = min(totals["min"], float(valid.min()))
+                totals["max"] = max(totals["max"], float(valid.max()))
+            self.sketches.setdefault(c_type, QuantileSketch()).add(valid)
+
+        for totals, (asset_column, amount_column) in (
+            (self.fees, ('conversion_fee_asset', 'conversion_fee_amount')),
+            (self.to_amounts, ('to_asset', 'to_amount')),
+            (self.from_amounts, ('from_asset', 'from_amount')),
+        ):
+            for asset, amount in df.groupby(asset_column)[amount_column].sum().items():
+                totals[asset] = totals.get(asset, 0.0) + float(amount)
+
+    def merge(self, other):
+        """Add the accumulators of another instance built over different rows."""
+        self.total_txns += other.total_txns
+        if other.max_block is not None:
+            self.max_block = other.max_block if self.max_block is None else max(self.max_block, other.max_block)
+        for c_type, other_totals in other.types.items():
+            totals = self.types.setdefault(c_type, {"count": 0, "rate_count": 0, "sum": 0.0, "min": math.inf, "max": -math.inf})
+            for key in ("count", "rate_count", "sum"):
+                totals[key] += other_totals[key]
+            totals["min"] = min(totals["min"], other_totals["min"])
+            totals["max"] = max(totals["max"], other_totals["max"])
+        for c_type, sketch in other.sketches.items():
+            self.sketches.setdefault(c_type, QuantileSketch(sketch.accuracy)).merge(sketch)
+        for totals, other_totals in ((self.fees, other.fees), (self.to_amounts, other.to_amounts), (self.from_amounts, other.from_amounts)):
+            for asset, amount in other_totals.items():
+                totals[asset] = totals.get(asset, 0.0) + amount
+
+    def txns_by_type(self):
+        counts = {c_type: totals["count"] for c_type, totals in self.types.items()}
+        return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+    def conversion_rate_stats(self):
+        stats = {}
+        for c_type, totals in sorted(self.types.items()):
+            empty = totals["rate_count"] == 0
+            stats[c_type] = {
+                "min": math.nan if empty else totals["min"],
+                "max": math.nan if empty else totals["max"],
+                "median": self.sketches[c_type].quantile(0.5),
+                "mean": math.nan if empty else totals["sum"] / totals["rate_count"],
+            }
+        return stats
+
+    def asset_balances(self):
+        balances = {}
+        for asset in ASSETS:
+            if asset != 'ZEPH':
+                mint = self.to_amounts.get(asset, 0.0)
+                redeem = self.from_amounts.get(asset, 0.0)
+                balances[asset] = {"mint": mint, "redeem": redeem, "net": mint - redeem}
+            else:
+                redeem = self.to_amounts.get(asset, 0.0)
+                added = self.from_amounts.get(asset, 0.0)
+                balances[asset] = {"added": added, "redeem": redeem, "net": added - redeem}
+        return balances
+
+    def to_dict(self):
+        return {
+            "total_txns": self.total_txns,
+            "max_block": self.max_block,
+            # json has no infinity, empty min/max are stored as null
+            "types": {c_type: {key: (None if isinstance(value, float) and math.isinf(value) else value) for key, value in totals.items()} for c_type, totals in self.types.items()},
+            "sketches": {c_type: sketch.to_dict() for c_type, sketch in self.sketches.items()},
+            "fees": self.fees,
+            "to_amounts": self.to_amounts,
+            "from_amounts": self.from_amounts,
+            "position": self.position,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        acc = cls()
+        acc.total_txns = data["total_txns"]
+        acc.max_block = data["max_block"]
+        acc.types = {
+            c_type: {**totals, "min": math.inf if totals["min"] is None else totals["min"], "max": -math.inf if totals["max"] is None else totals["max"]}
+            for c_type, totals in data["types"].items()
+        }
+        acc.sketches = {c_type: QuantileSketch.from_dict(sketch) for c_type, sketch in data["sketches"].items()}
+        acc.fees = data["fees"]
+        acc.to_amounts = data["to_amounts"]
+        acc.from_amounts = data["from_amounts"]
+        acc.position = data["position"]
+        return acc
+
+    def save(self, path):
+        # atomic replace, same as the scanners' progress markers
+        path = Path(path)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        return cls.from_dict(json.loads(path.read_text()))
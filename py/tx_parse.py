@@ -0,0 +1,242 @@
+"""
+Conversion tx and block reward classification shared by txscan.py and scan.py.
+
+The nested `as_json` string of every tx is decoded into TxFields, holding only
+the fields classification reads. With msgspec installed it is decoded straight
+into typed structs, skipping the ring signatures, extra and other large fields
+without building objects for them. Without it, orjson (or the stdlib json
+module) parses the whole document and the fields are picked out of the dicts.
+`loads` is the fastest plain JSON decoder available, for response bodies.
+"""
+
+import json
+from collections import namedtuple
+from typing import List
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# amounts are atomic units, output_asset_types has None for outputs without a tagged key
+TxFields = namedtuple("TxFields", ["amount_burnt", "amount_minted", "vout_amounts", "input_asset_type", "output_asset_types", "pricing_record_height", "txn_fee"])
+
+
+if msgspec is not None:
+    class _AssetKey(msgspec.Struct):
+        asset_type: str = None
+
+    class _Vin(msgspec.Struct):
+        key: _AssetKey = None
+
+    class _Target(msgspec.Struct):
+        tagged_key: _AssetKey = None
+
+    class _Vout(msgspec.Struct):
+        amount: int = 0
+        target: _Target = None
+
+    class _RctSignatures(msgspec.Struct):
+        txnFee: int = 0
+
+    class _Tx(msgspec.Struct):
+        amount_burnt: int = 0
+        amount_minted: int = 0
+        pricing_record_height: int = 0
+        # typing.List, list[...] needs Python 3.9
+        vin: List[_Vin] = []
+        vout: List[_Vout] = []
+        rct_signatures: _RctSignatures = None
+
+    _tx_decoder = msgspec.json.Decoder(_Tx)
+
+
+def _fields_from_struct(tx):
+    vin_key = tx.vin[0].key if tx.vin else None
+    return TxFields(
+        tx.amount_burnt,
+        tx.amount_minted,
+        [vout.amount for vout in tx.vout],
+        vin_key.asset_type if vin_key else None,
+        [vout.target.tagged_key.asset_type if vout.target and vout.target.tagged_key else None for vout in tx.vout],
+        tx.pricing_record_height,
+        tx.rct_signatures.txnFee if tx.rct_signatures else 0,
+    )
+
+
+def _fields_from_dict(tx):
+    vin = tx.get("vin") or [{}]
+    vout = tx.get("vout", [])
+    return TxFields(
+        tx.get("amount_burnt", 0),
+        tx.get("amount_minted", 0),
+        [out.get("amount", 0) for out in vout],
+        vin[0].get("key", {}).get("asset_type"),
+        [out.get("target", {}).get("tagged_key", {}).get("asset_type") for out in vout],
+        tx.get("pricing_record_height", 0),
+        tx.get("rct_signatures", {}).get("txnFee", 0),
+    )
+
+
+def _has_float_amount(fields):
+    return any(isinstance(amount, float) for amount in (fields.amount_burnt, fields.amount_minted, fields.txn_fee, *fields.vout_amounts))
+
+
+def decode_tx_json(as_json):
+    """Decode a tx's `as_json` string into TxFields."""
+    if msgspec is not None:
+        try:
+            return _fields_from_struct(_tx_decoder.decode(as_json))
+        except (msgspec.DecodeError, msgspec.ValidationError):
+            # e.g. an amount past uint64, only the stdlib parser keeps it exact
+            return _fields_from_dict(json.loads(as_json))
+    fields = _fields_from_dict(loads(as_json))
+    if loads is not json.loads and _has_float_amount(fields):
+        # orjson decodes integers past 64 bits as floats
+        fields = _fields_from_dict(json.loads(as_json))
+    return fields
+
+
+def parse_tx(tx_data, hash, height, pricing_index):
+    """
+    Classify one tx from a /get_transactions entry.
+
+    Returns (tx_info, None) for a conversion, (None, block_reward_info) for a
+    miner tx paying a block reward, and (None, None) or None otherwise.
+    pricing_index is looked up at the tx's pricing_record_height.
+    """
+    # Extract transaction data from the "txs" key
+    tx_json = tx_data.get("as_json", {})
+    if not tx_json:
+        print(f"Transaction {hash} missing from daemon response")
+        return None, None
+
+    # print(tx_json)  # Print the JSON data of the transaction
+    tx = decode_tx_json(tx_json)
+
+
+    # Check if the transaction is a conversion transaction
+    if tx.amount_burnt == 0 or tx.amount_minted == 0:
+        tx_amount = tx.vout_amounts[0]
+        if tx_amount > 0:
+            # Block Reward
+            miner_reward = tx_amount * (10**-12)
+            governance_reward = tx.vout_amounts[1] * (10**-12)
+            reserve_reward = (miner_reward / 0.75) * 0.2
+
+            block_reward_info = [int(height), miner_reward, governance_reward, reserve_reward]
+            return None, block_reward_info
+        else:
+            return None, None  # Not a conversion transaction
+    
+    # Extract asset types for input and output
+    input_asset_type = tx.input_asset_type
+    output_asset_types = tx.output_asset_types
+    conversion_type = "na"
+    # Determine the conversion type
+    if input_asset_type == "ZEPH" and "ZEPHUSD" in output_asset_types:
+        conversion_type = "mint_stable"
+    elif input_asset_type == "ZEPHUSD" and "ZEPH" in output_asset_types:
+        conversion_type = "redeem_stable"
+    elif input_asset_type == "ZEPH" and "ZEPHRSV" in output_asset_types:
+        conversion_type = "mint_reserve"
+    elif input_asset_type == "ZEPHRSV" and "ZEPH" in output_asset_types:
+        conversion_type = "redeem_reserve"
+    
+    if conversion_type != "na":
+        amount_burnt = tx.amount_burnt * (10**-12)
+        amount_minted = tx.amount_minted * (10**-12)
+    else:
+        # count this?
+        return
+    
+    
+    # Get more info on the tx
+    pr_height = tx.pricing_record_height
+    # print(f"Pricing Record Height: {pr_height}")
+
+    relevant_pr = pricing_index.get(pr_height)
+    if relevant_pr is None:
+        return
+    
+    spot, moving_average, reserve, reserve_ma, stable, stable_ma = relevant_pr
+
+    #determine conversion rate
+
+    # conversion fees are a lost in the mint value. But this fee is not added the the reserve directly... although the difference kind of is.
+
+
+    conversion_rate = 0
+    from_asset = ""
+    from_amount = 0
+    to_asset = ""
+    to_amount = 0
+    if conversion_type == "mint_stable":
+        conversion_rate = max(spot, moving_average)
+        from_asset = "ZEPH"
+        from_amount = amount_burnt
+        to_asset = "ZEPHUSD"
+        to_amount = amount_minted
+
+        #conversion fees        
+        conversion_fee_asset = to_asset
+        conversion_fee_amount = (amount_minted / 0.98) * 0.02
+
+        tx_fee_asset = from_asset
+
+
+
+    elif conversion_type == "redeem_stable":
+        conversion_rate = min(spot, moving_average)
+        from_asset = "ZEPHUSD"
+        from_amount = amount_burnt
+        to_asset = "ZEPH"
+        to_amount = amount_minted
+
+        #conversion fees        
+        conversion_fee_asset = to_asset
+        conversion_fee_amount = (amount_minted / 0.98) * 0.02
+
+        tx_fee_asset = from_asset
+
+    elif conversion_type == "mint_reserve":
+        #NO FEE
+        conversion_rate = max(reserve, reserve_ma)
+        from_asset = "ZEPH"
+        from_amount = amount_burnt
+        to_asset = "ZEPHRSV"
+        to_amount = amount_minted
+
+        #conversion fees        
+        conversion_fee_asset = "N/A"
+        conversion_fee_amount = 0.0
+        
+        tx_fee_asset = from_asset
+
+
+    elif conversion_type == "redeem_reserve":
+        conversion_rate = min(reserve, reserve_ma)
+        from_asset = "ZEPHRSV"
+        from_amount = amount_burnt
+        to_asset = "ZEPH"
+        to_amount = amount_minted
+
+        #conversion fees
+        conversion_fee_asset = to_asset
+        conversion_fee_amount = (amount_minted / 0.98) * 0.02
+
+        tx_fee_asset = from_asset
+
+
+
+    tx_fee_amount = tx.txn_fee * (10**-12)
+
+
+    tx_info = [hash, conversion_type, conversion_rate, from_asset, from_amount, to_asset, to_amount, conversion_fee_asset, conversion_fee_amount, tx_fee_asset, tx_fee_amount]
+    return tx_info, None
@@ -1,83 +1,207 @@
-import pandas as pd
+import argparse
+import io
 from pathlib import Path
 
-df = pd.read_csv(Path("./py/csvs/txs.csv"))
-
-# get useful info from this df
-
-# Calculate the total conversion fee for each asset
-total_fee_zeph = df[df['conversion_fee_asset'] == 'ZEPH']['conversion_fee_amount'].sum()
-total_fee_zephusd = df[df['conversion_fee_asset'] == 'ZEPHUSD']['conversion_fee_amount'].sum()
-total_fee_zephrsv = df[df['conversion_fee_asset'] == 'ZEPHRSV']['conversion_fee_amount'].sum()
-
-# Total number of transactions
-total_txns = len(df)
-
-# Number of transactions by conversion type
-txns_by_type = df['conversion_type'].value_counts()
-
-# Average number of transactions per block
-avg_txns_per_block = total_txns/max(df['block'])
-
-# Conversion rate statistics for each conversion type
-conversion_types = df['conversion_type'].unique()
-conversion_rate_stats = {}
-for c_type in conversion_types:
-    sub_df = df[df['conversion_type'] == c_type]
-    stats = {
-        "min": sub_df['conversion_rate'].min(),
-        "max": sub_df['conversion_rate'].max(),
-        "median": sub_df['conversion_rate'].median(),
-        "mean": sub_df['conversion_rate'].mean()
-    }
-    conversion_rate_stats[c_type] = stats
-
-# Total mint and burns for each asset
-assets = ['ZEPH', 'ZEPHUSD', 'ZEPHRSV']
-asset_balances = {}
-for asset in assets:
-    if asset != 'ZEPH':
-        mint = df[df['to_asset'] == asset]['to_amount'].sum()
-        redeem = df[df['from_asset'] == asset]['from_amount'].sum()
-        asset_balances[asset] = {"mint": mint, "redeem": redeem, "net": mint - redeem}
-    else:
-        redeem = df[df['to_asset'] == asset]['to_amount'].sum()
-        added = df[df['from_asset'] == asset]['from_amount'].sum()
-        asset_balances[asset] = {"added": added, "redeem": redeem, "net": added - redeem}
-
-    
-
-# Print results
-print(f"Total number of transactions: {total_txns}")
-print("\nNumber of transactions by conversion type:")
-print(txns_by_type)
-print(f"\nAverage number of transactions per block: {avg_txns_per_block:.2f}")
-
-print("\nConversion rate statistics:")
-for c_type, stats in conversion_rate_stats.items():
-    print(f"For {c_type}:")
-    print(f"  Min rate: {stats['min']:.4f}")
-    print(f"  Max rate: {stats['max']:.4f}")
-    print(f"  Median rate: {stats['median']:.4f}")
-    print(f"  Mean rate: {stats['mean']:.4f}")
-    print("")
-
-print(f"\nTotal ZEPH conversion fees: {total_fee_zeph}")
-print(f"Total ZEPHUSD conversion fees: {total_fee_zephusd}")
-print(f"Total ZEPHRSV conversion fees: {total_fee_zephrsv}")
-
-print("\nMint and Redeem figures (Asset Balance/Totals):")
-for asset, figures in asset_balances.items():
-    if asset != "ZEPH":
-        print(f"For {asset}:")
-        print(f"  Minted: {figures['mint']}")
-        print(f"  Redeemed: {figures['redeem']}")
-        print(f"  Net (circ): {figures['net']}")
-        print("")
+import pandas as pd
+
+from columnar import CSV_DIR, PY_STORE, ColumnStore, load_table, table_rollbacks
+from csv_stream import find_marker, rollback_height
+from tx_accumulator import TxStatsAccumulator
+
+TXS_COLUMNS = ["block", "conversion_type", "conversion_rate", "from_asset", "from_amount", "to_asset", "to_amount", "conversion_fee_asset", "conversion_fee_amount"]
+
+STATE_PATH = CSV_DIR / "txstats.state.json"
+
+# blocks per read from the columnar store in --stream mode
+STORE_CHUNK_BLOCKS = 50_000
+
+
+def exact_stats(df):
+    # get useful info from this df
+
+    # Calculate the total conversion fee for each asset
+    fees = {asset: df[df['conversion_fee_asset'] == asset]['conversion_fee_amount'].sum() for asset in ['ZEPH', 'ZEPHUSD', 'ZEPHRSV']}
+
+    # Total number of transactions
+    total_txns = len(df)
+
+    # Number of transactions by conversion type
+    txns_by_type = df['conversion_type'].value_counts()
+
+    # Conversion rate statistics for each conversion type
+    conversion_types = df['conversion_type'].unique()
+    conversion_rate_stats = {}
+    for c_type in conversion_types:
+        sub_df = df[df['conversion_type'] == c_type]
+        stats = {
+            "min": sub_df['conversion_rate'].min(),
+            "max": sub_df['conversion_rate'].max(),
+            "median": sub_df['conversion_rate'].median(),
+            "mean": sub_df['conversion_rate'].mean()
+        }
+        conversion_rate_stats[c_type] = stats
+
+    # Total mint and burns for each asset
+    assets = ['ZEPH', 'ZEPHUSD', 'ZEPHRSV']
+    asset_balances = {}
+    for asset in assets:
+        if asset != 'ZEPH':
+            mint = df[df['to_asset'] == asset]['to_amount'].sum()
+            redeem = df[df['from_asset'] == asset]['from_amount'].sum()
+            asset_balances[asset] = {"mint": mint, "redeem": redeem, "net": mint - redeem}
+        else:
+            redeem = df[df['to_asset'] == asset]['to_amount'].sum()
+            added = df[df['from_asset'] == asset]['from_amount'].sum()
+            asset_balances[asset] = {"added": added, "redeem": redeem, "net": added - redeem}
+
+    return total_txns, txns_by_type, max(df['block']), conversion_rate_stats, fees, asset_balances
+
+
+def committed_csv_size(csv_path):
+    # rows past the scanner's last commit may be rolled back, so stop at the committed size when there is one
+    marker = find_marker(csv_path)
+    if marker is not None:
+        return marker["offsets"]["txs"]
+    return csv_path.stat().st_size
+
+
+def check_rollbacks(acc):
+    # txs rows rolled back after a reorg can't be taken out of the accumulators, start over if any were folded in
+    rollbacks = table_rollbacks("txs")
+    fork_height = rollback_height(rollbacks, acc.position.get("rollbacks", 0))
+    if fork_height is not None and acc.max_block is not None and fork_height <= acc.max_block:
+        print(f"txs were rolled back to block {fork_height} since the saved stats, starting over")
+        acc.reset()
+    elif fork_height is not None and acc.position["block"] is not None and fork_height <= acc.position["block"]:
+        # none of the dropped blocks had txs, just read them again
+        acc.position["block"] = fork_height - 1
+    acc.position["rollbacks"] = len(rollbacks)
+
+
+def iter_csv_chunks(acc, chunk_bytes):
+    """
+    Yield (rows, offset after them) for txs.csv rows the accumulator has not seen.
+
+    Reads from the byte offset stored in the accumulator in blocks of about
+    chunk_bytes, cut at the last complete line. Starts over if the csv was
+    rewritten or rolled back past the saved offset since the accumulator was saved.
+    """
+    csv_path = CSV_DIR / "txs.csv"
+    end = committed_csv_size(csv_path)
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        first_row = f.readline().decode()
+        offset = acc.position["offset"]
+        if offset and (offset > end or acc.position.get("first_row") != first_row):
+            print("txs.csv was rewritten since the saved stats, starting over")
+            acc.reset()
+        check_rollbacks(acc)
+        offset = acc.position["offset"]
+        acc.position["first_row"] = first_row
+        offset = max(offset, len(header))
+
+        f.seek(offset)
+        while offset < end:
+            block = f.read(min(chunk_bytes, end - offset))
+            cut = block.rfind(b"\n") + 1
+            if cut == 0:
+                # a single row longer than chunk_bytes
+                block += f.readline()
+                cut = len(block)
+            f.seek(offset + cut)
+            offset += cut
+            yield pd.read_csv(io.BytesIO(header + block[:cut]), usecols=TXS_COLUMNS), offset
+
+
+def iter_store_chunks(acc):
+    # the columnar store is sorted by block, so resume by height
+    store = ColumnStore()
+    last = store.max_height("txs")
+    check_rollbacks(acc)
+    if last is None:
+        return
+    start = 0 if acc.position["block"] is None else acc.position["block"] + 1
+    for window_start in range(start, last + 1, STORE_CHUNK_BLOCKS):
+        window_end = min(window_start + STORE_CHUNK_BLOCKS, last + 1)
+        yield store.read("txs", TXS_COLUMNS, window_start, window_end), window_end - 1
+
+
+def stream_stats(state_path, fresh=False, chunk_bytes=32 * 1024 * 1024):
+    """
+    Update the saved accumulators with any new txs rows and return them.
+
+    state_path  - accumulator JSON, created on the first run
+    fresh       - ignore the saved accumulators and read everything again
+    chunk_bytes - csv bytes parsed at a time, which bounds memory use
+    """
+    acc = TxStatsAccumulator() if fresh else TxStatsAccumulator.load(state_path)
+    if PY_STORE == "columnar":
+        for chunk, last_block in iter_store_chunks(acc):
+            acc.update(chunk)
+            acc.position["block"] = last_block
     else:
-        print(f"For {asset}:")
-        print(f"  Added: {figures['added']}")
-        print(f"  Redeemed: {figures['redeem']}")
-        print(f"  Net (in RES): {figures['net']}")
+        for chunk, offset in iter_csv_chunks(acc, chunk_bytes):
+            acc.update(chunk)
+            acc.position["offset"] = offset
+    acc.save(state_path)
+    return acc
+
+
+def print_stats(total_txns, txns_by_type, max_block, conversion_rate_stats, fees, asset_balances):
+    # Average number of transactions per block
+    avg_txns_per_block = total_txns/max_block
+
+    # Print results
+    print(f"Total number of transactions: {total_txns}")
+    print("\nNumber of transactions by conversion type:")
+    print(txns_by_type)
+    print(f"\nAverage number of transactions per block: {avg_txns_per_block:.2f}")
+
+    print("\nConversion rate statistics:")
+    for c_type, stats in conversion_rate_stats.items():
+        print(f"For {c_type}:")
+        print(f"  Min rate: {stats['min']:.4f}")
+        print(f"  Max rate: {stats['max']:.4f}")
+        print(f"  Median rate: {stats['median']:.4f}")
+        print(f"  Mean rate: {stats['mean']:.4f}")
         print("")
 
+    print(f"\nTotal ZEPH conversion fees: {fees['ZEPH']}")
+    print(f"Total ZEPHUSD conversion fees: {fees['ZEPHUSD']}")
+    print(f"Total ZEPHRSV conversion fees: {fees['ZEPHRSV']}")
+
+    print("\nMint and Redeem figures (Asset Balance/Totals):")
+    for asset, figures in asset_balances.items():
+        if asset != "ZEPH":
+            print(f"For {asset}:")
+            print(f"  Minted: {figures['mint']}")
+            print(f"  Redeemed: {figures['redeem']}")
+            print(f"  Net (circ): {figures['net']}")
+            print("")
+        else:
+            print(f"For {asset}:")
+            print(f"  Added: {figures['added']}")
+            print(f"  Redeemed: {figures['redeem']}")
+            print(f"  Net (in RES): {figures['net']}")
+            print("")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print conversion stats from the scanned txs")
+    parser.add_argument("--stream", action="store_true", help="read txs in chunks into saved accumulators (approximate median)")
+    parser.add_argument("--state", default=str(STATE_PATH), help=f"accumulator file for --stream (default: {STATE_PATH})")
+    parser.add_argument("--chunk-mb", type=int, default=32, help="csv megabytes parsed at a time with --stream (default: 32)")
+    parser.add_argument("--fresh", action="store_true", help="with --stream, discard saved accumulators and read all rows again")
+    args = parser.parse_args()
+
+    if args.stream:
+        acc = stream_stats(Path(args.state), args.fresh, args.chunk_mb * 1024 * 1024)
+        if acc.total_txns == 0:
+            raise SystemExit("No txs found")
+        fees = {asset: acc.fees.get(asset, 0.0) for asset in ['ZEPH', 'ZEPHUSD', 'ZEPHRSV']}
+        txns_by_type = pd.Series(acc.txns_by_type(), name="count").rename_axis("conversion_type")
+        print_stats(acc.total_txns, txns_by_type, acc.max_block, acc.conversion_rate_stats(), fees, acc.asset_balances())
+    else:
+        # only the columns used, from the csvs or the columnar store (PY_STORE)
+        df = load_table("txs", TXS_COLUMNS)
+        print_stats(*exact_stats(df))
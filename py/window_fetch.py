@@ -0,0 +1,83 @@
+"""
+Block window fetching shared by txscan.py and scan.py.
+
+Both scanners work through the chain in windows of TXSCAN_BLOCK_WINDOW blocks.
+Every block of a window is fetched concurrently, then every tx hash in it
+(miner txs included) through TXSCAN_TX_BATCH sized /get_transactions calls,
+with the response cache in front of both. A window only comes back complete:
+txs missing from a response are asked for once more, and a block or tx that
+still can't be fetched raises, so a scan never commits a window with a hole
+in it.
+"""
+
+import os
+from contextlib import nullcontext
+
+from rpc_cache import RPC_CACHE_OFFLINE, cached_block, cached_txs
+from rpc_pool import RPC_CHUNK_SIZE, RPC_FETCH_THREADS, fetch_concurrent
+
+# max hashes per /get_transactions call and blocks whose txs are fetched together
+TXSCAN_TX_BATCH = int(os.environ.get("TXSCAN_TX_BATCH", "100"))
+TXSCAN_BLOCK_WINDOW = int(os.environ.get("TXSCAN_BLOCK_WINDOW", str(RPC_CHUNK_SIZE)))
+
+
+def block_tx_hashes(block_data):
+    # miner tx first, as the scanners expect it
+    return [block_data["miner_tx_hash"], *block_data.get("tx_hashes", [])]
+
+
+class WindowFetcher:
+    def __init__(self, daemon, cache, tip_height, metrics=None):
+        """
+        daemon     - DaemonPool or DaemonClient
+        cache      - RpcCache, or None
+        tip_height - daemon height, responses close to it are not cached
+        metrics    - optional ScanMetrics, fetches are timed as its "rpc" stage
+        """
+        self.daemon = daemon
+        self.cache = cache
+        self.tip_height = tip_height
+        self.metrics = metrics
+
+    def get_block(self, height):
+        return cached_block(self.cache, height, self.daemon.get_block, self.tip_height)
+
+    def get_transactions(self, hashes):
+        # cached txs first, the rest from the daemon
+        return cached_txs(self.cache, list(hashes), self._fetch_transactions, self.tip_height)
+
+    def _fetch_transactions(self, hashes):
+        # TXSCAN_TX_BATCH sized calls, fetched concurrently
+        return self.daemon.get_transactions_batched(hashes, TXSCAN_TX_BATCH, RPC_FETCH_THREADS)
+
+    def get_window_txs(self, hashes):
+        # every tx of a window, a miner or conversion tx missing from a committed window would be lost for good
+        txs_by_hash = self.get_transactions(hashes)
+        missed = [hash for hash in hashes if not txs_by_hash.get(hash, {}).get("as_json")]
+        if missed and not RPC_CACHE_OFFLINE:
+            print(f"{len(missed)} txs missing from the daemon response, fetching them again")
+            txs_by_hash.update(self.get_transactions(missed))
+            missed = [hash for hash in hashes if not txs_by_hash.get(hash, {}).get("as_json")]
+        if missed:
+            raise RuntimeError(f"Could not fetch txs {missed[:10]}{'...' if len(missed) > 10 else ''}")
+        return txs_by_hash
+
+    def fetch(self, start_height, end_height):
+        """
+        Fetch the blocks from start_height to end_height (inclusive) and all of their txs.
+
+        Returns (heights, blocks, txs_by_hash). Raises RuntimeError if a block or tx
+        could not be fetched, the daemon client has already retried by then (offline
+        replays stop at a block or tx missing from the cache).
+        """
+        heights = list(range(start_height, end_height + 1))
+        with self.metrics.stage("rpc") if self.metrics else nullcontext():
+            blocks = fetch_concurrent(heights, self.get_block, RPC_FETCH_THREADS)
+        missing = [height for height, block_data in zip(heights, blocks) if not block_data]
+        if missing:
+            raise RuntimeError(f"Could not fetch blocks {missing[:10]}{'...' if len(missing) > 10 else ''}")
+
+        window_hashes = [hash for block_data in blocks for hash in block_tx_hashes(block_data)]
+        with self.metrics.stage("rpc") if self.metrics else nullcontext():
+            txs_by_hash = self.get_window_txs(window_hashes)
+        return heights, blocks, txs_by_hash